@@ -1,4 +1,5 @@
 import os
+import sys
 import boto3
 import json
 import re
@@ -10,6 +11,10 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 load_dotenv()
 
+# OCR results may be plain JSON or the compact .json.zst/.json.gz artifacts (Mistral/ocr_artifact.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Mistral"))
+from ocr_artifact import is_result_key, load_ocr_result, result_name
+
 # === CONFIG ===
 bucket_name = "fed-data-testing"
 prefix = "json/"
@@ -75,7 +80,7 @@ def replace_images_in_markdown(markdown_str: str, images_dict: dict) -> str:
 def get_combined_markdown(ocr_response: OCRResponse) -> str:
     markdowns = []
     for page in ocr_response.pages:
-        image_data = {img.id: img.image_base64 for img in page.images}
+        image_data = {img.id: img.image_base64 for img in page.images if img.image_base64}
         markdowns.append(replace_images_in_markdown(page.markdown, image_data))
     return "\n\n".join(markdowns)
 
@@ -201,19 +206,17 @@ def main():
 
     for obj in objects:
         key = obj["Key"]
-        if not key.endswith(".json"):
+        if not is_result_key(key):
             continue
 
-        name = key.split("/")[-1].replace(".json", "")
+        name = result_name(key)
         if tracked.get(name) == "passed" or tracked.get(name) == "failed":
             print(f"⏭️ Skipping already processed: {name}")
             continue
 
         print(f"\n--- Processing: {key} ---")
         try:
-            file_obj = s3.get_object(Bucket=bucket_name, Key=key)
-            file_content = file_obj["Body"].read().decode("utf-8")
-            json_data = json.loads(file_content)
+            json_data = load_ocr_result(s3, bucket_name, key)
             ocr_response = OCRResponse.model_validate(json_data)
             markdown = get_combined_markdown(ocr_response)
 
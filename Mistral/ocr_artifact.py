@@ -0,0 +1,205 @@
+# ocr_artifact.py
+"""
+Compact on-disk/S3 format for Mistral OCR results.
+
+A plain result is json.dumps(response, indent=2) with every page image inlined as base64, which
+downstream table extraction never looks at. The compact artifact instead is
+- minified JSON, compressed with zstd (zstandard installed) or gzip: <name>.json.zst / .json.gz
+- without the image bytes: each image's image_base64 is replaced by an "image_ref" naming a
+  binary object under IMAGES_PREFIX, keyed by its sha256, so an image that recurs across pages or
+  filings (logos, signatures, org-chart boxes) is stored once.
+- page-addressable: the JSON is written as one compressed frame per page (plus a head frame with
+  the document fields and a tail frame), and a small <name>.idx object records each page's byte
+  offset and length. Decompressing the whole object across frames gives the complete JSON again,
+  while ocr_pages.PageStore Range-GETs just the frames of the pages it is asked for.
+
+Readers do not need to know which format a key holds: read_ocr_result() sniffs the bytes (zstd,
+gzip or plain JSON) and returns the same dict as before, minus image bytes; pass an ImageStore to
+put them back.
+
+    result = load_ocr_result(s3, bucket, "Cleveland_Mistral/foo.json.zst")
+    result = load_ocr_result(s3, bucket, key, images=ImageStore(s3, bucket))   # with base64 again
+"""
+import gzip
+import json
+import base64
+import hashlib
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+# Optional: zstd compresses OCR JSON smaller and faster than gzip
+try:
+    import zstandard
+    ZSTD = True
+except Exception:
+    zstandard = None  # type: ignore
+    ZSTD = False
+
+CODEC = "zstd" if ZSTD else "gzip"
+SUFFIXES = {"zstd": ".json.zst", "gzip": ".json.gz", "json": ".json"}
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+IMAGES_PREFIX = "ocr_images/"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def result_suffix(compact: bool) -> str:
+    return SUFFIXES[CODEC] if compact else SUFFIXES["json"]
+
+
+def is_result_key(key: str) -> bool:
+    return key.endswith(tuple(SUFFIXES.values()))
+
+
+def result_name(key: str) -> str:
+    """Document name of a result key: ".../foo.json.zst" -> "foo"."""
+    last = key.split("/")[-1]
+    for suffix in sorted(SUFFIXES.values(), key=len, reverse=True):
+        if last.endswith(suffix):
+            return last[:-len(suffix)]
+    return last
+
+
+def index_key(key: str) -> str:
+    """Key of the page index that belongs to result `key`: ".../foo.json.zst" -> ".../foo.idx"."""
+    return key[:len(key) - len(key.split("/")[-1])] + result_name(key) + INDEX_SUFFIX
+
+
+# ---------- compression ----------
+def compress(data: bytes, codec: str = CODEC) -> bytes:
+    if codec == "zstd":
+        if not ZSTD:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+
+def decompress(blob: bytes) -> bytes:
+    """zstd, gzip or uncompressed bytes, told apart by their magic; reads across concatenated frames."""
+    if blob.startswith(ZSTD_MAGIC):
+        if not ZSTD:
+            raise RuntimeError("zstandard is needed to read .zst OCR results (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompressobj(read_across_frames=True).decompress(blob)
+    if blob.startswith(GZIP_MAGIC):
+        return gzip.decompress(blob)
+    return blob
+
+
+# ---------- images ----------
+def _parse_data_url(value: str) -> Tuple[str, bytes]:
+    """("image/jpeg", bytes) from "data:image/jpeg;base64,..." (or bare base64)."""
+    mime = "application/octet-stream"
+    if value.startswith("data:") and "," in value:
+        head, value = value.split(",", 1)
+        mime = head[5:].split(";")[0] or mime
+    return mime, base64.b64decode(value)
+
+
+def externalize_images(result: Dict) -> Tuple[Dict, Dict[str, Tuple[str, bytes]]]:
+    """Copy of result with image bytes replaced by refs, and {ref: (mime, bytes)} for the image store."""
+    images: Dict[str, Tuple[str, bytes]] = {}
+    pages = []
+    for page in result.get("pages") or []:
+        page_images = []
+        for img in page.get("images") or []:
+            b64 = img.get("image_base64")
+            if not b64:
+                page_images.append(img)
+                continue
+            mime, data = _parse_data_url(b64)
+            ref = f"{hashlib.sha256(data).hexdigest()}.{mime.split('/')[-1]}"
+            images[ref] = (mime, data)
+            page_images.append({**img, "image_base64": None, "image_ref": ref})
+        pages.append({**page, "images": page_images})
+    return {**result, "pages": pages}, images
+
+
+class ImageStore:
+    """Content-addressed images under IMAGES_PREFIX; an image already stored is not uploaded again."""
+    def __init__(self, s3, bucket: str, prefix: str = IMAGES_PREFIX):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self._known: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def key(self, ref: str) -> str:
+        return f"{self.prefix}{ref}"
+
+    def put(self, ref: str, mime: str, data: bytes) -> bool:
+        """Store an image; False if it was there already."""
+        with self._lock:
+            if ref in self._known:
+                return False
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self.key(ref))
+            stored = False
+        except Exception:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key(ref), Body=data, ContentType=mime)
+            stored = True
+        with self._lock:
+            self._known.add(ref)
+        return stored
+
+    def get(self, ref: str) -> bytes:
+        return self.s3.get_object(Bucket=self.bucket, Key=self.key(ref))["Body"].read()
+
+    def inline(self, result: Dict) -> Dict:
+        """Put image_base64 back into every page image that only has an image_ref."""
+        for page in result.get("pages") or []:
+            for img in page.get("images") or []:
+                ref = img.get("image_ref")
+                if ref and not img.get("image_base64"):
+                    mime = "image/" + ref.rsplit(".", 1)[-1]
+                    img["image_base64"] = f"data:{mime};base64,{base64.b64encode(self.get(ref)).decode()}"
+        return result
+
+
+# ---------- artifacts ----------
+def _minified(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def pack(result: Dict, codec: str = CODEC) -> Tuple[bytes, Dict[str, Tuple[str, bytes]], Dict]:
+    """
+    (artifact bytes, {ref: (mime, bytes)}, page index). The artifact is the minified JSON without
+    image bytes, split into independently compressed frames: head `{...,"pages":[`, one frame per
+    page (`,` + page JSON after the first), tail `]}`.
+    """
+    slim, images = externalize_images(result)
+    pages = slim.pop("pages", [])
+    doc = _minified(slim)
+    texts = [doc[:-1] + ("," if slim else "") + '"pages":[']
+    texts += [("," if i else "") + _minified(page) for i, page in enumerate(pages)]
+    texts.append("]}")
+    frames = [compress(t.encode("utf-8"), codec) for t in texts]
+    offsets = []
+    pos = 0
+    for frame in frames:
+        offsets.append([pos, len(frame)])
+        pos += len(frame)
+    index = {"v": INDEX_VERSION, "codec": codec, "suffix": SUFFIXES[codec], "size": pos,
+             "head": offsets[0], "tail": offsets[-1],
+             "pages": [[page.get("index", i), *offsets[i + 1]] for i, page in enumerate(pages)]}
+    return b"".join(frames), images, index
+
+
+def read_page_frame(frame: bytes) -> Dict:
+    """One page from the bytes of its frame (as located by the index)."""
+    return json.loads(decompress(frame).decode("utf-8").lstrip(","))
+
+
+def read_ocr_result(blob: bytes, images: Optional[ImageStore] = None) -> Dict:
+    """An OCR result from the bytes of any format: plain JSON, or a compact artifact."""
+    result = json.loads(decompress(blob).decode("utf-8"))
+    return images.inline(result) if images else result
+
+
+def load_ocr_result(s3, bucket: str, key: str, images: Optional[ImageStore] = None) -> Dict:
+    return read_ocr_result(s3.get_object(Bucket=bucket, Key=key)["Body"].read(), images)
@@ -0,0 +1,387 @@
+# ocr_batch.py
+"""
+Batch mode for the OCR scripts: instead of one synchronous client.ocr.process call per document,
+every not-yet-processed document of a district is written as one line of a JSONL request file,
+submitted as a single Mistral batch job (endpoint /v1/ocr), polled until the job finishes, and the
+results are fanned back out exactly as the synchronous path does it — one JSON per document under
+the engine's output prefix, a processed-CSV row per success and a failed-CSV row per failure.
+
+    python read_dallas_pdfs.py --batch                  # real batch job
+    python read_dallas_pdfs.py --batch-stub ./stub      # offline: StubBatchTransport in ./stub
+
+Work files live in a per-district work dir (requests.jsonl, state.json, the downloaded
+output/error files). state.json is written as soon as the job is submitted, so an interrupted
+run picks up the same job on the next start instead of submitting a new one; it is removed once
+the results are fanned out.
+
+PDFs read as bytes (Cleveland, CapIQ) are uploaded first and referenced by a signed URL that
+outlives the job. With dedupe on, content already OCR'd is copied as in the synchronous path, and
+byte-identical documents inside one batch share a single request.
+
+The transport is the only part that talks to Mistral; anything with document_url / submit /
+status / download works, e.g. StubBatchTransport for offline runs.
+"""
+import json
+import time
+import shutil
+import hashlib
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ocr_engine import OCR_MODEL, OcrEngine, OcrItem, download_pdf
+from page_select import PageSelection
+from ocr_hashes import pdf_sha256, record_ocr_hash, reuse_ocr_json
+
+OCR_ENDPOINT = "/v1/ocr"
+BATCH_TIMEOUT_HOURS = 24
+POLL_EVERY = 60                     # seconds between job status checks
+DONE_STATUSES = {"SUCCESS", "FAILED", "TIMEOUT_EXCEEDED", "CANCELLED"}
+
+
+class BatchStatus(NamedTuple):
+    status: str
+    total: int
+    succeeded: int
+    failed: int
+    files: Tuple[str, ...] = ()     # result files to download (output, then errors) once done
+
+
+# ---------- transports ----------
+class MistralBatchTransport:
+    def __init__(self, client, model: str = OCR_MODEL, timeout_hours: int = BATCH_TIMEOUT_HOURS):
+        self.client = client
+        self.model = model
+        self.timeout_hours = timeout_hours
+
+    def document_url(self, pdf_bytes: bytes, name: str) -> str:
+        # the signed URL must stay valid until the job has run, not just for a few minutes
+        uploaded = self.client.files.upload(file={"file_name": f"{name}.pdf", "content": pdf_bytes}, purpose="ocr")
+        return self.client.files.get_signed_url(file_id=uploaded.id, expiry=self.timeout_hours + 24).url
+
+    def submit(self, requests_path: Path, metadata: Dict[str, str]) -> str:
+        with open(requests_path, "rb") as f:
+            uploaded = self.client.files.upload(file={"file_name": requests_path.name, "content": f},
+                                                purpose="batch")
+        job = self.client.batch.jobs.create(input_files=[uploaded.id], endpoint=OCR_ENDPOINT, model=self.model,
+                                            metadata=metadata, timeout_hours=self.timeout_hours)
+        return job.id
+
+    def status(self, job_id: str) -> BatchStatus:
+        job = self.client.batch.jobs.get(job_id=job_id)
+        return BatchStatus(job.status, job.total_requests or 0, job.succeeded_requests or 0,
+                           job.failed_requests or 0, tuple(f for f in (job.output_file, job.error_file) if f))
+
+    def download(self, file_id: str, dest: Path):
+        resp = self.client.files.download(file_id=file_id)
+        with open(dest, "wb") as f:
+            for chunk in resp.iter_bytes():
+                f.write(chunk)
+
+
+def stub_ocr(body: Dict) -> Dict:
+    """Minimal OCR response (the shape of client.ocr.process's JSON) naming the document it was for."""
+    url = (body.get("document") or {}).get("document_url", "")
+    pages = body.get("pages") or [0]
+    return {"pages": [{"index": i, "markdown": f"(stub OCR of {url}, page {i})", "images": [], "dimensions": None}
+                      for i in pages],
+            "model": "stub", "document_annotation": None,
+            "usage_info": {"pages_processed": len(pages), "doc_size_bytes": None}}
+
+
+class StubBatchTransport:
+    """
+    Offline stand-in for MistralBatchTransport, kept in a local directory. A job reports QUEUED and
+    RUNNING for `polls` status checks, then answers every request with ocr(body) — stub_ocr by
+    default — or, where fail(body) returns a message, with an error line.
+    """
+    def __init__(self, root, ocr: Callable[[Dict], Dict] = stub_ocr,
+                 fail: Optional[Callable[[Dict], Optional[str]]] = None, polls: int = 2):
+        self.root = Path(root)
+        self.ocr = ocr
+        self.fail = fail
+        self.polls = polls
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def document_url(self, pdf_bytes: bytes, name: str) -> str:
+        path = self.root / "files" / f"{pdf_sha256(pdf_bytes)[:16]}_{name}.pdf"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(pdf_bytes)
+        return path.resolve().as_uri()
+
+    def submit(self, requests_path: Path, metadata: Dict[str, str]) -> str:
+        job_id = "stub-" + hashlib.sha1(f"{requests_path}{time.time()}".encode()).hexdigest()[:12]
+        job_dir = self.root / job_id
+        job_dir.mkdir()
+        shutil.copy(requests_path, job_dir / "input.jsonl")
+        (job_dir / "job.json").write_text(json.dumps({"checks": 0, "metadata": metadata}))
+        return job_id
+
+    def _run(self, job_dir: Path) -> Tuple[int, int, int]:
+        total = ok = 0
+        with open(job_dir / "input.jsonl") as src, open(job_dir / "output.jsonl", "w") as out, \
+                open(job_dir / "error.jsonl", "w") as err:
+            for line in src:
+                if not line.strip():
+                    continue
+                req = json.loads(line)
+                total += 1
+                msg = self.fail(req["body"]) if self.fail else None
+                if msg:
+                    err.write(json.dumps({"custom_id": req["custom_id"], "error": {"message": msg},
+                                          "response": {"status_code": 400, "body": {"message": msg}}}) + "\n")
+                    continue
+                ok += 1
+                out.write(json.dumps({"custom_id": req["custom_id"], "error": None,
+                                      "response": {"status_code": 200, "body": self.ocr(req["body"])}}) + "\n")
+        return total, ok, total - ok
+
+    def status(self, job_id: str) -> BatchStatus:
+        job_dir = self.root / job_id
+        job = json.loads((job_dir / "job.json").read_text())
+        job["checks"] += 1
+        if job["checks"] > self.polls and "counts" not in job:
+            job["counts"] = self._run(job_dir)
+        (job_dir / "job.json").write_text(json.dumps(job))
+        if "counts" not in job:
+            return BatchStatus("QUEUED" if job["checks"] == 1 else "RUNNING", 0, 0, 0)
+        total, ok, failed = job["counts"]
+        return BatchStatus("SUCCESS", total, ok, failed,
+                           (str(job_dir / "output.jsonl"), str(job_dir / "error.jsonl")))
+
+    def download(self, file_id: str, dest: Path):
+        shutil.copy(file_id, dest)
+
+
+# ---------- result lines ----------
+def read_results(path: Path) -> Iterator[Tuple[str, Optional[Dict], str]]:
+    """(custom_id, OCR JSON or None, error message) for every line of a batch output/error file."""
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            resp = row.get("response") or {}
+            body = resp.get("body")
+            if resp.get("status_code") == 200 and isinstance(body, dict) and not row.get("error"):
+                yield row["custom_id"], body, ""
+                continue
+            err = row.get("error") or body or f"HTTP {resp.get('status_code')}"
+            if isinstance(err, dict):
+                err = err.get("message") or json.dumps(err)
+            yield row["custom_id"], None, f"batch: {str(err)[:500]}"
+
+
+# ---------- runner ----------
+class OcrBatch:
+    def __init__(self, engine: OcrEngine, transport, work_dir, poll_every: float = POLL_EVERY):
+        self.engine = engine
+        self.transport = transport
+        self.work_dir = Path(work_dir)
+        self.poll_every = poll_every
+        self.state_file = self.work_dir / "state.json"
+        self.requests_file = self.work_dir / "requests.jsonl"
+        self.selections: Dict[str, Dict] = {}   # custom_id -> page_selection record, for the results
+
+    # ---------- state ----------
+    def load_state(self) -> Optional[Dict]:
+        try:
+            return json.loads(self.state_file.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save_state(self, state: Dict):
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        tmp.replace(self.state_file)
+
+    # ---------- build the request file ----------
+    def _request_url(self, item: OcrItem) -> Tuple[OcrItem, str, Optional[PageSelection]]:
+        """
+        (item with its sha, URL Mistral should OCR, page selection); byte items are uploaded and
+        pages selected here (worker threads).
+        """
+        engine = self.engine
+        if item.fetch is None:
+            selection = engine.choose_pages(item.name, download_pdf(item.url)) if engine.select_pages else None
+            return item, item.url, selection
+        pdf_bytes = item.fetch()
+        item = item._replace(sha=item.sha or pdf_sha256(pdf_bytes), fetch=None)
+        if engine.dedupe and item.sha in engine.ocr_hashes:
+            return item, "", None    # reused in _add, no upload needed
+        selection = engine.choose_pages(item.name, pdf_bytes)
+        url = engine.with_retries(item.name, lambda: self.transport.document_url(pdf_bytes, item.name))
+        return item, url, selection
+
+    def _add(self, item: OcrItem, future, requests: Dict[str, List], by_sha: Dict[str, str], out):
+        engine = self.engine
+        try:
+            item, url, selection = future.result()
+        except Exception as e:
+            msg = f"{e.__class__.__name__}: {e}"
+            print(f"❌ Failed: {item.identifier} — {msg}")
+            traceback.print_exception(e)
+            engine.log_failure(item.identifier, msg, item.extra)
+            return
+        entry = [item.identifier, item.name, list(item.extra), item.sha]
+        if engine.dedupe and item.sha:
+            json_key = engine.result_key(item.name)
+            if reuse_ocr_json(engine.s3, engine.bucket, engine.ocr_hashes, item.sha, json_key,
+                              rewrite=lambda src: engine.rewrite_result(src, item.name)):
+                print(f"🧬 Same content already OCR'd → s3://{engine.bucket}/{json_key}")
+                engine.counts["reused"] += 1
+                engine.mark_processed(item.identifier)
+                return
+            if item.sha in by_sha:
+                requests[by_sha[item.sha]].append(entry)   # one request, fanned out to both names
+                return
+        custom_id = str(len(requests))
+        requests[custom_id] = [entry]
+        if item.sha:
+            by_sha[item.sha] = custom_id
+        body = {"document": {"type": "document_url", "document_url": url},
+                "include_image_base64": engine.include_images}
+        if selection:
+            body["pages"] = selection.pages
+            self.selections[custom_id] = selection.record()
+        out.write(json.dumps({"custom_id": custom_id, "body": body}) + "\n")
+
+    def prepare(self, *sources: Iterable[OcrItem]) -> Dict[str, List]:
+        """Write requests.jsonl for every not-yet-processed item; returns custom_id -> [entries]."""
+        engine = self.engine
+        requests: Dict[str, List] = {}
+        by_sha: Dict[str, str] = {}
+        self.selections = {}
+        seen = set()
+        pending = {}
+        with open(self.requests_file, "w") as out, ThreadPoolExecutor(max_workers=engine.workers) as pool:
+            for source in sources:
+                for item in source:
+                    if item.identifier in engine.processed or item.identifier in seen:
+                        engine.counts["skipped"] += 1
+                        continue
+                    seen.add(item.identifier)
+                    while len(pending) >= 2 * engine.workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in done:
+                            self._add(pending.pop(f), f, requests, by_sha, out)
+                    pending[pool.submit(self._request_url, item)] = item
+            for f in list(pending):
+                self._add(pending.pop(f), f, requests, by_sha, out)
+        return requests
+
+    # ---------- job ----------
+    def submit(self, requests: Dict[str, List]) -> Dict:
+        metadata = {"output_prefix": self.engine.output_prefix, "documents": str(len(requests))}
+        job_id = self.engine.with_retries("batch submit", lambda: self.transport.submit(self.requests_file, metadata))
+        state = {"job_id": job_id, "submitted": time.strftime("%Y-%m-%d %H:%M:%S"), "requests": requests,
+                 "selections": self.selections}
+        self.save_state(state)
+        print(f"📤 Submitted batch job {job_id} with {len(requests)} documents.")
+        return state
+
+    def wait(self, job_id: str) -> BatchStatus:
+        last = None
+        while True:
+            st = self.engine.with_retries("batch status", lambda: self.transport.status(job_id))
+            progress = (st.status, st.succeeded, st.failed)
+            if progress != last:
+                print(f"⏳ Batch {job_id}: {st.status} — {st.succeeded} ok, {st.failed} failed of {st.total}")
+                last = progress
+            if st.status in DONE_STATUSES:
+                return st
+            time.sleep(self.poll_every)
+
+    # ---------- fan out ----------
+    def _write(self, body: Dict, entries: List, selection: Optional[Dict]) -> List[str]:
+        if selection:
+            body["page_selection"] = selection
+        return [self.engine.write_result(body, name) for _, name, _, _ in entries]
+
+    def _finish(self, entries: List, future):
+        engine = self.engine
+        try:
+            keys = future.result()
+        except Exception as e:
+            msg = f"{e.__class__.__name__}: {e}"
+            print(f"❌ Failed: {entries[0][0]} — {msg}")
+            for identifier, _, extra, _ in entries:
+                engine.log_failure(identifier, msg, tuple(extra))
+            return
+        for (identifier, _, _, sha), key in zip(entries, keys):
+            print(f"✅ Uploaded OCR JSON → s3://{engine.bucket}/{key}")
+            engine.counts["done"] += 1
+            engine.mark_processed(identifier)
+        sha = entries[0][3]
+        if engine.dedupe and sha:
+            record_ocr_hash(engine.ocr_hashes, sha, keys[0])
+
+    def collect(self, state: Dict, st: BatchStatus):
+        engine = self.engine
+        requests: Dict[str, List] = state["requests"]
+        selections: Dict[str, Dict] = state.get("selections") or {}
+        answered = set()
+        pending = {}
+        with ThreadPoolExecutor(max_workers=engine.workers) as pool:
+            for i, file_id in enumerate(st.files):
+                dest = self.work_dir / f"{state['job_id']}_{i}.jsonl"
+                engine.with_retries("batch download", lambda: self.transport.download(file_id, dest))
+                for custom_id, body, err in read_results(dest):
+                    entries = requests.get(custom_id)
+                    if not entries or custom_id in answered:
+                        continue
+                    answered.add(custom_id)
+                    if body is None:
+                        print(f"❌ Failed: {entries[0][0]} — {err}")
+                        for identifier, _, extra, _ in entries:
+                            engine.log_failure(identifier, err, tuple(extra))
+                        continue
+                    while len(pending) >= 2 * engine.workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in done:
+                            self._finish(pending.pop(f), f)
+                    pending[pool.submit(self._write, body, entries, selections.get(custom_id))] = entries
+            for f in list(pending):
+                self._finish(pending.pop(f), f)
+        for custom_id, entries in requests.items():
+            if custom_id not in answered:
+                for identifier, _, extra, _ in entries:
+                    engine.log_failure(identifier, f"batch: no result (job {st.status})", tuple(extra))
+
+    def run(self, *sources: Iterable[OcrItem]) -> Dict[str, int]:
+        """OCR every not-yet-processed item of the sources in one batch job (or finish the pending one)."""
+        engine = self.engine
+        engine.output_dir.mkdir(parents=True, exist_ok=True)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        state = self.load_state()
+        if state:
+            print(f"🔁 Resuming batch job {state['job_id']} ({len(state['requests'])} documents); "
+                  f"new documents go into the next batch.")
+        else:
+            requests = self.prepare(*sources)
+            if not requests:
+                print("Nothing to submit.")
+                return engine.counts
+            state = self.submit(requests)
+        st = self.wait(state["job_id"])
+        self.collect(state, st)
+        self.state_file.unlink(missing_ok=True)
+        c = engine.counts
+        print(f"🏁 Batch {state['job_id']} {st.status}. {c['done']} OCR'd, {c['reused']} reused, "
+              f"{c['failed']} failed, {c['skipped']} already processed.")
+        return c
+
+
+# ---------- script wiring ----------
+def add_batch_args(ap):
+    ap.add_argument("--batch", action="store_true", help="Submit one Mistral batch job instead of calling OCR per document.")
+    ap.add_argument("--batch-stub", default="", metavar="DIR", help="Batch mode against a local stub kept in DIR (offline).")
+
+
+def run_ocr(engine: OcrEngine, args, work_dir, *sources: Iterable[OcrItem]) -> Dict[str, int]:
+    """engine.run(*sources), or a batch job when --batch / --batch-stub was given."""
+    if not (args.batch or args.batch_stub):
+        return engine.run(*sources)
+    transport = StubBatchTransport(args.batch_stub) if args.batch_stub else MistralBatchTransport(engine.client)
+    return OcrBatch(engine, transport, work_dir, poll_every=1 if args.batch_stub else POLL_EVERY).run(*sources)
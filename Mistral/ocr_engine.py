@@ -0,0 +1,391 @@
+# ocr_engine.py
+"""
+One OCR loop for every district and CapIQ: a source yields documents, up to `workers` Mistral
+OCR calls run at once on a thread pool, and each JSON result goes to S3 under the output prefix.
+
+Sources (generators of OcrItem, consumed lazily so ZIPs and PDF bytes are not all held at once):
+    url_list_source(path)                     JSON array of PDF URLs (Dallas, Minneapolis, Richmond)
+    s3_prefix_source(s3, bucket, prefix)      PDFs stored under an S3 prefix (Cleveland, CapIQ)
+    content_store_source(s3, bucket, source)  PDFs in the content-addressed PDFStore/ (Scraper/pdf_store.py)
+    zip_members_source(s3, bucket, prefix)    PDFs inside ZIPs under an S3 prefix, range-read (legacy CapIQ)
+
+Bookkeeping is unchanged from the per-district scripts: an item whose identifier is in the
+processed CSV is skipped, a success appends its identifier there, and a failure appends
+[identifier, *extra, error] to the failed CSV. Both files are written from the main thread only.
+PDFs read as bytes are hashed, and content that was OCR'd before is copied, not re-OCR'd
+(ocr_hashes.py). Rate-limit and server errors are retried with backoff. With compact=True results
+are written in the compact, page-addressable format of ocr_artifact.py (read pages back with
+ocr_pages.PageStore) instead of pretty-printed JSON. With select_pages=True only the pages that
+page_select.py picks (cover, shareholder and insider sections) are sent to Mistral.
+"""
+import io
+import os
+import csv
+import json
+import time
+import random
+import threading
+import zipfile
+import traceback
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+from mistralai import DocumentURLChunk, FileTypedDict
+
+from s3_range_file import S3RangeFile
+from page_select import PageSelection, select_pages
+from ocr_artifact import INDEX_SUFFIX, ImageStore, index_key, load_ocr_result, pack, result_suffix
+from ocr_hashes import load_ocr_hashes, pdf_sha256, record_ocr_hash, reuse_ocr_json
+
+OCR_MODEL = "mistral-ocr-latest"
+OCR_WORKERS = 8
+MAX_ATTEMPTS = 5
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+DOWNLOAD_TIMEOUT = 120
+STORE_PREFIX = "PDFStore/"   # layout of Scraper/pdf_store.py: <prefix><sha[:2]>/<sha>.pdf + <prefix>index/<source>.csv
+
+
+class OcrItem(NamedTuple):
+    identifier: str                                 # what the processed/failed CSVs record
+    name: str                                       # output is <output_prefix><name>.json (or .json.zst, compact)
+    url: Optional[str] = None                       # OCR straight from this URL ...
+    fetch: Optional[Callable[[], bytes]] = None     # ... or from these bytes (uploaded to Mistral first)
+    sha: Optional[str] = None                       # sha256 of the bytes, when already known
+    extra: Tuple = ()                               # extra failed-CSV columns (e.g. the ZIP key)
+
+
+# ---------- names ----------
+def clean_name(name: str) -> str:
+    return "".join(c for c in name if c not in r'<>:"/\|?*') or "output"
+
+
+def name_from_url(url: str) -> str:
+    last = unquote(os.path.basename(urlparse(url).path))
+    if last.lower().endswith(".pdf"):
+        last = last[:-4]
+    return last
+
+
+def name_from_key(key: str) -> str:
+    name = unquote(key.split("/")[-1])
+    if name.lower().endswith(".pdf"):
+        name = name[:-4]
+    return clean_name(name)
+
+
+def download_pdf(url: str) -> bytes:
+    """PDF bytes of a URL item, for page selection (Mistral itself still reads the URL)."""
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as resp:
+        return resp.read()
+
+
+# ---------- sources ----------
+def read_url_list(path: str):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} must be a JSON array of URLs")
+    return data
+
+
+def url_list_source(path: str) -> Iterator[OcrItem]:
+    for url in read_url_list(path):
+        url = url.strip()
+        if url:
+            yield OcrItem(url, name_from_url(url), url=url)
+
+
+def list_objects(s3, bucket: str, prefix: str, suffix: str):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].lower().endswith(suffix):
+                yield obj
+
+
+def list_keys(s3, bucket: str, prefix: str, suffix: str):
+    for obj in list_objects(s3, bucket, prefix, suffix):
+        yield obj["Key"]
+
+
+def s3_prefix_source(s3, bucket: str, prefix: str, identify: Callable[[str], str] = lambda key: key,
+                     name: Callable[[str], str] = name_from_key, extra: bool = False) -> Iterator[OcrItem]:
+    """Every .pdf under prefix. `identify(key)` gives the CSV identifier (default: the key itself)."""
+    for key in list_keys(s3, bucket, prefix, ".pdf"):
+        def fetch(key=key):
+            return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        yield OcrItem(identify(key), name(key), fetch=fetch, extra=(key,) if extra else ())
+
+
+def content_store_source(s3, bucket: str, source: str, identify: Callable[[Dict], str],
+                         name: Callable[[Dict], str], store_prefix: str = STORE_PREFIX,
+                         extra: bool = False) -> Iterator[OcrItem]:
+    """
+    PDFs a scraper put in the content store (e.g. scraper_cleveland.py --content-store), found
+    through the index rows (url, sha256, size, source, filename) in <store_prefix>index/<source>.csv.
+    Rows of the older single <store_prefix>index.csv are read first, so the per-source object
+    wins. `identify(row)` / `name(row)` should match the district's prefix source, so a PDF that
+    is in both places is OCR'd once.
+    """
+    rows: Dict[str, Dict] = {}
+    for key in (f"{store_prefix}index.csv", f"{store_prefix}index/{source}.csv"):
+        try:
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except s3.exceptions.NoSuchKey:
+            continue
+        for row in csv.DictReader(io.StringIO(body.decode("utf-8"))):
+            if row.get("source") == source:
+                rows[row["url"]] = row
+    for row in rows.values():
+        key = f"{store_prefix}{row['sha256'][:2]}/{row['sha256']}.pdf"
+        def fetch(key=key):
+            return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        yield OcrItem(identify(row), name(row), fetch=fetch, sha=row["sha256"], extra=(key,) if extra else ())
+
+
+def zip_members_source(s3, bucket: str, prefix: str, member_filter: Callable[[str], bool],
+                       member_name: Callable[[str], str], on_error: Optional[Callable] = None,
+                       skip: Callable[[str], bool] = lambda name: False) -> Iterator[OcrItem]:
+    """
+    PDF members of every .zip under prefix that pass member_filter(filename) and are not skip(name).
+    ZIPs are read through S3RangeFile: only the central directory is fetched to list the members,
+    a ZIP with nothing left to do is not downloaded at all, and each remaining member is
+    range-read by the OCR worker that needs it. A ZIP that cannot be read is reported through
+    on_error(identifier, error, extra).
+    """
+    for obj in list_objects(s3, bucket, prefix, ".zip"):
+        key = obj["Key"]
+        try:
+            z = zipfile.ZipFile(S3RangeFile(s3, bucket, key, obj.get("Size"), obj.get("ETag")))
+        except Exception as e:
+            print(f"❌ Error reading ZIP '{key}': {e}")
+            traceback.print_exc()
+            if on_error:
+                on_error("", f"{e}", (key,))
+            continue
+        todo = [(info, member_name(info.filename)) for info in z.infolist() if member_filter(info.filename)]
+        todo = [(info, name) for info, name in todo if not skip(name)]
+        if not todo:
+            print(f"⏭️ ZIP already processed: {key}")
+            continue
+        print(f"\n🔍 Processing ZIP file: {key} ({len(todo)} PDFs to OCR)")
+        for info, name in todo:
+            yield OcrItem(name, name, fetch=lambda z=z, info=info: z.read(info), extra=(key,))
+
+
+# ---------- engine ----------
+class OcrEngine:
+    def __init__(self, client, s3, bucket: str, output_prefix: str, output_dir: Path,
+                 processed_file: str, failed_file: str, failed_header=("identifier", "error_message"),
+                 workers: int = OCR_WORKERS, include_images: bool = True, keep_local: bool = False,
+                 dedupe: bool = True, signed_url_expiry: int = 1, compact: bool = False,
+                 select_pages: bool = False):
+        self.client = client
+        self.s3 = s3
+        self.bucket = bucket
+        self.output_prefix = output_prefix
+        self.output_dir = Path(output_dir)
+        self.processed_file = processed_file
+        self.failed_file = failed_file
+        self.failed_header = list(failed_header)
+        self.workers = max(1, workers)
+        self.include_images = include_images
+        self.keep_local = keep_local
+        self.dedupe = dedupe
+        self.signed_url_expiry = signed_url_expiry
+        self.compact = compact
+        self.select_pages = select_pages
+        self.images = ImageStore(s3, bucket) if compact and s3 is not None else None
+        self.processed = self.load_processed()
+        self.ocr_hashes: Dict[str, str] = load_ocr_hashes() if dedupe else {}
+        self.counts = {"done": 0, "reused": 0, "failed": 0, "skipped": 0}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}   # sha -> set when its first copy is done
+
+    # ---------- bookkeeping (main thread) ----------
+    def load_processed(self) -> Set[str]:
+        if not Path(self.processed_file).exists():
+            return set()
+        with open(self.processed_file, newline="") as f:
+            return {row[0] for row in csv.reader(f) if row}
+
+    def mark_processed(self, identifier: str):
+        with open(self.processed_file, "a", newline="") as f:
+            csv.writer(f).writerow([identifier])
+        self.processed.add(identifier)
+
+    def log_failure(self, identifier: str, error_msg: str, extra: Tuple = ()):
+        header_needed = not Path(self.failed_file).exists()
+        with open(self.failed_file, "a", newline="") as f:
+            w = csv.writer(f)
+            if header_needed:
+                w.writerow(self.failed_header)
+            w.writerow([identifier, *extra, error_msg])
+        self.counts["failed"] += 1
+
+    # ---------- OCR (worker threads) ----------
+    def with_retries(self, what: str, call: Callable):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                return call()
+            except Exception as e:
+                status = getattr(e, "status_code", None) or getattr(getattr(e, "raw_response", None), "status_code", None)
+                if status not in RETRY_STATUS or attempt == MAX_ATTEMPTS:
+                    raise
+                delay = min(60, 2 ** attempt) + random.random()
+                print(f"⏳ {what}: HTTP {status}, retrying in {delay:.0f}s (attempt {attempt}/{MAX_ATTEMPTS})")
+                time.sleep(delay)
+
+    def ocr_document_url(self, url: str, pages: Optional[List[int]] = None) -> Dict:
+        extra = {"pages": pages} if pages is not None else {}
+        resp = self.with_retries(url, lambda: self.client.ocr.process(
+            document=DocumentURLChunk(document_url=url),
+            model=OCR_MODEL,
+            include_image_base64=self.include_images,
+            **extra,
+        ))
+        return json.loads(resp.model_dump_json())
+
+    def ocr_bytes(self, pdf_bytes: bytes, name: str, pages: Optional[List[int]] = None) -> Dict:
+        # Upload PDF bytes to Mistral first (purpose="ocr"), then OCR its short-lived signed URL
+        file_dict: FileTypedDict = {"file_name": f"{name}.pdf", "content": pdf_bytes}
+        uploaded = self.with_retries(name, lambda: self.client.files.upload(file=file_dict, purpose="ocr"))
+        signed = self.with_retries(name, lambda: self.client.files.get_signed_url(
+            file_id=uploaded.id, expiry=self.signed_url_expiry))
+        return self.ocr_document_url(signed.url, pages)
+
+    def choose_pages(self, name: str, pdf_bytes: bytes) -> Optional[PageSelection]:
+        """The page_select.py selection for this PDF (None when select_pages is off or all pages go)."""
+        if not self.select_pages:
+            return None
+        selection = select_pages(pdf_bytes)
+        if selection.pages is None:
+            print(f"📑 {name}: OCR all pages ({selection.reason})")
+            return None
+        print(f"📑 {name}: OCR {len(selection.pages)} of {selection.page_count} pages {selection.pages}")
+        return selection
+
+    def ocr(self, name: str, url: Optional[str] = None, pdf_bytes: Optional[bytes] = None) -> Dict:
+        """OCR a PDF given by URL or bytes; with select_pages, only the pages page_select.py keeps."""
+        if self.select_pages and pdf_bytes is None:
+            pdf_bytes = download_pdf(url)
+        selection = self.choose_pages(name, pdf_bytes) if pdf_bytes is not None else None
+        pages = selection.pages if selection else None
+        result = self.ocr_document_url(url, pages) if url else self.ocr_bytes(pdf_bytes, name, pages)
+        if selection:
+            result["page_selection"] = selection.record()
+        return result
+
+    def result_key(self, name: str) -> str:
+        return f"{self.output_prefix}{name}{result_suffix(self.compact)}"
+
+    def write_result(self, result: Dict, name: str) -> str:
+        out_path = self.output_dir / f"{name}{result_suffix(self.compact)}"
+        idx_path = self.output_dir / f"{name}{INDEX_SUFFIX}"
+        if self.compact:
+            blob, images, index = pack(result)
+            out_path.write_bytes(blob)
+            idx_path.write_text(json.dumps(index, separators=(",", ":")))
+            if self.images is not None:
+                # images first, so no reader ever sees a ref to an image that is not stored yet
+                for ref, (mime, data) in images.items():
+                    self.images.put(ref, mime, data)
+        else:
+            out_path.write_text(json.dumps(result, indent=2))
+        key = f"{self.output_prefix}{out_path.name}"
+        if self.s3 is not None:
+            self.s3.upload_file(str(out_path), self.bucket, key)
+            if self.compact:
+                # after the result it points into (ocr_pages.py)
+                self.s3.upload_file(str(idx_path), self.bucket, index_key(key))
+        if not self.keep_local:
+            out_path.unlink(missing_ok=True)
+            idx_path.unlink(missing_ok=True)
+        return key
+
+    def rewrite_result(self, src_key: str, name: str) -> str:
+        """
+        Write an earlier result stored in another format as `name` in this engine's format (used
+        when reusing OCR of identical content). Plain output gets its image bytes back from the
+        image store; compact output keeps the image refs as they are.
+        """
+        images = None if self.compact or not self.include_images else ImageStore(self.s3, self.bucket)
+        return self.write_result(load_ocr_result(self.s3, self.bucket, src_key, images), name)
+
+    def process(self, item: OcrItem) -> Tuple[str, Optional[str], str]:
+        """OCR one item. Returns (status, sha, json_key) with status "done" or "reused"."""
+        json_key = self.result_key(item.name)
+        if item.fetch is None:
+            return "done", None, self.write_result(self.ocr(item.name, url=item.url), item.name)
+        pdf_bytes = item.fetch()
+        sha = item.sha or pdf_sha256(pdf_bytes)
+        if not self.dedupe:
+            return "done", sha, self.write_result(self.ocr(item.name, pdf_bytes=pdf_bytes), item.name)
+
+        # identical bytes in flight at the same time: the first copy is OCR'd, the others wait and reuse it
+        with self._lock:
+            first = self._inflight.get(sha)
+            if first is None:
+                self._inflight[sha] = threading.Event()
+        if first is not None:
+            first.wait()
+        if reuse_ocr_json(self.s3, self.bucket, self.ocr_hashes, sha, json_key,
+                          rewrite=lambda src: self.rewrite_result(src, item.name)):
+            return "reused", sha, json_key
+        if first is not None:
+            return self.process(item._replace(sha=sha, fetch=lambda: pdf_bytes))  # the first copy failed
+        try:
+            key = self.write_result(self.ocr(item.name, pdf_bytes=pdf_bytes), item.name)
+            self.ocr_hashes[sha] = key  # visible to waiting duplicates now; the CSV row is written by _finish
+            return "done", sha, key
+        finally:
+            with self._lock:
+                self._inflight.pop(sha).set()
+
+    # ---------- driver ----------
+    def _finish(self, item: OcrItem, future):
+        try:
+            status, sha, json_key = future.result()
+        except Exception as e:
+            msg = f"{e.__class__.__name__}: {e}"
+            print(f"❌ Failed: {item.identifier} — {msg}")
+            traceback.print_exception(e)
+            self.log_failure(item.identifier, msg, item.extra)
+            return
+        if status == "reused":
+            print(f"🧬 Same content already OCR'd → s3://{self.bucket}/{json_key}")
+        else:
+            print(f"✅ Uploaded OCR JSON → s3://{self.bucket}/{json_key}")
+            if self.dedupe and sha:
+                record_ocr_hash(self.ocr_hashes, sha, json_key)
+        self.counts[status] += 1
+        self.mark_processed(item.identifier)
+
+    def run(self, *sources: Iterable[OcrItem]) -> Dict[str, int]:
+        """OCR every not-yet-processed item of the sources, `workers` at a time."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        seen: Set[str] = set()
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for source in sources:
+                for item in source:
+                    if item.identifier in self.processed or item.identifier in seen:
+                        self.counts["skipped"] += 1
+                        continue
+                    seen.add(item.identifier)
+                    # bounded look-ahead: never more than 2x workers items (and their bytes) in memory
+                    while len(pending) >= 2 * self.workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in done:
+                            self._finish(pending.pop(f), f)
+                    print(f"📄 Processing: {item.identifier}  ->  {item.name}{result_suffix(self.compact)}")
+                    pending[pool.submit(self.process, item)] = item
+            for f in list(pending):
+                self._finish(pending.pop(f), f)
+        c = self.counts
+        print(f"🏁 Done. {c['done']} OCR'd, {c['reused']} reused, {c['failed']} failed, "
+              f"{c['skipped']} already processed.")
+        return c
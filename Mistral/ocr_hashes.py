@@ -0,0 +1,68 @@
+# ocr_hashes.py
+"""
+Content-hash bookkeeping so byte-identical PDFs (renamed Cleveland files, CapIQ ZIP members that
+duplicate district filings, ...) are OCR'd once. Maps sha256(pdf) -> S3 key of its OCR JSON.
+"""
+import csv
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ocr_artifact import SUFFIXES, index_key, result_name
+
+OCR_HASHES_FILE = "ocr_hashes.csv"
+
+
+def pdf_sha256(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def load_ocr_hashes() -> Dict[str, str]:
+    if not Path(OCR_HASHES_FILE).exists():
+        return {}
+    with open(OCR_HASHES_FILE, newline="") as f:
+        return {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2 and row[0] != "sha256"}
+
+
+def record_ocr_hash(hashes: Dict[str, str], sha: str, json_key: str):
+    header_needed = not Path(OCR_HASHES_FILE).exists()
+    with open(OCR_HASHES_FILE, "a", newline="") as f:
+        w = csv.writer(f)
+        if header_needed:
+            w.writerow(["sha256", "json_key"])
+        w.writerow([sha, json_key])
+    hashes[sha] = json_key
+
+
+def _suffix(key: str) -> str:
+    """".json", ".json.zst" or ".json.gz" of a result key."""
+    return key.split("/")[-1][len(result_name(key)):]
+
+
+def reuse_ocr_json(s3, bucket: str, hashes: Dict[str, str], sha: str, dest_key: str,
+                   rewrite: Optional[Callable[[str], object]] = None) -> bool:
+    """
+    If this content was OCR'd before, put its result at dest_key and return True. A result in
+    dest_key's format is copied (a compact one with its page index). One in another format (plain
+    vs compact, or another codec) is never copied under dest_key's suffix: rewrite(src_key) writes
+    it in dest_key's format, and without rewrite the content is not reused.
+    """
+    src = hashes.get(sha)
+    if not src:
+        return False
+    if src == dest_key:
+        return True
+    if _suffix(src) != _suffix(dest_key):
+        if rewrite is None:
+            return False
+        rewrite(src)
+        return True
+    s3.copy_object(Bucket=bucket, Key=dest_key, CopySource={"Bucket": bucket, "Key": src})
+    if _suffix(dest_key) != SUFFIXES["json"]:
+        # a compact result brings its page index along (ocr_pages.py)
+        try:
+            s3.copy_object(Bucket=bucket, Key=index_key(dest_key),
+                           CopySource={"Bucket": bucket, "Key": index_key(src)})
+        except Exception as e:
+            print(f"⚠️ No page index copied for {dest_key}: {e}")
+    return True
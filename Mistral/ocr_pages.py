@@ -0,0 +1,99 @@
+# ocr_pages.py
+"""
+Page-level access to compact OCR results (ocr_artifact.py) without downloading whole filings.
+
+Every compact result <prefix><doc_id>.json.zst has a small <prefix><doc_id>.idx next to it with
+the byte offset and length of each page's frame. PageStore reads the index once per document and
+then Range-GETs only the frames of the requested pages; pages that sit next to each other in the
+object are fetched with a single GET.
+
+    store = PageStore(s3, "fed-data-storage", "Cleveland_Mistral/")
+    store.page_count("BANK_Y-6_2023-12-31_English")
+    for page in store.get_pages("BANK_Y-6_2023-12-31_English", [3, 4]):
+        print(page["index"], page["markdown"][:200])
+
+Page numbers are the OCR "index" of each page, i.e. 0-based page numbers of the submitted PDF.
+Results written before the index existed (plain .json, or compact without .idx) are read in full
+and filtered, so callers do not need to care which kind they hit.
+"""
+import json
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from ocr_artifact import INDEX_SUFFIX, SUFFIXES, ImageStore, read_ocr_result, read_page_frame
+
+INDEX_CACHE = 1024      # documents whose index is kept in memory
+
+
+class PageStore:
+    def __init__(self, s3, bucket: str, prefix: str, images: Optional[ImageStore] = None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.images = images
+        self.requests = 0
+        self._indexes: Dict[str, Optional[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, start: Optional[int] = None, length: int = 0) -> bytes:
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if start is not None:
+            kwargs["Range"] = f"bytes={start}-{start + length - 1}"
+        self.requests += 1
+        return self.s3.get_object(**kwargs)["Body"].read()
+
+    def index(self, doc_id: str) -> Optional[Dict]:
+        """The page index of doc_id, or None when it has none (older results)."""
+        with self._lock:
+            if doc_id in self._indexes:
+                return self._indexes[doc_id]
+        try:
+            idx = json.loads(self._get(f"{self.prefix}{doc_id}{INDEX_SUFFIX}"))
+        except self.s3.exceptions.NoSuchKey:
+            idx = None
+        with self._lock:
+            if len(self._indexes) >= INDEX_CACHE:
+                self._indexes.pop(next(iter(self._indexes)))
+            self._indexes[doc_id] = idx
+        return idx
+
+    def page_count(self, doc_id: str) -> int:
+        idx = self.index(doc_id)
+        return len(idx["pages"]) if idx else len(self._whole(doc_id)["pages"])
+
+    def _whole(self, doc_id: str) -> Dict:
+        for suffix in SUFFIXES.values():
+            try:
+                return read_ocr_result(self._get(f"{self.prefix}{doc_id}{suffix}"), self.images)
+            except self.s3.exceptions.NoSuchKey:
+                continue
+        raise KeyError(f"no OCR result for {doc_id} under s3://{self.bucket}/{self.prefix}")
+
+    def get_pages(self, doc_id: str, pages: Iterable[int]) -> List[Dict]:
+        """The OCR page dicts of doc_id whose index is in `pages`, in the order asked for."""
+        wanted = list(dict.fromkeys(pages))
+        idx = self.index(doc_id)
+        if idx is None:
+            by_index = {p.get("index"): p for p in self._whole(doc_id)["pages"]}
+            return [by_index[i] for i in wanted if i in by_index]
+
+        where = {number: (start, length) for number, start, length in idx["pages"]}
+        spans = sorted((*where[i], i) for i in wanted if i in where)
+        # adjacent frames become one run, fetched with one Range GET
+        runs: List[List] = []
+        for start, length, number in spans:
+            if runs and runs[-1][1] == start:
+                runs[-1][1] = start + length
+                runs[-1][2].append((start, length, number))
+            else:
+                runs.append([start, start + length, [(start, length, number)]])
+        key = f"{self.prefix}{doc_id}{idx['suffix']}"
+        found: Dict[int, Dict] = {}
+        for run_start, run_end, members in runs:
+            data = self._get(key, run_start, run_end - run_start)
+            for start, length, number in members:
+                found[number] = read_page_frame(data[start - run_start:start - run_start + length])
+        result = [found[i] for i in wanted if i in found]
+        if self.images:
+            self.images.inline({"pages": result})
+        return result
@@ -0,0 +1,133 @@
+# page_select.py
+"""
+Cheap local pre-pass that picks the pages of a Y-6 filing worth sending to Mistral OCR.
+
+Gemini/read_json.py only uses the cover page (bank name, date of report) and the Report Item 3
+(securities holders) and Report Item 4 (insiders) tables; the org charts, annual reports and
+branch listings that make up most of a filing are OCR'd for nothing. select_pages() reads the
+PDF's text layer (pypdf, else pdfplumber) and keeps
+- the cover page(s),
+- every page scoring at least MIN_SCORE on the shareholder/insider keywords below,
+- up to FOLLOW_PAGES table-like pages after a kept page (tables spill over), stopping at the
+  next Report Item heading,
+- every page without a text layer (scanned; nothing to judge it by).
+
+It falls back to OCRing the whole PDF (pages=None) when no PDF library is installed, the PDF
+cannot be parsed, nothing matches, or the selection would be most of the document anyway.
+A selection is recorded in the OCR result as "page_selection" (page_map[i] is the 0-based page
+of the original PDF that result page i came from), so results stay traceable to the filing.
+"""
+import io
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Optional: PDF text layer (pypdf preferred, pdfplumber as fallback)
+try:
+    from pypdf import PdfReader
+    PYPDF = True
+except Exception:
+    PdfReader = None  # type: ignore
+    PYPDF = False
+try:
+    import pdfplumber
+    PDFPLUMBER = True
+except Exception:
+    pdfplumber = None  # type: ignore
+    PDFPLUMBER = False
+
+COVER_PAGES = 1
+MIN_SCORE = 3
+FOLLOW_PAGES = 4
+MIN_TEXT_CHARS = 40           # less text than this: a scanned page
+MAX_FRACTION = 0.8            # selecting more than this share of pages: OCR everything
+
+KEYWORDS = [                  # (pattern, weight) scored on a page's lower-cased text
+    (r"report\s+item\s*3", 3),
+    (r"report\s+item\s*4", 3),
+    (r"securities\s+holders?", 2),
+    (r"share\s*holders?", 1),
+    (r"\binsiders?\b", 2),
+    (r"country\s+of\s+citizenship", 2),
+    (r"principal\s+occupation", 2),
+    (r"title\s*(?:&|and)\s*position", 2),
+    (r"percentage\s+of\s+voting", 2),
+    (r"voting\s+(?:stock|securities|shares)", 1),
+    (r"5\s*%\s+or\s+more", 1),
+]
+OTHER_ITEM = re.compile(r"report\s+item\s*(?:1|2[ab]?|5)\b")
+_KEYWORDS = [(re.compile(p), w) for p, w in KEYWORDS]
+
+
+class PageSelection(NamedTuple):
+    pages: Optional[List[int]]        # 0-based pages to OCR; None = the whole PDF
+    page_count: int
+    reason: str
+    hits: Dict[int, List[str]] = {}
+
+    def record(self) -> Dict:
+        """What goes into the OCR result as "page_selection"."""
+        return {"page_map": self.pages, "page_count": self.page_count, "reason": self.reason,
+                "hits": {str(p): h for p, h in self.hits.items()}}
+
+
+def page_texts(pdf_bytes: bytes) -> Optional[List[str]]:
+    """Text layer of each page, or None if no PDF library is installed or the PDF cannot be read."""
+    try:
+        if PYPDF:
+            return [p.extract_text() or "" for p in PdfReader(io.BytesIO(pdf_bytes)).pages]
+        if PDFPLUMBER:
+            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+                return [p.extract_text() or "" for p in pdf.pages]
+    except Exception as e:
+        print(f"⚠️ Could not read the PDF text layer: {e.__class__.__name__}: {e}")
+    return None
+
+
+def score_page(text: str) -> Tuple[int, List[str]]:
+    """(keyword score, the keyword matches found) of one page."""
+    low = " ".join(text.lower().split())
+    score, hits = 0, []
+    for rx, weight in _KEYWORDS:
+        m = rx.search(low)
+        if m:
+            score += weight
+            hits.append(m.group(0))
+    return score, hits
+
+
+def looks_tabular(text: str) -> bool:
+    """Many short lines carrying numbers or percentages: a continued shareholder/insider table."""
+    lines = [l for l in text.splitlines() if l.strip()]
+    if len(lines) < 8:
+        return False
+    numeric = sum(1 for l in lines if "%" in l or re.search(r"\d", l))
+    return numeric / len(lines) >= 0.3
+
+
+def select_pages(pdf_bytes: bytes) -> PageSelection:
+    texts = page_texts(pdf_bytes)
+    if texts is None:
+        return PageSelection(None, 0, "no text layer reader")
+    n = len(texts)
+    scanned = {i for i, t in enumerate(texts) if len(t.strip()) < MIN_TEXT_CHARS}
+    if len(scanned) == n:
+        return PageSelection(None, n, "scanned")
+
+    hits: Dict[int, List[str]] = {}
+    keep = set(range(min(COVER_PAGES, n))) | scanned
+    for i, text in enumerate(texts):
+        score, found = score_page(text)
+        if score < MIN_SCORE:
+            continue
+        hits[i] = found
+        keep.add(i)
+        for j in range(i + 1, min(n, i + 1 + FOLLOW_PAGES)):
+            if OTHER_ITEM.search(texts[j].lower()) or not (looks_tabular(texts[j]) or j in scanned):
+                break
+            keep.add(j)
+
+    if not hits:
+        return PageSelection(None, n, "no keyword hits")
+    if len(keep) > MAX_FRACTION * n:
+        return PageSelection(None, n, "most pages relevant", hits)
+    return PageSelection(sorted(keep), n, "selected", hits)
@@ -1,15 +1,19 @@
+# read_CapIQ_pdfs.py
+"""
+OCR the CapIQ section PDFs (unpacked ones first, then any only in the content store, then legacy
+ZIPs) with Mistral; see ocr_engine.py.
+"""
 import os
+import argparse
+from pathlib import Path
 
 import boto3
-import zipfile
-import io
-import csv
-from pathlib import Path
-from mistralai import DocumentURLChunk, FileTypedDict, Mistral
-import json
-import traceback
 from dotenv import load_dotenv
 load_dotenv()
+from mistralai import Mistral
+
+from ocr_engine import OCR_WORKERS, OcrEngine, content_store_source, s3_prefix_source, zip_members_source
+from ocr_batch import add_batch_args, run_ocr
 
 
 # Load environment variables from .env file
@@ -22,100 +26,48 @@ s3 = boto3.client("s3")
 
 bucket_name = "fed-data-storage"
 prefix = "UpdateDocuments/"
+pdf_prefix = "UpdateDocuments/pdfs/"  # section PDFs unpacked by Scraper/zip_postprocess.py
+output_prefix = "json/"
+output_dir = Path("./MistralCapIQUpdated")
 
 PROCESSED_FILE = "processed_files.csv"
 FAILED_FILE = "failed_files.csv"
+BATCH_DIR = Path("./batch_capiq")  # --batch work files (requests, job state, results)
 
-def load_processed_files():
-    if not Path(PROCESSED_FILE).exists():
-        return set()
-    with open(PROCESSED_FILE, newline="") as f:
-        return set(row[0] for row in csv.reader(f))
-
-def mark_file_as_processed(pdf_name: str):
-    with open(PROCESSED_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([pdf_name])
-
-def log_failure(pdf_name: str, zip_name: str, error_msg: str):
-    header_needed = not Path(FAILED_FILE).exists()
-    with open(FAILED_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        if header_needed:
-            writer.writerow(["pdf_name", "zip_file", "error_message"])
-        writer.writerow([pdf_name, zip_name, error_msg])
-
-def list_zip_files(bucket, prefix):
-    zip_keys = []
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if key.endswith(".zip"):
-                zip_keys.append(key)
-    return zip_keys
-
-def read_pdf(pdf_bytes: bytes, name: str):
-    file_dict: FileTypedDict = {
-        "file_name": f"{name}.pdf",
-        "content": pdf_bytes
-    }
+def pdf_name_from_key(key: str) -> str:
+    return key[len(pdf_prefix):].rsplit(".pdf", 1)[0]
 
-    uploaded_file = client.files.upload(
-        file=file_dict,
-        purpose="ocr"
-    )
+def is_section_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf") and filename.split("/")[-1].lower().startswith("section")
 
-    signed_url = client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
-
-    pdf_response = client.ocr.process(
-        document=DocumentURLChunk(document_url=signed_url.url),
-        model="mistral-ocr-latest",
-        include_image_base64=True
-    )
-
-    response_dict = json.loads(pdf_response.model_dump_json())
-
-    output_file = Path(f"./MistralCapIQUpdated/{name}.json")
-    output_file.write_text(json.dumps(response_dict, indent=2))
-    s3.upload_file(str(output_file), "fed-data-storage", f"json/{output_file.name}")
-    output_file.unlink()  # remove local JSON file
+def member_pdf_name(filename: str) -> str:
+    return filename.split("\\")[-1].replace(".pdf", "")
 
 def main():
-    processed_files = load_processed_files()
-    zip_files = list_zip_files(bucket_name, prefix)
-    print(f"Found {len(zip_files)} ZIP files.")
-
-    for key in zip_files:
-        print(f"\n🔍 Processing ZIP file: {key}")
-        try:
-            response = s3.get_object(Bucket=bucket_name, Key=key)
-            zip_content = response["Body"].read()
-
-            with zipfile.ZipFile(io.BytesIO(zip_content)) as z:
-                for file_info in z.infolist():
-                    filename = file_info.filename
-                    if filename.lower().endswith(".pdf") and filename.split("/")[-1].lower().startswith("section"):
-                        pdf_name = filename.split("\\")[-1].replace(".pdf", "")
-                        if pdf_name in processed_files:
-                            print(f"  ⏭️ Skipping (already processed): {pdf_name}")
-                            continue
-
-                        print(f"  📄 Processing PDF: {pdf_name}")
-                        try:
-                            pdf_bytes = z.read(file_info)
-                            read_pdf(pdf_bytes, pdf_name)
-                            mark_file_as_processed(pdf_name)
-                        except Exception as e:
-                            error_msg = f"{e}"
-                            print(f"  ❌ Failed to read/process PDF '{pdf_name}': {error_msg}")
-                            traceback.print_exc()
-                            log_failure(pdf_name, key, error_msg)
-        except Exception as e:
-            error_msg = f"{e}"
-            print(f"❌ Error reading ZIP '{key}': {error_msg}")
-            traceback.print_exc()
-            log_failure("", key, error_msg)
+    ap = argparse.ArgumentParser(description="OCR CapIQ section PDFs with Mistral")
+    ap.add_argument("--workers", type=int, default=OCR_WORKERS, help="OCR calls in flight at once.")
+    ap.add_argument("--compact", action="store_true",
+                    help="Write minified, compressed results with images stored separately (ocr_artifact.py).")
+    ap.add_argument("--select-pages", action="store_true",
+                    help="OCR only the cover, shareholder and insider pages (page_select.py).")
+    add_batch_args(ap)
+    args = ap.parse_args()
+
+    # processed/failed CSVs are keyed by PDF name, so a PDF already OCR'd from a ZIP is not redone
+    engine = OcrEngine(client, s3, bucket_name, output_prefix, output_dir, PROCESSED_FILE, FAILED_FILE,
+                       failed_header=("pdf_name", "zip_file", "error_message"), workers=args.workers,
+                       compact=args.compact, select_pages=args.select_pages)
+
+    # Unpacked section PDFs first: one small GET each, no ZIP download
+    unpacked = s3_prefix_source(s3, bucket_name, pdf_prefix, identify=pdf_name_from_key,
+                                name=pdf_name_from_key, extra=True)
+    # Members the post-processor put in the content store (index url "capiq:<pdf name>")
+    stored = content_store_source(s3, bucket_name, "capiq", identify=lambda row: row["url"][len("capiq:"):],
+                                  name=lambda row: row["url"][len("capiq:"):], extra=True)
+    # Legacy ZIPs uploaded whole by earlier scraper runs
+    zipped = zip_members_source(s3, bucket_name, prefix, is_section_pdf, member_pdf_name,
+                                on_error=engine.log_failure, skip=lambda name: name in engine.processed)
+    run_ocr(engine, args, BATCH_DIR, unpacked, stored, zipped)
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,22 @@
+# read_dallas_pdfs.py
+"""OCR every Dallas filing listed in Dallas_JSON.json (a JSON array of PDF URLs) with Mistral; see ocr_engine.py."""
 import os
-import csv
-import json
-import traceback
+import argparse
 from pathlib import Path
-from urllib.parse import urlparse, unquote
-from typing import Set, List
 
 import boto3
 from dotenv import load_dotenv
-from mistralai import DocumentURLChunk, Mistral
+from mistralai import Mistral
+
+from ocr_engine import OCR_WORKERS, OcrEngine, url_list_source
+from ocr_batch import add_batch_args, run_ocr
 
 # ------------ Config ------------
 DALLAS_JSON_PATH = "Dallas_JSON.json"   # file containing a JSON array of PDF URLs
 OUTPUT_DIR = Path("./json")             # local output dir for OCR JSON
 PROCESSED_FILE = "processed_files_dallas.csv"  # tracks finished items (by url or name)
 FAILED_FILE = "failed_files_dallas.csv"        # logs failures
+BATCH_DIR = Path("./batch_dallas")             # --batch work files (requests, job state, results)
 
 ENABLE_S3_UPLOAD = True
 S3_BUCKET = "fed-data-storage"
@@ -29,84 +31,21 @@ if not api_key:
 client = Mistral(api_key=api_key)
 s3 = boto3.client("s3") if ENABLE_S3_UPLOAD else None
 
-def ensure_dirs():
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-def load_processed_files() -> Set[str]:
-    if not Path(PROCESSED_FILE).exists():
-        return set()
-    with open(PROCESSED_FILE, newline="") as f:
-        return set(row[0] for row in csv.reader(f))
-
-def mark_file_as_processed(identifier: str):
-    with open(PROCESSED_FILE, "a", newline="") as f:
-        csv.writer(f).writerow([identifier])
-
-def log_failure(identifier: str, error_msg: str):
-    header_needed = not Path(FAILED_FILE).exists()
-    with open(FAILED_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        if header_needed:
-            writer.writerow(["identifier", "error_message"])
-        writer.writerow([identifier, error_msg])
-
-def read_url_list(path: str) -> List[str]:
-    with open(path, "r") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} must be a JSON array of URLs")
-    return data
-
-def name_from_url(url: str) -> str:
-    parsed = urlparse(url)
-    last = unquote(os.path.basename(parsed.path))
-    if last.lower().endswith(".pdf"):
-        last = last[:-4]
-    return last
-
-def ocr_url_to_json(url: str, base_name: str):
-    pdf_response = client.ocr.process(
-        document=DocumentURLChunk(document_url=url),
-        model="mistral-ocr-latest",
-        include_image_base64=True,
-    )
-    response_dict = json.loads(pdf_response.model_dump_json())
-
-    out_path = OUTPUT_DIR / f"{base_name}.json"
-    out_path.write_text(json.dumps(response_dict, indent=2))
-
-    if ENABLE_S3_UPLOAD and s3 is not None:
-        s3_key = f"{S3_PREFIX}{out_path.name}"
-        s3.upload_file(str(out_path), S3_BUCKET, s3_key)
-
 def main():
-    ensure_dirs()
-    urls = read_url_list(DALLAS_JSON_PATH)
-    # 🔸 removed: urls = urls[:15]
-
-    processed = load_processed_files()
-    print(f"Processing {len(urls)} URLs from {DALLAS_JSON_PATH} (all).")
-
-    for url in urls:
-        identifier = url.strip()
-        if not identifier:
-            continue
-        if identifier in processed:
-            print(f"⏭️  Skipping (already processed): {identifier}")
-            continue
-
-        base_name = name_from_url(identifier)
-        print(f"📄 Processing: {base_name}")
-
-        try:
-            ocr_url_to_json(identifier, base_name)
-            mark_file_as_processed(identifier)
-            print(f"✅ Done: {base_name}")
-        except Exception as e:
-            err = f"{e.__class__.__name__}: {e}"
-            print(f"❌ Failed: {base_name} — {err}")
-            traceback.print_exc()
-            log_failure(identifier, err)
+    ap = argparse.ArgumentParser(description="OCR Dallas Y-6 PDFs with Mistral")
+    ap.add_argument("--workers", type=int, default=OCR_WORKERS, help="OCR calls in flight at once.")
+    ap.add_argument("--compact", action="store_true",
+                    help="Write minified, compressed results with images stored separately (ocr_artifact.py).")
+    ap.add_argument("--select-pages", action="store_true",
+                    help="OCR only the cover, shareholder and insider pages (page_select.py).")
+    add_batch_args(ap)
+    args = ap.parse_args()
+
+    engine = OcrEngine(client, s3, S3_BUCKET, S3_PREFIX, OUTPUT_DIR, PROCESSED_FILE, FAILED_FILE,
+                       workers=args.workers, compact=args.compact, select_pages=args.select_pages,
+                       keep_local=True, dedupe=False)
+    print(f"Processing URLs from {DALLAS_JSON_PATH} ({args.workers} at a time).")
+    run_ocr(engine, args, BATCH_DIR, url_list_source(DALLAS_JSON_PATH))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,103 @@
+# s3_range_file.py
+"""
+Read-only, seekable file object over one S3 object, backed by Range GETs.
+
+zipfile.ZipFile(S3RangeFile(s3, bucket, key, size)) reads just the end-of-central-directory
+record and the central directory (one GET of the object's last BLOCK bytes for a typical CapIQ
+ZIP), and z.read(info) then fetches only that member's local header and data. Nothing else of the
+object is downloaded, so listing a ZIP whose members are all processed costs one small GET, and
+reading a member holds that member in memory, not the whole ZIP.
+
+The most recent block is cached so zipfile's small header reads do not each become a request.
+Reads are pinned to the ETag seen at open (IfMatch), so an object replaced mid-run raises instead
+of mixing bytes from two versions.
+"""
+import io
+import threading
+from typing import Optional
+
+BLOCK = 256 * 1024     # minimum bytes per GET; also covers the EOCD + central directory of a ZIP
+
+
+class S3RangeFile(io.RawIOBase):
+    def __init__(self, s3, bucket: str, key: str, size: Optional[int] = None, etag: Optional[str] = None,
+                 block: int = BLOCK):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        if size is None:
+            head = s3.head_object(Bucket=bucket, Key=key)
+            size, etag = head["ContentLength"], etag or head.get("ETag")
+        self.size = size
+        self.etag = etag
+        self.block = block
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._pos = 0
+        self._cache_start = 0
+        self._cache = b""
+        self._lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"invalid whence {whence}")
+        if pos < 0:
+            raise OSError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _get(self, start: int, end: int) -> bytes:
+        """Bytes [start, end) of the object."""
+        kwargs = {"Bucket": self.bucket, "Key": self.key, "Range": f"bytes={start}-{end - 1}"}
+        if self.etag:
+            kwargs["IfMatch"] = self.etag
+        data = self.s3.get_object(**kwargs)["Body"].read()
+        if len(data) != end - start:
+            raise OSError(f"s3://{self.bucket}/{self.key}: short range read "
+                          f"({len(data)} of {end - start} bytes at {start})")
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+    def read(self, n: int = -1) -> bytes:
+        with self._lock:
+            pos = self._pos
+            end = self.size if n is None or n < 0 else min(self.size, pos + n)
+            if pos >= end:
+                return b""
+            cache_end = self._cache_start + len(self._cache)
+            if self._cache_start <= pos < cache_end:
+                head = self._cache[pos - self._cache_start:end - self._cache_start]
+            else:
+                head = b""
+            fetch_from = pos + len(head)
+            if fetch_from < end:
+                # fetch at least a block; near the end of the object, extend backwards instead
+                fetch_to = min(self.size, max(end, fetch_from + self.block))
+                block_start = max(0, min(fetch_from, fetch_to - self.block))
+                data = self._get(block_start, fetch_to)
+                self._cache_start, self._cache = block_start, data
+                head += data[fetch_from - block_start:end - block_start]
+            self._pos = end
+            return head
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
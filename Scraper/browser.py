@@ -0,0 +1,134 @@
+# browser.py
+"""
+Shared Chrome factory for every Selenium scraper.
+
+- Warm profile: each scraper gets a persistent user-data dir under .chrome_profiles/<name>/<slot>,
+  so the HTTP cache, cookies and compiled JS survive between runs. Parallel browsers (shards, the
+  CapIQ fleet) each claim a free slot with a non-blocking flock that the OS releases when the process
+  exits, so two Chromes never share a profile. A process keeps its slot, so a browser restarted by
+  the same process (capiq_session recycling) reuses the warm profile. Without fcntl (Windows) the
+  slot is per-pid.
+- Lightweight pages: images are disabled by content-setting prefs. Fonts and media are refused via
+  CDP Network.setBlockedURLs, as are analytics/tag-manager hosts when block_analytics=True.
+- pageLoadStrategy "eager": driver.get() returns at DOMContentLoaded. Scrapers already wait for the
+  elements they need.
+
+    driver = chrome_driver("richmond", headless=True)
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+# Optional: flock-based profile slots (POSIX)
+try:
+    import fcntl
+    FCNTL = True
+except Exception:
+    fcntl = None  # type: ignore
+    FCNTL = False
+
+PROFILE_ROOT = str(Path.cwd() / ".chrome_profiles")
+MAX_PROFILE_SLOTS = 32
+
+FONT_MEDIA_PATTERNS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m4v", "*.mov", "*.mp3", "*.ogg", "*.wav",
+]
+ANALYTICS_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*hotjar.com*", "*segment.io*", "*segment.com/analytics*",
+    "*newrelic.com*", "*nr-data.net*", "*demdex.net*", "*omtrdc.net*", "*adobedtm.com*",
+    "*quantserve.com*", "*scorecardresearch.com*", "*facebook.net*", "*clarity.ms*",
+]
+
+_claims: Dict[str, Tuple] = {}  # profile base dir -> (open slot-lock file, slot dir), held for the process
+
+
+def claim_profile(name: str, root: str = PROFILE_ROOT) -> str:
+    """A user-data dir for `name` that no other running browser is using (the same one on every call)."""
+    base = Path(root) / name
+    if str(base) in _claims:
+        return _claims[str(base)][1]
+    if not FCNTL:
+        d = base / f"pid{os.getpid()}"
+        d.mkdir(parents=True, exist_ok=True)
+        return str(d)
+    for slot in range(MAX_PROFILE_SLOTS):
+        d = base / str(slot)
+        d.mkdir(parents=True, exist_ok=True)
+        f = open(d / ".claim", "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            continue
+        _claims[str(base)] = (f, str(d))
+        return str(d)
+    raise RuntimeError(f"All {MAX_PROFILE_SLOTS} profile slots for '{name}' are in use")
+
+
+def chrome_options(download_dir: Optional[str] = None, headless: bool = True,
+                   profile_dir: Optional[str] = None, block_images: bool = True,
+                   page_load_strategy: str = "eager", window_size: str = "1400,1200",
+                   extra_prefs: Optional[Dict] = None) -> webdriver.ChromeOptions:
+    opts = webdriver.ChromeOptions()
+    opts.page_load_strategy = page_load_strategy
+    prefs: Dict = {}
+    if download_dir:
+        Path(download_dir).mkdir(parents=True, exist_ok=True)
+        prefs.update({
+            "download.default_directory": download_dir,
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True,
+        })
+    if block_images:
+        prefs["profile.managed_default_content_settings.images"] = 2
+    prefs.update(extra_prefs or {})
+    opts.add_experimental_option("prefs", prefs)
+
+    if profile_dir:
+        opts.add_argument(f"--user-data-dir={profile_dir}")
+        # a warm profile must not greet us with first-run / restore-session UI
+        opts.add_argument("--no-first-run")
+        opts.add_argument("--no-default-browser-check")
+        opts.add_argument("--hide-crash-restore-bubble")
+    if headless:
+        opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument(f"--window-size={window_size}")
+    return opts
+
+
+def block_urls(driver, patterns: List[str]):
+    """Refuse matching requests at the network layer (Chromium DevTools protocol)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"⚠️ Could not install URL blocklist: {e}", flush=True)
+
+
+def chrome_driver(name: str, download_dir: Optional[str] = None, headless: bool = True,
+                  warm_profile: bool = True, block_content: bool = True,
+                  block_analytics: bool = False, page_load_strategy: str = "eager",
+                  window_size: str = "1400,1200", extra_prefs: Optional[Dict] = None) -> webdriver.Chrome:
+    """Start Chrome for scraper `name` with a warm profile and blocked heavy/analytics requests."""
+    profile_dir = claim_profile(name) if warm_profile else None
+    opts = chrome_options(download_dir=download_dir, headless=headless, profile_dir=profile_dir,
+                          block_images=block_content, page_load_strategy=page_load_strategy,
+                          window_size=window_size, extra_prefs=extra_prefs)
+    driver = webdriver.Chrome(service=Service(), options=opts)
+
+    patterns: List[str] = []
+    if block_content:
+        patterns += FONT_MEDIA_PATTERNS
+    if block_analytics:
+        patterns += ANALYTICS_PATTERNS
+    if patterns:
+        block_urls(driver, patterns)
+    return driver
@@ -0,0 +1,75 @@
+# budget.py
+"""
+Process-wide download bandwidth budget, adjustable from outside the process.
+
+Every byte the scrapers pull over HTTP (http_cache.fetch, Cleveland's PDF streams, HTTP listings)
+goes through throttle().consume(n), a token bucket shared by all threads of the process.
+
+The budget comes from the environment, which orchestrate.py sets for each district it launches:
+    SCRAPER_MAX_BPS       fixed bytes/second (0 or unset = unlimited)
+    SCRAPER_BUDGET_FILE   JSON file {"max_bps": ...} re-read every few seconds, so the
+                          orchestrator can hand a finished district's share to the ones still running
+Run by hand with neither set, the scrapers are not throttled.
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+MAX_BPS_ENV = "SCRAPER_MAX_BPS"
+BUDGET_FILE_ENV = "SCRAPER_BUDGET_FILE"
+
+
+class Throttle:
+    def __init__(self, rate_bps: float = 0, budget_file: Optional[str] = None, refresh: float = 5.0):
+        self.rate = float(rate_bps or 0)
+        self.budget_file = budget_file
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._checked = 0.0
+        self._mtime = 0.0
+
+    def _reload(self, now: float):
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.budget_file)
+            if mtime == self._mtime:
+                return
+            with open(self.budget_file, encoding="utf-8") as f:
+                self.rate = float(json.load(f).get("max_bps") or 0)
+            self._mtime = mtime
+        except Exception:
+            pass  # keep the last known rate
+
+    def consume(self, n: int):
+        """Account for n bytes just received; sleeps while the bucket is in debt."""
+        with self._lock:
+            now = time.monotonic()
+            if self.budget_file and now - self._checked >= self.refresh:
+                self._reload(now)
+            if self.rate <= 0:
+                return
+            # refill, capped at one second of burst
+            self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+_throttle: Optional[Throttle] = None
+_init_lock = threading.Lock()
+
+
+def throttle() -> Throttle:
+    """This process's bandwidth budget, configured from the environment on first use."""
+    global _throttle
+    if _throttle is None:
+        with _init_lock:
+            if _throttle is None:
+                _throttle = Throttle(float(os.getenv(MAX_BPS_ENV) or 0), os.getenv(BUDGET_FILE_ENV) or None)
+    return _throttle
@@ -0,0 +1,385 @@
+# capiq_api.py
+"""
+Selenium-free CapIQ backend: replays the JSON search and document-download calls that the
+searchResults page makes, through a requests.Session carrying the COOKIES from .env.
+
+    python capiq_api.py                                  # live, uploads to s3://fed-data-storage/UpdateDocuments/pdfs/
+    python capiq_api.py --record recordings/             # also save every response for the stub
+    python capiq_stub.py recordings/ --port 8765 &       # serve the recorded responses locally
+    python capiq_api.py --base-url http://127.0.0.1:8765 --no-s3 --out-dir stub_pdfs/
+
+The request shapes (paths, JSON body, where the hits and total live in the response) are in
+DEFAULT_CONFIG. They can be overridden with --config capiq_api.json, copied from the browser's
+DevTools when the site changes. Results are paged by offset: the first page gives the total,
+the remaining offsets are fetched concurrently, then documents are downloaded concurrently.
+Documents already in capiq_api_manifest.ndjson are skipped, so an interrupted run picks up
+where it stopped.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from copy import deepcopy
+from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from manifest import ManifestWriter
+from pdf_store import ContentStore
+from watermark import ScrapeState
+from budget import throttle
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+# Optional S3 upload
+try:
+    import boto3
+    BOTO3 = True
+except Exception:
+    boto3 = None
+    BOTO3 = False
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+OUT_MANIFEST = "capiq_api_manifest.ndjson"
+S3_BUCKET = "fed-data-storage"
+PDF_PREFIX = "UpdateDocuments/pdfs/"  # same place zip_postprocess.py puts unpacked ZIP members
+# Also store each PDF once under PDFStore/<sha256> and index it as "capiq:<stem>", like the ZIP
+# members from scraper_CapIQ.py, so read_CapIQ_pdfs.py finds it through content_store_source
+CONTENT_STORE = True
+
+# Same filters the Selenium flow clicks through: filing date 01/01/1995–07/31/2025, Y-6 + Y-6/A,
+# sorted by filing date. Strings equal to "{offset}" / "{limit}" become ints; others are .format()ed.
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "base_url": "https://www.capitaliq.spglobal.com",
+    "search_path": "/apisv3/spg-webplatform-core/search/searchResults",
+    "search_method": "POST",
+    "search_params": {"vertical": "institutional_filingsrpt-gss"},
+    "search_body": {
+        "vertical": "institutional_filingsrpt-gss",
+        "filters": {
+            "documentType": ["Y-6", "Y-6/A"],
+            "filingDate": {"from": "{date_from}", "to": "{date_to}"},
+        },
+        "sort": [{"field": "filingDate", "direction": "desc"}],
+        "offset": "{offset}",
+        "limit": "{limit}",
+    },
+    "results_path": "results",
+    "total_path": "total",
+    "id_field": "id",
+    "name_field": "fileName",
+    "download_path": "/apisv3/spg-webplatform-core/documents/{id}/download",
+    "page_size": 100,
+    "date_from": "01/01/1995",
+    "date_to": "07/31/2025",
+}
+
+
+def ts() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+def log(msg: str):
+    print(f"[{ts()}] {msg}", flush=True)
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    config = deepcopy(DEFAULT_CONFIG)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+def fill(template: Any, values: Dict[str, Any]) -> Any:
+    """Substitute {placeholders} throughout a JSON-like template."""
+    if isinstance(template, dict):
+        return {k: fill(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [fill(v, values) for v in template]
+    if isinstance(template, str):
+        m = re.fullmatch(r"\{(\w+)\}", template)
+        if m and m.group(1) in values:
+            return values[m.group(1)]  # keep the native type (offset/limit stay ints)
+        return template.format(**values) if "{" in template else template
+    return template
+
+
+def dig(obj: Any, path: str, default: Any = None) -> Any:
+    """Dotted-path lookup into a JSON response ("data.hits", "meta.total")."""
+    for part in path.split(".") if path else []:
+        if isinstance(obj, dict):
+            obj = obj.get(part)
+        elif isinstance(obj, list) and part.isdigit() and int(part) < len(obj):
+            obj = obj[int(part)]
+        else:
+            return default
+        if obj is None:
+            return default
+    return obj
+
+
+def doc_file_stem(doc: Dict, config: Dict) -> str:
+    """
+    "<fileName>_<id>": CapIQ reuses file names across filings (amendments, refilings), so the name
+    alone would let one document overwrite another.
+    """
+    doc_id = re.sub(r"[^\w.\-]+", "_", str(doc.get(config["id_field"]))).strip("_")
+    name = str(doc.get(config["name_field"]) or "").rsplit(".pdf", 1)[0]
+    name = re.sub(r"[^\w.\- ]+", "_", name).strip()
+    return f"{name}_{doc_id}" if name else doc_id
+
+
+def cookie_domain(cookie: Dict, base_url: str = "") -> str:
+    """
+    The cookie's own domain when base_url is on it; otherwise "" (sent to any host), so the CapIQ
+    cookies still reach capiq_stub.py on 127.0.0.1 and its --require-cookie check.
+    """
+    domain = (cookie.get("domain") or "").lstrip(".").lower()
+    host = (urlparse(base_url).hostname or "").lower() if base_url else ""
+    if not host or not domain or host == domain or host.endswith(f".{domain}"):
+        return cookie.get("domain") or ""
+    return ""
+
+
+def cookie_session(cookies: List[Dict], workers: int = 8, base_url: str = "") -> requests.Session:
+    """requests.Session with the browser's CapIQ cookies (same COOKIES JSON the Selenium flow injects)."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, workers), max_retries=3)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json, text/plain, */*"})
+    for c in cookies:
+        s.cookies.set(c["name"], c["value"], domain=cookie_domain(c, base_url), path=c.get("path", "/"))
+    return s
+
+
+def load_cookies() -> List[Dict]:
+    raw = os.getenv("COOKIES") or "[]"
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        log(f"❌ Failed to parse cookies: {e}")
+        return []
+
+
+class CapIQApi:
+    def __init__(self, session: requests.Session, config: Dict, timeout: int = 60,
+                 record_dir: Optional[str] = None):
+        self.session = session
+        self.config = config
+        self.base = config["base_url"].rstrip("/")
+        self.timeout = timeout
+        self.record_dir = Path(record_dir) if record_dir else None
+        if self.record_dir:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+        # the browser sends these; some gateways refuse XHR-only endpoints without them
+        self.session.headers.setdefault("Referer", f"{self.base}{config['search_path']}")
+        self.session.headers.setdefault("Origin", self.base)
+
+    # ---------- search ----------
+    def search(self, offset: int) -> Tuple[List[Dict], int]:
+        """One page of hits starting at `offset`; returns (hits, total)."""
+        cfg = self.config
+        values = {"offset": offset, "limit": cfg["page_size"],
+                  "date_from": cfg["date_from"], "date_to": cfg["date_to"]}
+        url = f"{self.base}{cfg['search_path']}"
+        params = fill(cfg.get("search_params") or {}, values)
+        if cfg["search_method"].upper() == "GET":
+            r = self.session.get(url, params={**params, **fill(cfg["search_body"], values)}, timeout=self.timeout)
+        else:
+            r = self.session.post(url, params=params, json=fill(cfg["search_body"], values), timeout=self.timeout)
+        if r.status_code in (401, 403):
+            raise RuntimeError(f"search refused ({r.status_code}); COOKIES in .env have probably expired")
+        r.raise_for_status()
+        throttle().consume(len(r.content))
+        data = r.json()
+        if self.record_dir:
+            (self.record_dir / f"search_{offset}.json").write_text(json.dumps(data))
+        hits = dig(data, cfg["results_path"], []) or []
+        total = int(dig(data, cfg["total_path"], len(hits)) or 0)
+        return hits, total
+
+    def search_all(self, workers: int = 4, max_results: int = 0, retries: int = 2) -> List[Dict]:
+        """
+        First page for the total, then every remaining offset concurrently (results kept in order).
+        Failed pages are retried one at a time; if any still fails, RuntimeError — a partial result
+        list must not pass for the whole search.
+        """
+        size = self.config["page_size"]
+        first, total = self.search(0)
+        if max_results:
+            total = min(total, max_results)
+        log(f"🔎 {total} result(s), {size} per page")
+        offsets = list(range(size, total, size))
+        pages: Dict[int, List[Dict]] = {0: first}
+        failed: List[int] = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self.search, off): off for off in offsets}
+            for fut in as_completed(futures):
+                off = futures[fut]
+                try:
+                    pages[off] = fut.result()[0]
+                except Exception as e:
+                    log(f"⚠️ Search page at offset {off} failed: {e}")
+                    failed.append(off)
+        for attempt in range(1, retries + 1):
+            if not failed:
+                break
+            time.sleep(2 * attempt)
+            pending, failed = sorted(failed), []
+            for off in pending:
+                try:
+                    pages[off] = self.search(off)[0]
+                    log(f"🔁 Search page at offset {off} recovered (retry {attempt})")
+                except Exception as e:
+                    log(f"⚠️ Search page at offset {off} failed again (retry {attempt}): {e}")
+                    failed.append(off)
+        if failed:
+            raise RuntimeError(f"{len(failed)} search page(s) failed after {retries} retries "
+                               f"(offsets {sorted(failed)}); not downloading a partial result list")
+        hits = [h for off in sorted(pages) for h in pages[off]]
+        return hits[:total] if total else hits
+
+    # ---------- download ----------
+    def download_url(self, doc: Dict) -> str:
+        return f"{self.base}{self.config['download_path'].format(id=doc[self.config['id_field']])}"
+
+    def download(self, doc: Dict) -> bytes:
+        url = self.download_url(doc)
+        with self.session.get(url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            chunks = []
+            for chunk in r.iter_content(chunk_size=1024 * 64):
+                if chunk:
+                    throttle().consume(len(chunk))
+                    chunks.append(chunk)
+        data = b"".join(chunks)
+        if not data.startswith(b"%PDF"):
+            raise RuntimeError(f"not a PDF ({len(data)} bytes, starts {data[:8]!r})")
+        if self.record_dir:
+            (self.record_dir / f"doc_{doc[self.config['id_field']]}.pdf").write_bytes(data)
+        return data
+
+
+def save_document(data: bytes, stem: str, out_dir: Optional[str], s3_client, bucket: str,
+                  store: Optional[ContentStore] = None, source_url: str = "") -> Tuple[str, str]:
+    """
+    Write the PDF locally and/or to s3://bucket/UpdateDocuments/pdfs/<stem>.pdf, and into the
+    content store when one is given. Returns (location, sha256).
+    """
+    sha = hashlib.sha256(data).hexdigest()
+    location = ""
+    if out_dir:
+        path = Path(out_dir) / f"{stem}.pdf"
+        path.write_bytes(data)
+        location = str(path)
+    if s3_client is not None:
+        key = f"{PDF_PREFIX}{stem}.pdf"
+        s3_client.put_object(Bucket=bucket, Key=key, Body=data, ContentType="application/pdf",
+                             Metadata={"sha256": sha})
+        location = f"s3://{bucket}/{key}"
+    if store is not None:
+        store.put_bytes(data, sha)
+        store.record(f"capiq:{stem}", sha, len(data), "capiq", source_url)
+    return location, sha
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Search and download CapIQ Y-6 filings over HTTP (no Selenium).")
+    ap.add_argument("--config", default="", help="JSON overriding DEFAULT_CONFIG (endpoints, body, response paths).")
+    ap.add_argument("--base-url", default="", help="Override the host, e.g. http://127.0.0.1:8765 for capiq_stub.py.")
+    ap.add_argument("--search-workers", type=int, default=4, help="Concurrent search pages.")
+    ap.add_argument("--workers", type=int, default=8, help="Concurrent document downloads.")
+    ap.add_argument("--max-results", type=int, default=0, help="Stop after N results (0 = all).")
+    ap.add_argument("--out-dir", default="", help="Also keep PDFs locally in this directory.")
+    ap.add_argument("--no-s3", action="store_true")
+    ap.add_argument("--s3-bucket", default=S3_BUCKET)
+    ap.add_argument("--record", default="", help="Save every search/download response here (input for capiq_stub.py).")
+    ap.add_argument("--timeout", type=int, default=60)
+    args = ap.parse_args()
+
+    config = load_config(args.config or None)
+    if args.base_url:
+        config["base_url"] = args.base_url
+    if args.no_s3 and not args.out_dir:
+        ap.error("--no-s3 needs --out-dir (nowhere to put the PDFs)")
+    if not args.no_s3 and not BOTO3:
+        ap.error("boto3 is not installed; use --no-s3 --out-dir")
+    if args.out_dir:
+        Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+
+    session = cookie_session(load_cookies(), workers=max(args.workers, args.search_workers),
+                             base_url=config["base_url"])
+    api = CapIQApi(session, config, timeout=args.timeout, record_dir=args.record or None)
+    s3_client = None if args.no_s3 else boto3.client("s3")
+    store = ContentStore(args.s3_bucket, s3_client) if CONTENT_STORE and s3_client is not None else None
+
+    manifest = ManifestWriter(OUT_MANIFEST, csv_path="capiq_api_documents.csv",
+                              csv_header=["id", "name", "sha256", "location"],
+                              csv_fields=["id", "name", "sha256", "location"], snapshot_interval=0)
+    state = ScrapeState("capiq_api", manifest_path=OUT_MANIFEST)
+    ok = failed = skipped = 0
+    try:
+        try:
+            hits = api.search_all(workers=args.search_workers, max_results=args.max_results)
+        except RuntimeError as e:
+            log(f"❌ {e}")
+            sys.exit(2)
+        todo, queued = [], set()
+        for doc in hits:
+            url = api.download_url(doc)
+            if url in queued or not state.is_new(url):
+                skipped += 1
+                continue
+            queued.add(url)
+            todo.append(doc)
+        log(f"⬇️  {len(todo)} document(s) to fetch, {skipped} already downloaded")
+
+        def fetch(doc: Dict):
+            stem = doc_file_stem(doc, config)
+            location, sha = save_document(api.download(doc), stem, args.out_dir or None, s3_client,
+                                          args.s3_bucket, store=store, source_url=api.download_url(doc))
+            return stem, location, sha
+
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {pool.submit(fetch, doc): doc for doc in todo}
+            for fut in as_completed(futures):
+                doc = futures[fut]
+                doc_id = doc.get(config["id_field"])
+                try:
+                    stem, location, sha = fut.result()
+                except Exception as e:
+                    failed += 1
+                    log(f"❌ {doc_id}: {e}")
+                    continue
+                url = api.download_url(doc)
+                state.see(url, str(doc_id))
+                manifest.append({"id": doc_id, "name": stem, "sha256": sha, "location": location, "url": url})
+                ok += 1
+                log(f"✅ {stem} → {location}")
+        if not failed:
+            state.commit_watermark()
+    finally:
+        manifest.close(snapshot=False)
+        if store is not None:
+            try:
+                store.push_index()
+            except Exception as e:
+                log(f"⚠️ Content-store index upload failed: {e}")
+    log(f"🏁 Done: {ok} downloaded, {skipped} skipped, {failed} failed.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
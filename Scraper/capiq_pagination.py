@@ -0,0 +1,140 @@
+# capiq_pagination.py
+"""
+Paginator helpers for the CapIQ search results.
+
+goto_page() jumps to a page through the paginator's own state instead of clicking "Next" once per
+page: it types the number into the page box when the paginator has one, otherwise it clicks the
+furthest visible numbered button that does not overshoot (windowed paginators move several pages
+per click), and only falls back to "Next" when nothing better is visible.
+
+A cursor file remembers the last page that was finished, so a restarted run resumes there.
+"""
+import os
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.action_chains import ActionChains
+
+CURSOR_FILE = "capiq_cursor.json"
+
+NEXT_BTN_XPATH = '//button[contains(@class, "css-18ydibh css-1gfzd5y") and .//span[text()="Next"]]'
+PAGE_BTN_XPATH = '//button[contains(@class, "css-l1fgal") and contains(@class, "css-1gfzd5y") and .//span[text()="{page}"]]'
+PAGE_INPUT_CSS = 'input[aria-label*="page" i], input[placeholder*="page" i], input[name*="page" i]'
+
+# every visible numbered paginator button as [number, element], in one round trip
+_NUMBERED_BUTTONS_JS = """
+return Array.from(document.querySelectorAll('button.css-l1fgal.css-1gfzd5y'))
+  .filter(b => b.offsetParent !== null)
+  .map(b => [parseInt((b.innerText || '').trim(), 10), b])
+  .filter(p => !isNaN(p[0]));
+"""
+
+# the numbered button marked as the current page (aria-current / aria-pressed / selected / disabled)
+_CURRENT_PAGE_JS = """
+const cur = Array.from(document.querySelectorAll('button.css-l1fgal.css-1gfzd5y'))
+  .filter(b => b.offsetParent !== null)
+  .find(b => b.getAttribute('aria-current') === 'page' || b.getAttribute('aria-pressed') === 'true'
+          || b.getAttribute('aria-selected') === 'true' || b.disabled || /selected|active/i.test(b.className));
+return cur ? parseInt((cur.innerText || '').trim(), 10) || 0 : 0;
+"""
+
+
+# ---------- cursor ----------
+def load_cursor(path: str = CURSOR_FILE) -> int:
+    """Last finished page (0 if none)."""
+    p = Path(path)
+    if not p.exists():
+        return 0
+    try:
+        return int(json.loads(p.read_text()).get("last_completed_page", 0))
+    except Exception:
+        return 0
+
+
+def save_cursor(page: int, path: str = CURSOR_FILE, **extra):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_completed_page": page, "updated": time.strftime("%Y-%m-%d %H:%M:%S"), **extra}, f)
+    os.replace(tmp, path)
+
+
+def pages_after_cursor(pages: List[int], path: str = CURSOR_FILE) -> List[int]:
+    last = load_cursor(path)
+    if last:
+        remaining = [p for p in pages if p > last]
+        print(f"⏩ Resuming after page {last}: {len(remaining)} of {len(pages)} page(s) left.")
+        return remaining
+    return list(pages)
+
+
+# ---------- navigation ----------
+def visible_page_buttons(driver) -> Dict[int, object]:
+    return {n: el for n, el in (driver.execute_script(_NUMBERED_BUTTONS_JS) or [])}
+
+
+def current_page(driver) -> int:
+    """Page number the paginator marks as current (0 if it marks none)."""
+    return int(driver.execute_script(_CURRENT_PAGE_JS) or 0)
+
+
+def paginator_state(driver):
+    """(current page, visible page numbers): changes whenever a paginator click lands."""
+    return current_page(driver), tuple(sorted(visible_page_buttons(driver)))
+
+
+def _click(driver, element, max_attempts: int = 3) -> bool:
+    for attempt in range(max_attempts):
+        try:
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+            ActionChains(driver).move_to_element(element).click().perform()
+            return True
+        except Exception as e:
+            print(f"🔁 Retry {attempt + 1} for scroll & click: {e}")
+            time.sleep(2)
+    return False
+
+
+def _try_page_input(driver, page: int, settle: Callable[[], None]) -> bool:
+    boxes = [b for b in driver.find_elements(By.CSS_SELECTOR, PAGE_INPUT_CSS) if b.is_displayed()]
+    if not boxes:
+        return False
+    box = boxes[0]
+    box.click()
+    box.send_keys(Keys.CONTROL, "a")
+    box.send_keys(str(page), Keys.ENTER)
+    settle()
+    return page in visible_page_buttons(driver)
+
+
+def goto_page(driver, page: int, settle: Optional[Callable[[], None]] = None, max_clicks: int = 10000) -> bool:
+    """
+    Navigate the paginator to `page` and click it. `settle` runs after every navigation click
+    (e.g. wait for the loading overlay). Returns False if the page could not be reached.
+    """
+    settle = settle or (lambda: time.sleep(1))
+
+    buttons = visible_page_buttons(driver)
+    if page not in buttons and _try_page_input(driver, page, settle):
+        buttons = visible_page_buttons(driver)
+
+    last_jump = 0
+    for _ in range(max_clicks):
+        if page in buttons:
+            return _click(driver, buttons[page])
+
+        below = [n for n in buttons if n < page]
+        furthest = max(below) if below else 0
+        if furthest > last_jump:
+            print(f"⏭️ Jumping to page {furthest} on the way to {page}.")
+            _click(driver, buttons[furthest])
+            last_jump = furthest
+        else:
+            print(f"➡️ Page {page} button not found, clicking 'Next' instead.")
+            _click(driver, driver.find_element(By.XPATH, NEXT_BTN_XPATH))
+        settle()
+        buttons = visible_page_buttons(driver)
+    return False
@@ -0,0 +1,198 @@
+# capiq_session.py
+"""
+Keeps a CapIQ browser session usable for a whole run.
+
+SessionManager owns the Chrome of one scraper process (one per fleet worker) and is consulted
+before every page:
+- health: the browser must answer, and must not have been bounced to a sign-in page. An expired
+  session is re-authenticated with cookies re-read from their source; if the source has not
+  changed, it waits (up to COOKIE_WAIT seconds) for someone to update cookies.json / .env.
+- fresh cookies: when the cookie source changes mid-run they are injected into the live browser.
+- recycling: Chrome is restarted every `recycle_every` pages, or as soon as its processes use more
+  than `max_rss_mb` (needs psutil), before memory growth slows it down or kills it.
+- snapshot: the search state (results URL and the filter/sort settings) is kept, so a new or
+  re-authenticated browser lands on the same filtered results; the scraper's goto_page() then
+  takes it back to the page it was on.
+
+The scraper supplies the browser-specific steps as callables: make_driver() -> driver,
+inject(driver, cookies), and restore(driver, snapshot) -> snapshot.
+"""
+import os
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import dotenv_values, find_dotenv
+
+# Optional: Chrome memory measurement
+try:
+    import psutil
+    PSUTIL = True
+except Exception:
+    psutil = None  # type: ignore
+    PSUTIL = False
+
+RECYCLE_EVERY = 150           # pages per browser
+MAX_RSS_MB = 3000             # chromedriver + all Chrome processes
+COOKIE_WAIT = 30 * 60         # seconds to wait for updated cookies once the session has expired
+COOKIE_POLL = 30
+LOGIN_MARKERS = ("login", "signin", "sign-in", "/sso", "authenticate")
+
+
+class CookieSource:
+    """Cookies for the session: a browser cookie export (cookies.json) if given, else COOKIES in .env."""
+    def __init__(self, path: Optional[str] = None, var: str = "COOKIES"):
+        self.path = path
+        self.var = var
+        self.env_file = find_dotenv(usecwd=True) if not path else ""
+        self._stamp = None
+
+    def _mtime(self) -> float:
+        src = self.path or self.env_file
+        try:
+            return os.path.getmtime(src) if src else 0.0
+        except OSError:
+            return 0.0
+
+    def changed(self) -> bool:
+        """True if the source was modified since the last load()."""
+        return self._stamp is not None and self._mtime() != self._stamp
+
+    def load(self) -> List[Dict]:
+        self._stamp = self._mtime()
+        try:
+            if self.path:
+                with open(self.path, encoding="utf-8") as f:
+                    return json.load(f)
+            raw = dotenv_values(self.env_file).get(self.var) if self.env_file else None
+            return json.loads(raw or os.getenv(self.var) or "[]")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"❌ Failed to load cookies from {self.path or self.env_file or self.var}: {e}")
+            return []
+
+
+def chrome_rss_mb(driver) -> Optional[float]:
+    """Resident memory of chromedriver and every browser process under it, in MB (None without psutil)."""
+    if not PSUTIL:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        procs = [root] + root.children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except Exception:
+            pass
+    return total / (1024 * 1024)
+
+
+def session_problem(driver, host: str) -> Optional[str]:
+    """Why the browser cannot carry on (None if it can): unresponsive, or signed out."""
+    try:
+        url = driver.current_url or ""
+        login_form = driver.execute_script("return !!document.querySelector('input[type=\"password\"]')")
+    except Exception as e:
+        return f"browser unresponsive: {e.__class__.__name__}"
+    if host not in url or any(m in url.lower() for m in LOGIN_MARKERS):
+        return f"signed out (now at {url[:100]})"
+    if login_form:
+        return "signed out (login form shown)"
+    return None
+
+
+class SessionManager:
+    def __init__(self, make_driver: Callable, inject: Callable, restore: Callable, cookies: CookieSource,
+                 host: str, recycle_every: int = RECYCLE_EVERY, max_rss_mb: float = MAX_RSS_MB,
+                 cookie_wait: float = COOKIE_WAIT):
+        self.make_driver = make_driver
+        self.inject = inject
+        self.restore = restore
+        self.cookies = cookies
+        self.host = host
+        self.recycle_every = recycle_every
+        self.max_rss_mb = max_rss_mb
+        self.cookie_wait = cookie_wait
+        self.driver = None
+        self.snapshot: Dict = {}
+        self.pages = 0          # pages handled by the current browser
+        self.recycles = 0
+        if max_rss_mb and not PSUTIL:
+            print("ℹ️ psutil not installed; recycling Chrome by page count only.")
+
+    # ---------- lifecycle ----------
+    def open(self):
+        self.driver = self.make_driver()
+        self.inject(self.driver, self.cookies.load())
+        self.snapshot = self.restore(self.driver, self.snapshot) or self.snapshot
+        self.pages = 0
+        return self.driver
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def recycle(self, reason: str):
+        self.recycles += 1
+        print(f"♻️ Recycling Chrome ({reason}); resuming at page {self.snapshot.get('page', '-')}.")
+        self.quit()
+        return self.open()
+
+    def reauthenticate(self, reason: str):
+        """Inject cookies re-read from the source into the live browser and restore the search."""
+        print(f"🔑 Refreshing cookies ({reason}).")
+        try:
+            self.driver.delete_all_cookies()
+        except Exception:
+            pass
+        self.inject(self.driver, self.cookies.load())
+        self.snapshot = self.restore(self.driver, self.snapshot) or self.snapshot
+
+    def wait_for_new_cookies(self):
+        print(f"🔑 CapIQ session expired and the cookies have not changed. Update "
+              f"{self.cookies.path or 'COOKIES in .env'} — waiting up to {self.cookie_wait // 60:.0f} min.")
+        deadline = time.time() + self.cookie_wait
+        while time.time() < deadline:
+            if self.cookies.changed():
+                return
+            time.sleep(COOKIE_POLL)
+        raise RuntimeError("CapIQ session expired and no new cookies were provided")
+
+    # ---------- per page ----------
+    def before_page(self, page: int):
+        """Make sure the browser is healthy, signed in and not bloated before `page`. Returns the driver."""
+        self.snapshot["page"] = page
+        driver = self._check()
+        self.pages += 1
+        return driver
+
+    def _check(self):
+        problem = session_problem(self.driver, self.host)
+        if problem and "unresponsive" in problem:
+            return self.recycle(problem)
+        if problem:
+            if not self.cookies.changed():
+                # the cookies we have may still work in a clean browser; only then wait for new ones
+                self.recycle(problem)
+                if session_problem(self.driver, self.host) is None:
+                    return self.driver
+                self.wait_for_new_cookies()
+            self.reauthenticate(problem)
+            if session_problem(self.driver, self.host):
+                raise RuntimeError(f"CapIQ session still unusable after refreshing cookies: {problem}")
+            return self.driver
+
+        if self.cookies.changed():
+            self.reauthenticate("cookie source updated")
+        if self.recycle_every and self.pages >= self.recycle_every:
+            return self.recycle(f"{self.pages} pages")
+        rss = chrome_rss_mb(self.driver) if self.max_rss_mb else None
+        if rss is not None and rss > self.max_rss_mb:
+            return self.recycle(f"Chrome using {rss:.0f} MB")
+        return self.driver
@@ -0,0 +1,133 @@
+# capiq_stub.py
+"""
+Local stand-in for the CapIQ endpoints used by capiq_api.py, serving recorded responses.
+
+    python capiq_api.py --record recordings/ --max-results 300      # capture once against the live site
+    python capiq_stub.py recordings/ --port 8765
+    python capiq_api.py --base-url http://127.0.0.1:8765 --no-s3 --out-dir stub_pdfs/
+
+A recording dir holds search_<offset>.json (one per search page) and doc_<id>.pdf (one per
+document), exactly as --record writes them. The stub finds the offset in the request the same way
+the client builds it (from the "{offset}" placeholder in the config), so a --config used against
+the live site works unchanged here. --require-cookie NAME answers 401 to requests that lack that
+cookie, to exercise the expired-session path. --delay adds latency per request.
+"""
+import re
+import json
+import time
+import argparse
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from typing import Any, List, Optional
+
+from capiq_api import load_config
+
+
+def placeholder_path(template: Any, name: str, path: Optional[List[str]] = None) -> Optional[List[str]]:
+    """Key path at which "{name}" sits in a JSON template (e.g. ["paging", "offset"])."""
+    path = path or []
+    if isinstance(template, dict):
+        for k, v in template.items():
+            found = placeholder_path(v, name, path + [k])
+            if found:
+                return found
+    elif template == f"{{{name}}}":
+        return path
+    return None
+
+
+def make_handler(root: Path, config: dict, require_cookie: str, delay: float):
+    search_path = config["search_path"]
+    offset_at = placeholder_path(config["search_body"], "offset") or ["offset"]
+    doc_re = re.compile("^" + re.escape(config["download_path"]).replace(re.escape("{id}"), r"(?P<id>[^/?]+)") + "$")
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes, ctype: str):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorised(self) -> bool:
+            if not require_cookie:
+                return True
+            if f"{require_cookie}=" in (self.headers.get("Cookie") or ""):
+                return True
+            self._send(401, b'{"error": "unauthorised"}', "application/json")
+            return False
+
+        def _search(self, offset: int):
+            f = root / f"search_{offset}.json"
+            if not f.exists():
+                self._send(404, json.dumps({"error": f"no recording for offset {offset}"}).encode(), "application/json")
+                return
+            self._send(200, f.read_bytes(), "application/json")
+
+        def do_GET(self):
+            time.sleep(delay)
+            if not self._authorised():
+                return
+            url = urlparse(self.path)
+            if url.path == search_path:
+                q = parse_qs(url.query)
+                self._search(int((q.get(offset_at[-1]) or ["0"])[0]))
+                return
+            m = doc_re.match(url.path)
+            if m:
+                f = root / f"doc_{m.group('id')}.pdf"
+                if f.exists():
+                    self._send(200, f.read_bytes(), "application/pdf")
+                else:
+                    self._send(404, b"not recorded", "text/plain")
+                return
+            self._send(404, b"unknown path", "text/plain")
+
+        def do_POST(self):
+            time.sleep(delay)
+            if not self._authorised():
+                return
+            url = urlparse(self.path)
+            if url.path != search_path:
+                self._send(404, b"unknown path", "text/plain")
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send(400, b'{"error": "bad json"}', "application/json")
+                return
+            for key in offset_at:
+                body = body.get(key, 0) if isinstance(body, dict) else 0
+            self._search(int(body or 0))
+
+        def log_message(self, fmt, *args):
+            print(f"[stub] {self.command} {self.path} -> {fmt % args}", flush=True)
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve recorded CapIQ search/download responses for capiq_api.py.")
+    ap.add_argument("recordings", help="Directory written by capiq_api.py --record.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--config", default="", help="Same --config as given to capiq_api.py.")
+    ap.add_argument("--require-cookie", default="", help="Answer 401 unless this cookie is sent.")
+    ap.add_argument("--delay", type=float, default=0.0, help="Seconds of latency per request.")
+    args = ap.parse_args()
+
+    root = Path(args.recordings)
+    handler = make_handler(root, load_config(args.config or None), args.require_cookie, args.delay)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"🧪 CapIQ stub serving {root} on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
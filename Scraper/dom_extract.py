@@ -0,0 +1,41 @@
+# dom_extract.py
+"""
+Single-round-trip DOM extraction for the Selenium scrapers.
+
+Every WebDriver call (find_element, .text, get_attribute, ...) is an HTTP round trip to
+chromedriver. These helpers run one execute_script per page and return plain Python data,
+shaped like the HTTP backend's parse output so the same row parsers in http_listing apply.
+"""
+from typing import List, Tuple
+
+from http_listing import Cell, ParsedPage
+
+_TABLE_ROWS_JS = """
+return Array.from(document.querySelectorAll(arguments[0])).map(tr =>
+  Array.from(tr.children).filter(c => c.tagName === 'TD').map(td => [
+    (td.innerText || '').trim(),
+    Array.from(td.querySelectorAll('a[href]')).map(a => a.href)
+  ])
+);
+"""
+
+_ANCHORS_JS = """
+return Array.from(arguments[0].querySelectorAll('a[href]')).map(a => [(a.innerText || '').trim(), a.href]);
+"""
+
+
+def extract_table_rows(driver, row_selector: str = "table tbody tr") -> List[List[Cell]]:
+    """All rows matching row_selector as [[Cell(text, [absolute hrefs]), ...], ...] in one call."""
+    raw = driver.execute_script(_TABLE_ROWS_JS, row_selector) or []
+    return [[Cell(" ".join((text or "").split()), list(hrefs or [])) for text, hrefs in row] for row in raw]
+
+
+def extract_page(driver, row_selector: str = "table tbody tr") -> ParsedPage:
+    """The current page's table as a ParsedPage, ready for http_listing's *_records parsers."""
+    return ParsedPage(extract_table_rows(driver, row_selector), [], None)
+
+
+def extract_anchors(driver, element) -> List[Tuple[str, str]]:
+    """(text, absolute href) for every <a href> under element, in one call."""
+    raw = driver.execute_script(_ANCHORS_JS, element) or []
+    return [(text or "", href or "") for text, href in raw]
@@ -0,0 +1,144 @@
+# download_watch.py
+"""
+Event-driven completion watcher for browser downloads (CapIQ ZIPs).
+
+Chrome writes `<name>.crdownload` and renames it to `<name>.zip` once the transfer is complete.
+On Linux with `inotify_simple` installed, that rename (IN_MOVED_TO) or a direct IN_CLOSE_WRITE of a
+.zip signals completion the moment it happens. Elsewhere a portable fallback scans the directory
+every `poll_interval` seconds and accepts a new .zip once no .crdownload is left and its size held
+steady across two scans.
+
+An optional error check (e.g. the "Error occurred while preparing documents" DOM text) runs in
+its own thread at its own cadence, so it never delays the download signal.
+
+    watcher = DownloadWatcher(download_dir, suffix=".zip")
+    watcher.arm()                      # before clicking "Download"
+    ...click...
+    status, path = watcher.wait(timeout=120, error_check=lambda: dom_has_error(driver))
+"""
+import os
+import threading
+from typing import Callable, Optional, Set, Tuple
+
+# Optional inotify (Linux)
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    INOTIFY = True
+except Exception:
+    INotify = None  # type: ignore
+    inotify_flags = None  # type: ignore
+    INOTIFY = False
+
+
+class DownloadWatcher:
+    def __init__(self, download_dir: str, suffix: str = ".zip", poll_interval: float = 0.25):
+        self.dir = download_dir
+        self.suffix = suffix.lower()
+        self.poll_interval = poll_interval
+        self._known: Set[str] = set()
+        self._inotify = None
+
+    def _listing(self) -> Set[str]:
+        try:
+            return {e.name for e in os.scandir(self.dir) if e.is_file()}
+        except FileNotFoundError:
+            return set()
+
+    def arm(self):
+        """Snapshot existing files (and start the inotify watch) before the download is triggered."""
+        self.close()
+        self._known = {n for n in self._listing() if n.lower().endswith(self.suffix)}
+        if INOTIFY:
+            try:
+                self._inotify = INotify()
+                self._inotify.add_watch(self.dir, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+            except Exception:
+                self._inotify = None
+
+    def close(self):
+        if self._inotify is not None:
+            try:
+                self._inotify.close()
+            except Exception:
+                pass
+            self._inotify = None
+
+    # ---------- completion sources ----------
+    def _new_complete_file(self) -> Optional[str]:
+        names = self._listing()
+        if any(n.endswith(".crdownload") for n in names):
+            return None
+        new = [n for n in names if n.lower().endswith(self.suffix) and n not in self._known]
+        if not new:
+            return None
+        return max((os.path.join(self.dir, n) for n in new), key=os.path.getmtime)
+
+    def _watch_inotify(self, done: threading.Event, result: dict, stop: threading.Event):
+        while not stop.is_set():
+            for ev in self._inotify.read(timeout=int(self.poll_interval * 1000)):
+                name = ev.name or ""
+                if name.lower().endswith(self.suffix) and name not in self._known:
+                    result["path"] = os.path.join(self.dir, name)
+                    done.set()
+                    return
+
+    def _watch_polling(self, done: threading.Event, result: dict, stop: threading.Event):
+        last: Tuple[Optional[str], int] = (None, -1)
+        while not stop.is_set():
+            path = self._new_complete_file()
+            if path:
+                size = os.path.getsize(path)
+                if last == (path, size):
+                    result["path"] = path
+                    done.set()
+                    return
+                last = (path, size)
+            stop.wait(self.poll_interval)
+
+    @staticmethod
+    def _watch_errors(check: Callable[[], bool], interval: float, done: threading.Event,
+                      result: dict, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                if check():
+                    result["error"] = True
+                    done.set()
+                    return
+            except Exception:
+                pass
+            stop.wait(interval)
+
+    # ---------- wait ----------
+    def wait(self, timeout: float = 120, error_check: Optional[Callable[[], bool]] = None,
+             error_interval: float = 1.0) -> Tuple[str, Optional[str]]:
+        """Block until a new file completes, the error check fires, or timeout.
+        Returns ("success", path) | ("error", None) | ("timeout", None)."""
+        done, stop = threading.Event(), threading.Event()
+        result: dict = {}
+
+        # already finished between arm() and wait()?
+        path = self._new_complete_file()
+        if path:
+            self.close()
+            return "success", path
+
+        watch = self._watch_inotify if self._inotify is not None else self._watch_polling
+        threads = [threading.Thread(target=watch, args=(done, result, stop), daemon=True)]
+        if error_check is not None:
+            threads.append(threading.Thread(target=self._watch_errors,
+                                            args=(error_check, error_interval, done, result, stop), daemon=True))
+        for t in threads:
+            t.start()
+        try:
+            done.wait(timeout)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join(timeout=2)
+            self.close()
+
+        if result.get("path"):
+            return "success", result["path"]
+        if result.get("error"):
+            return "error", None
+        return "timeout", None
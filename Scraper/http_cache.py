@@ -0,0 +1,213 @@
+# http_cache.py
+"""
+On-disk conditional-GET cache shared by the Fed scrapers.
+
+Each URL is stored as two files under the cache dir, keyed by sha256(url):
+    <key>.body   raw response bytes
+    <key>.json   metadata (url, etag, last_modified, content_type, size, sha256, fetched_at, last_used, ...)
+
+Entries younger than `ttl` are served without touching the network. Older entries are
+revalidated with If-None-Match / If-Modified-Since; a 304 refreshes the entry and skips
+the body. Total body size is kept under `max_bytes` by evicting least-recently-used entries.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from budget import throttle
+
+DEFAULT_CACHE_DIR = str(Path.cwd() / ".http_cache")
+DEFAULT_TTL = 6 * 3600                # serve without revalidating for 6h
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3    # 20 GB of bodies
+
+
+class HttpCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, session: Optional[requests.Session] = None):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._total = sum(p.stat().st_size for p in self.dir.glob("*.body"))
+
+    # ---------- paths / metadata ----------
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def body_path(self, url: str) -> Path:
+        return self.dir / f"{self._key(url)}.body"
+
+    def _meta_path(self, url: str) -> Path:
+        return self.dir / f"{self._key(url)}.json"
+
+    def meta(self, url: str) -> Optional[Dict]:
+        mp = self._meta_path(url)
+        if not mp.exists() or not self.body_path(url).exists():
+            return None
+        try:
+            return json.loads(mp.read_text())
+        except Exception:
+            return None
+
+    def _write_meta(self, url: str, meta: Dict):
+        mp = self._meta_path(url)
+        tmp = mp.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, mp)
+
+    def annotate(self, url: str, **fields):
+        """Attach caller bookkeeping (e.g. the S3 key it was uploaded to) to a cached entry."""
+        with self._lock:
+            meta = self.meta(url)
+            if meta is None:
+                return
+            meta.update(fields)
+            self._write_meta(url, meta)
+
+    # ---------- fetch ----------
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 60,
+              chunk_size: int = 1024 * 64) -> Tuple[Path, Dict, bool]:
+        """
+        Return (body_path, meta, fresh_download). fresh_download is False when the body
+        came from the cache (within TTL, or the server answered 304 Not Modified).
+        Raises on HTTP errors or a body shorter than its Content-Length; a failed download
+        never replaces a good cached entry.
+        """
+        meta = self.meta(url)
+        now = time.time()
+
+        if meta and now - meta.get("fetched_at", 0) < self.ttl:
+            self._touch(url, meta, now)
+            return self.body_path(url), meta, False
+
+        req_headers = dict(headers or {})
+        if meta:
+            if meta.get("etag"):
+                req_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                req_headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self.session.get(url, headers=req_headers, stream=True, timeout=timeout) as r:
+            if r.status_code == 304 and meta:
+                meta["fetched_at"] = now
+                self._touch(url, meta, now)
+                return self.body_path(url), meta, False
+            r.raise_for_status()
+
+            body = self.body_path(url)
+            tmp = body.with_suffix(".body.tmp")
+            size = 0
+            digest = hashlib.sha256()
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        throttle().consume(len(chunk))
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+
+            length = r.headers.get("Content-Length") or ""
+            encoded = (r.headers.get("Content-Encoding") or "identity").lower() != "identity"
+            if length.isdigit() and not encoded and size != int(length):
+                tmp.unlink()
+                raise RuntimeError(f"short body: {size} of {length} bytes")
+
+            new_meta = {
+                "url": url,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "content_type": r.headers.get("Content-Type"),
+                "size": size,
+                "sha256": digest.hexdigest(),
+                "fetched_at": now,
+                "last_used": now,
+            }
+
+        with self._lock:
+            old_size = body.stat().st_size if body.exists() else 0
+            os.replace(tmp, body)
+            self._write_meta(url, new_meta)
+            self._total += size - old_size
+            self._evict(keep=url)
+        return body, new_meta, True
+
+    def get_text(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 60,
+                 encoding: str = "utf-8") -> str:
+        """Convenience for listing pages: fetch through the cache and decode the body."""
+        path, _, _ = self.fetch(url, headers=headers, timeout=timeout)
+        return path.read_bytes().decode(encoding, errors="replace")
+
+    def adopt(self, url: str, path: str, **fields) -> Dict:
+        """
+        Enter a body downloaded elsewhere (e.g. a resumed ranged download) as the entry for `url`.
+        `fields` are its metadata: etag, last_modified, content_type, sha256. Returns the meta.
+        """
+        now = time.time()
+        body = self.body_path(url)
+        tmp = body.with_suffix(".body.tmp")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        size = tmp.stat().st_size
+        meta = {"url": url, "etag": None, "last_modified": None, "content_type": None, "sha256": None,
+                **fields, "size": size, "fetched_at": now, "last_used": now}
+        with self._lock:
+            old_size = body.stat().st_size if body.exists() else 0
+            os.replace(tmp, body)
+            self._write_meta(url, meta)
+            self._total += size - old_size
+            self._evict(keep=url)
+        return meta
+
+    def invalidate(self, url: str):
+        """Forget a cached entry (e.g. a body that failed validation) so the next fetch is a full GET."""
+        with self._lock:
+            body = self.body_path(url)
+            if body.exists():
+                self._total -= body.stat().st_size
+                body.unlink()
+            self._meta_path(url).unlink(missing_ok=True)
+
+    # ---------- housekeeping ----------
+    def _touch(self, url: str, meta: Dict, now: float):
+        meta["last_used"] = now
+        with self._lock:
+            self._write_meta(url, meta)
+
+    def _evict(self, keep: str):
+        """Drop least-recently-used entries until total body size fits max_bytes. Caller holds the lock."""
+        if self._total <= self.max_bytes:
+            return
+        entries = []
+        for mp in self.dir.glob("*.json"):
+            try:
+                m = json.loads(mp.read_text())
+            except Exception:
+                continue
+            if m.get("url") == keep:
+                continue
+            entries.append((m.get("last_used", 0), mp, m.get("size", 0)))
+        entries.sort(key=lambda e: e[0])
+
+        for _, mp, size in entries:
+            if self._total <= self.max_bytes:
+                break
+            body = mp.with_suffix(".body")
+            try:
+                size = body.stat().st_size
+                body.unlink()
+            except FileNotFoundError:
+                pass
+            mp.unlink(missing_ok=True)
+            self._total -= size
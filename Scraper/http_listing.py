@@ -0,0 +1,414 @@
+# http_listing.py
+"""
+Selenium-free listing backend for the district scrapers.
+
+The Fed listing pages are plain server-rendered HTML (tables / accordion panels), so they can be
+fetched with a pooled requests.Session and parsed directly. Each district parser returns the same
+records the Selenium scrapers produce:
+
+    ListingRecord(doc_id, year, url)   # doc_id = RSSD / DocumentID / PDF filename (Cleveland)
+
+Run standalone to write the usual scraped_<district>_data.csv + <District>_JSON.json outputs
+(through the same <district>_manifest.ndjson the Selenium scrapers use):
+
+    python http_listing.py dallas --page-url-template "<start_url>?page={page}" --workers 8
+    python http_listing.py minneapolis --page-url-template "<start_url>?page={page}" --max-pages 503
+    python http_listing.py richmond --from-year 2024 --to-year 2019
+
+Dallas (button.page-link.next) and Minneapolis (a script-driven "Next") page their tables in the
+browser, so there is no Next href for plain HTTP to follow. They have no supported HTTP backend:
+no page URL template ships for them, the orchestrator always runs them in Chrome, and the parsers
+here only work with a --page-url-template found by hand in the browser. A crawl that ends after a single page is reported as a
+failure (exit 1), since it almost always means the pagination was not followed.
+"""
+import re
+import sys
+import time
+import argparse
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Optional fast parser
+try:
+    import lxml.html
+    LXML = True
+except Exception:
+    lxml = None  # type: ignore
+    LXML = False
+
+from http_cache import HttpCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+from manifest import ManifestWriter
+from budget import throttle
+
+USER_AGENT = "Mozilla/5.0 (compatible; PDF-Scraper/1.0)"
+YEAR_HEADER_RE = re.compile(r"FR Y-6 Reports (\d{4})")
+
+DALLAS_URL = "https://www.dallasfed.org/banking/nic/fry-6"
+MINNEAPOLIS_URL = "https://www.minneapolisfed.org/banking/statistical-and-structure-reports/structure-reports/search-reports"
+RICHMOND_URL = "https://www.richmondfed.org/banking/research_data/fry6_reports"
+CLEVELAND_URL = "https://www.clevelandfed.org/banking-and-payments/fry6-reports"
+
+try:
+    sys.stdout.reconfigure(line_buffering=True)
+except Exception:
+    pass
+
+def ts() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+def log(msg: str):
+    print(f"[{ts()}] {msg}", flush=True)
+
+
+class ListingRecord(NamedTuple):
+    doc_id: str
+    year: str
+    url: str
+
+
+# ---------------- parsing ----------------
+class Cell(NamedTuple):
+    text: str
+    hrefs: List[str]
+
+
+class ParsedPage(NamedTuple):
+    rows: List[List[Cell]]                 # every <tr> with <td> cells, in document order
+    anchors: List[tuple]                   # (text, href, year_header) for every <a href>
+    next_href: Optional[str]               # href of a "Next" pagination link, if any
+
+
+class _StdlibParser(HTMLParser):
+    """Fallback parser (stdlib only): collects table rows, anchors and the "Next" link."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[Cell]] = []
+        self.anchors: List[tuple] = []
+        self.next_href: Optional[str] = None
+        self._row: Optional[List[Cell]] = None
+        self._cell_text: Optional[List[str]] = None
+        self._cell_hrefs: List[str] = []
+        self._a_href: Optional[str] = None
+        self._a_text: List[str] = []
+        self._a_rel = ""
+        self._year: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell_text, self._cell_hrefs = [], []
+        elif tag == "a" and a.get("href"):
+            self._a_href, self._a_text, self._a_rel = a["href"].strip(), [], (a.get("rel") or "")
+            if self._cell_text is not None:
+                self._cell_hrefs.append(self._a_href)
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._row is not None and self._cell_text is not None:
+            self._row.append(Cell(" ".join("".join(self._cell_text).split()), self._cell_hrefs))
+            self._cell_text = None
+        elif tag == "tr" and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+            self._row = None
+        elif tag == "a" and self._a_href is not None:
+            text = " ".join("".join(self._a_text).split())
+            self.anchors.append((text, self._a_href, self._year))
+            if self.next_href is None and (text.lower() == "next" or "next" in self._a_rel.lower()):
+                if self._a_href not in ("#", "") and not self._a_href.startswith("javascript"):
+                    self.next_href = self._a_href
+            self._a_href = None
+
+    def handle_data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+        if self._a_href is not None:
+            self._a_text.append(data)
+        m = YEAR_HEADER_RE.search(data)
+        if m:
+            self._year = m.group(1)
+
+
+def _parse_lxml(html: str) -> ParsedPage:
+    doc = lxml.html.fromstring(html)
+    rows: List[List[Cell]] = []
+    for tr in doc.iter("tr"):
+        tds = tr.findall("td")
+        if tds:
+            rows.append([
+                Cell(" ".join(td.text_content().split()), [h.strip() for h in td.xpath(".//a/@href")])
+                for td in tds
+            ])
+
+    anchors: List[tuple] = []
+    next_href: Optional[str] = None
+    year: Optional[str] = None
+    for el in doc.iter():
+        if not isinstance(el.tag, str):
+            continue
+        if el.tag == "a" and el.get("href"):
+            text = " ".join(el.text_content().split())
+            href = el.get("href").strip()
+            anchors.append((text, href, year))
+            if next_href is None and (text.lower() == "next" or "next" in (el.get("rel") or "").lower()):
+                if href not in ("#", "") and not href.startswith("javascript"):
+                    next_href = href
+        for chunk in (el.text, el.tail):
+            m = YEAR_HEADER_RE.search(chunk or "")
+            if m:
+                year = m.group(1)
+    return ParsedPage(rows, anchors, next_href)
+
+
+def parse_page(html: str) -> ParsedPage:
+    if LXML:
+        return _parse_lxml(html)
+    p = _StdlibParser()
+    p.feed(html)
+    p.close()
+    return ParsedPage(p.rows, p.anchors, p.next_href)
+
+
+def _cell(row: List[Cell], n: int) -> Optional[Cell]:
+    return row[n - 1] if len(row) >= n else None
+
+
+# ---------------- per-district row parsers ----------------
+def dallas_records(page: ParsedPage, page_url: str) -> List[ListingRecord]:
+    """Columns: 1) document link (text = DocumentID), 3) year. Same as scraper_dallas.py."""
+    out = []
+    for row in page.rows:
+        c1, c3 = _cell(row, 1), _cell(row, 3)
+        if not c1 or not c3 or not c1.hrefs:
+            continue
+        out.append(ListingRecord(c1.text, c3.text, urljoin(page_url, c1.hrefs[0])))
+    return out
+
+
+# Minneapolis uses the same table layout (1: RSSD link, 3: year)
+minneapolis_records = dallas_records
+
+
+def richmond_records(page: ParsedPage, page_url: str, tab_year: int = 0) -> List[ListingRecord]:
+    """Columns: 1) RSSD, 2) Holding Company (may hold the link), 3) Report Date mm/dd/yyyy."""
+    out = []
+    for row in page.rows:
+        c1, c3 = _cell(row, 1), _cell(row, 3)
+        if not c1 or not c3:
+            continue
+        report_date = c3.text
+        row_year = str(tab_year)
+        parts = report_date.split("/")
+        if len(parts) == 3 and parts[-1].isdigit():
+            row_year = parts[-1]
+
+        hrefs = [h for c in row for h in c.hrefs]
+        pdf = next((h for h in hrefs if h.lower().endswith(".pdf")), None)
+        if not pdf:
+            continue
+        out.append(ListingRecord(c1.text, row_year, urljoin("https://www.richmondfed.org", pdf)))
+    return out
+
+
+def cleveland_records(page: ParsedPage, page_url: str) -> List[ListingRecord]:
+    """Every .pdf anchor under a "FR Y-6 Reports {year}" panel; doc_id is the PDF filename."""
+    out = []
+    for text, href, year in page.anchors:
+        if not href.lower().endswith(".pdf"):
+            continue
+        url = urljoin(page_url, href)
+        if year is None:
+            m = re.search(r"/fry6-reports/(\d{4})/", url)
+            year = m.group(1) if m else ""
+        out.append(ListingRecord(url.rsplit("/", 1)[-1], year, url))
+    return out
+
+
+# ---------------- fetching ----------------
+class HostLimiter:
+    """
+    Caps the number of in-flight requests per host (netloc), independent of the pool size.
+    """
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+
+    def slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+
+class HttpLister:
+    """
+    Pooled HTTP fetcher for listing pages. With a cache, unchanged pages cost a conditional GET.
+    A limiter caps the requests in flight to one host, whatever the pool size.
+    """
+
+    def __init__(self, workers: int = 8, cache: Optional[HttpCache] = None, timeout: int = 30,
+                 limiter: Optional[HostLimiter] = None):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers, max_retries=3)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self.cache = cache
+        if cache is not None:
+            cache.session = self.session
+
+    def get(self, url: str) -> str:
+        if self.limiter is not None:
+            with self.limiter.slot(url):
+                return self._get(url)
+        return self._get(url)
+
+    def _get(self, url: str) -> str:
+        if self.cache is not None:
+            return self.cache.get_text(url, headers={"User-Agent": USER_AGENT}, timeout=self.timeout)
+        r = self.session.get(url, timeout=self.timeout)
+        r.raise_for_status()
+        throttle().consume(len(r.content))
+        return r.text
+
+    def fetch_parsed(self, url: str) -> ParsedPage:
+        return parse_page(self.get(url))
+
+    def fetch_pages(self, template: str, parse_rows: Callable, max_pages: int) -> Iterable[List[ListingRecord]]:
+        """
+        Concurrent crawl for sites with a direct page URL (template with {page}). Pages are fetched
+        in windows of `workers`; the crawl stops after the first window that contains an empty page.
+        Yields record lists in page order.
+        """
+        previous: Optional[List[ListingRecord]] = None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            start = 1
+            while start <= max_pages:
+                nums = list(range(start, min(start + self.workers, max_pages + 1)))
+                urls = [template.format(page=n) for n in nums]
+                pages = list(pool.map(self.fetch_parsed, urls))
+                done = False
+                for n, url, page in zip(nums, urls, pages):
+                    recs = parse_rows(page, url)
+                    log(f"   • page {n}: {len(recs)} rows")
+                    if not recs:
+                        done = True
+                        break
+                    if recs == previous:
+                        raise RuntimeError(f"page {n} repeats page {n - 1}; the server ignores the page "
+                                           f"parameter of {template!r}")
+                    previous = recs
+                    yield recs
+                if done:
+                    break
+                start += self.workers
+
+    def fetch_years(self, url_for_year: Callable[[int], str], parse_rows: Callable,
+                    years: Iterable[int]) -> Dict[int, List[ListingRecord]]:
+        """Fetch one listing page per year concurrently (Richmond ?year=)."""
+        years = list(years)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pages = pool.map(lambda y: (y, self.fetch_parsed(url_for_year(y))), years)
+            return {y: parse_rows(page, url_for_year(y), y) for y, page in pages}
+
+
+# ---------------- standalone outputs ----------------
+DISTRICTS = {
+    "dallas": ("scraped_dallas_data.csv", "DocumentID,Year", "Dallas_JSON.json", "Dallas_Documents/"),
+    "minneapolis": ("scraped_minneapolis_data.csv", "RSSD,Year", "Minneapolis_JSON.json", "Minneapolis_Documents/"),
+    "richmond": ("scraped_richmond_data.csv", "RSSD,Year", "Richmond_JSON.json", "Richmond_Documents/"),
+}
+
+
+# districts whose Next control is not a link, so only a direct page URL can page them
+PAGED_IN_BROWSER = {
+    "dallas": "a <button class=\"page-link next\">",
+    "minneapolis": "a script-driven Next control",
+}
+
+
+def open_manifest(district: str, s3_bucket: Optional[str]) -> ManifestWriter:
+    """The same manifest/CSV/JSON trio the district's Selenium scraper writes."""
+    csv_file, header, json_file, s3_folder = DISTRICTS[district]
+    return ManifestWriter(
+        f"{district}_manifest.ndjson",
+        json_path=json_file,
+        csv_path=csv_file,
+        csv_header=header.split(","),
+        csv_fields=["id", "year"],
+        s3_bucket=s3_bucket,
+        s3_key=s3_folder + json_file if s3_bucket else None,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fetch FR Y-6 listings over plain HTTP (no Selenium).")
+    ap.add_argument("district", choices=sorted(DISTRICTS))
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--per-host", type=int, default=4, help="Max in-flight requests per host.")
+    ap.add_argument("--page-url-template", default="",
+                    help="Direct page URL with {page}; required for Dallas/Minneapolis, whose Next control has no href.")
+    ap.add_argument("--max-pages", type=int, default=503)
+    ap.add_argument("--from-year", type=int, default=2024, help="Richmond only.")
+    ap.add_argument("--to-year", type=int, default=2019, help="Richmond only.")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL)
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--no-s3", action="store_true")
+    ap.add_argument("--s3-bucket", default="fed-data-storage")
+    args = ap.parse_args()
+    if args.district in PAGED_IN_BROWSER and not args.page_url_template:
+        ap.error(f"{args.district} pages its table with {PAGED_IN_BROWSER[args.district]}, which plain HTTP cannot "
+                 f"follow; pass --page-url-template or run scraper_{args.district}.py")
+
+    cache = None if args.no_cache else HttpCache(args.cache_dir, ttl=args.cache_ttl)
+    lister = HttpLister(workers=args.workers, cache=cache, limiter=HostLimiter(args.per_host))
+    manifest = open_manifest(args.district, None if args.no_s3 else args.s3_bucket)
+    records: List[ListingRecord] = []
+
+    if args.district == "richmond":
+        lo, hi = sorted((args.from_year, args.to_year))
+        by_year = lister.fetch_years(lambda y: f"{RICHMOND_URL}?year={y}", richmond_records, range(hi, lo - 1, -1))
+        for year, recs in by_year.items():
+            log(f"✅ Year {year}: {len(recs)} PDF links")
+            records.extend(recs)
+            for r in recs:
+                manifest.append({"id": r.doc_id, "year": r.year, "url": r.url, "tab_year": year})
+    else:
+        parse_rows = dallas_records if args.district == "dallas" else minneapolis_records
+        crawled = 0
+        try:
+            for recs in lister.fetch_pages(args.page_url_template, parse_rows, args.max_pages):
+                crawled += 1
+                records.extend(recs)
+                for r in recs:
+                    manifest.append({"id": r.doc_id, "year": r.year, "url": r.url})
+        except RuntimeError as e:
+            manifest.close(snapshot=False)
+            log(f"❌ {e}")
+            sys.exit(1)
+        if crawled <= 1 and args.max_pages > 1:
+            manifest.close(snapshot=False)
+            log(f"❌ Only {crawled} page(s) listed; check --page-url-template ({args.page_url_template}).")
+            sys.exit(1)
+
+    manifest.close()  # final commit + JSON snapshot (+ S3 upload)
+    log(f"🏁 Done. {len(records)} records ({'lxml' if LXML else 'html.parser'}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# manifest.py
+"""
+Append-only scrape manifest shared by the district scrapers.
+
+Records are dicts (at least "url"; usually "id" and "year" too). They are buffered and
+group-committed to an NDJSON log, one fsync per commit rather than per row. A commit happens
+when `commit_size` records are pending or `commit_interval` seconds have passed since the last one.
+The optional CSV (e.g. scraped_dallas_data.csv) is written in the same commit.
+
+The legacy `<District>_JSON.json` URL array is a compacted snapshot derived from the log
+(first occurrence of each URL, in log order). Snapshots are written every `snapshot_interval`
+seconds and on close, and pushed to S3 when a bucket/key is configured.
+"""
+import os
+import csv
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+def read_manifest(ndjson_path: str) -> List[Dict]:
+    out: List[Dict] = []
+    if not Path(ndjson_path).exists():
+        return out
+    with open(ndjson_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                out.append(json.loads(line))
+            except json.JSONDecodeError:
+                # torn last line after a crash; everything before it is intact
+                continue
+    return out
+
+
+def derive_url_array(ndjson_path: str) -> List[str]:
+    """Compacted Dallas_JSON.json-style array: unique URLs in first-seen order."""
+    seen, urls = set(), []
+    for rec in read_manifest(ndjson_path):
+        url = rec.get("url")
+        if url and url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+class ManifestWriter:
+    def __init__(self, ndjson_path: str, json_path: Optional[str] = None,
+                 csv_path: Optional[str] = None, csv_header: Optional[Sequence[str]] = None,
+                 csv_fields: Optional[Sequence[str]] = None,
+                 s3_bucket: Optional[str] = None, s3_key: Optional[str] = None,
+                 commit_size: int = 200, commit_interval: float = 2.0, snapshot_interval: float = 300.0):
+        self.ndjson_path = ndjson_path
+        self.json_path = json_path
+        self.csv_path = csv_path
+        self.csv_fields = list(csv_fields or [])
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.commit_size = commit_size
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._last_commit = time.time()
+        self._last_snapshot = time.time()
+
+        self._seed_from_json()
+        self._log = open(ndjson_path, "a", encoding="utf-8")
+        self._csv = None
+        if csv_path:
+            new = not Path(csv_path).exists() or Path(csv_path).stat().st_size == 0
+            self._csv = open(csv_path, "a", newline="", encoding="utf-8")
+            if new and csv_header:
+                csv.writer(self._csv).writerow(csv_header)
+
+    def _seed_from_json(self):
+        """First run against an existing JSON array: import it so the snapshot stays a superset."""
+        if Path(self.ndjson_path).exists() or not self.json_path or not Path(self.json_path).exists():
+            return
+        try:
+            with open(self.json_path, encoding="utf-8") as f:
+                urls = json.load(f)
+        except Exception:
+            return
+        with open(self.ndjson_path, "w", encoding="utf-8") as f:
+            for url in urls:
+                f.write(json.dumps({"url": url, "seeded": True}) + "\n")
+
+    # ---------- writes ----------
+    def append(self, record: Dict):
+        with self._lock:
+            self._pending.append(record)
+            due = (len(self._pending) >= self.commit_size
+                   or time.time() - self._last_commit >= self.commit_interval)
+            if due:
+                self._commit_locked()
+        if self.snapshot_interval and time.time() - self._last_snapshot >= self.snapshot_interval:
+            self.snapshot()
+
+    def commit(self):
+        with self._lock:
+            self._commit_locked()
+
+    def _commit_locked(self):
+        self._last_commit = time.time()
+        if not self._pending:
+            return
+        self._log.write("".join(json.dumps(r) + "\n" for r in self._pending))
+        _sync(self._log)
+        if self._csv is not None:
+            w = csv.writer(self._csv)
+            for r in self._pending:
+                w.writerow([r.get(k, "") for k in self.csv_fields])
+            _sync(self._csv)
+        self._pending.clear()
+
+    def snapshot(self):
+        """Commit, rewrite the compacted JSON array atomically, and push it to S3 if configured."""
+        self.commit()
+        self._last_snapshot = time.time()
+        if not self.json_path:
+            return
+        urls = derive_url_array(self.ndjson_path)
+        tmp = f"{self.json_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(urls, f, indent=2)
+        os.replace(tmp, self.json_path)
+        if self.s3_bucket and self.s3_key:
+            try:
+                import boto3
+                boto3.client("s3").upload_file(self.json_path, self.s3_bucket, self.s3_key)
+                print(f"📤 Uploaded to S3: s3://{self.s3_bucket}/{self.s3_key} ({len(urls)} URLs)", flush=True)
+            except Exception as e:
+                # the local log is the source of truth; the next snapshot retries the upload
+                print(f"⚠️  Snapshot upload failed: {e}", flush=True)
+
+    def close(self, snapshot: bool = True):
+        try:
+            if snapshot:
+                self.snapshot()
+            else:
+                self.commit()
+        finally:
+            self._log.close()
+            if self._csv is not None:
+                self._csv.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _sync(f):
+    f.flush()
+    try:
+        os.fsync(f.fileno())
+    except Exception:
+        pass
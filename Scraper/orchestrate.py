@@ -0,0 +1,266 @@
+# orchestrate.py
+"""
+Run every district scraper at once under global budgets.
+
+Each district runs as its own process (the scrapers are standalone scripts with their own S3
+prefixes and outputs). The orchestrator decides how much each one may use:
+- browsers: --max-browsers Chrome instances in total. Each Selenium district gets one, and the
+  spare ones become --shards for the districts that can shard (Cleveland, Richmond). A district
+  waits in the queue while no browser is free. With --backend http, Cleveland and Richmond need none.
+  Dallas and Minneapolis have no HTTP backend: they always run in Chrome, whatever --backend says.
+- HTTP connections: --max-connections is split across the districts that download over HTTP
+  (--workers), and --per-host caps the in-flight requests to each Fed host.
+- bandwidth: --max-mbps is shared by the running HTTP districts through per-district budget files
+  (see budget.py). When a district finishes, its share is handed to the ones still running.
+
+Every district runs in --work-dir (default: the directory the orchestrator is started from), so
+its manifests, <district>_state.json checkpoints, .http_cache/ and pdf_index.csv are the same
+files a manual run from that directory uses. Output from every district goes to
+<work-dir>/logs/<district>.log, and a combined progress view is printed every --status-interval
+seconds. All districts run concurrently, so a full refresh takes as long
+as the slowest district, not the sum of all of them.
+
+    python orchestrate.py                                   # all districts
+    python orchestrate.py --districts cleveland richmond --max-browsers 4 --max-mbps 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from budget import BUDGET_FILE_ENV
+
+SCRAPER_DIR = Path(__file__).resolve().parent
+LOG_DIR_NAME = "logs"         # under --work-dir
+BUDGET_DIR_NAME = ".budgets"
+
+# script, Fed host, and which knobs the script understands. Dallas and Minneapolis page their tables
+# with in-browser controls that plain HTTP cannot follow, so they are Selenium-only.
+DISTRICTS: Dict[str, Dict] = {
+    "cleveland": {"script": "scraper_cleveland.py", "host": "www.clevelandfed.org",
+                  "shards": True, "http_backend": True, "downloads": True, "cli": True},
+    "richmond": {"script": "scraper_richmond.py", "host": "www.richmondfed.org",
+                 "shards": True, "http_backend": True, "downloads": False, "cli": True},
+    "dallas": {"script": "scraper_dallas.py", "host": "www.dallasfed.org",
+               "shards": False, "http_backend": False, "downloads": False, "cli": False},
+    "minneapolis": {"script": "scraper_minneapolis.py", "host": "www.minneapolisfed.org",
+                    "shards": False, "http_backend": False, "downloads": False, "cli": False},
+}
+MAX_SHARDS_PER_DISTRICT = 4
+
+
+def ts() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+def log(msg: str):
+    print(f"[{ts()}] {msg}", flush=True)
+
+def fmt_secs(s: float) -> str:
+    s = int(s)
+    return f"{s // 3600}h{s % 3600 // 60:02d}m" if s >= 3600 else f"{s // 60}m{s % 60:02d}s"
+
+
+class Job:
+    def __init__(self, name: str, spec: Dict, http: bool, work_dir: Path):
+        self.name = name
+        self.spec = spec
+        self.work_dir = work_dir
+        self.http = http and spec["http_backend"]   # HTTP listing backend instead of Chrome
+        self.browsers = 0 if self.http else 1
+        self.workers = 0
+        self.per_host = 0
+        self.proc: Optional[subprocess.Popen] = None
+        self.state = "queued"
+        self.started = 0.0
+        self.ended = 0.0
+        self.lines = 0
+        self.last = ""
+        self.returncode: Optional[int] = None
+
+    @property
+    def uses_http(self) -> bool:
+        return self.spec["downloads"] or self.http
+
+    @property
+    def budget_file(self) -> Path:
+        return self.work_dir / BUDGET_DIR_NAME / f"{self.name}.json"
+
+    @property
+    def log_file(self) -> Path:
+        return self.work_dir / LOG_DIR_NAME / f"{self.name}.log"
+
+    def command(self, no_s3: bool) -> List[str]:
+        cmd = [sys.executable, "-u", str(SCRAPER_DIR / self.spec["script"])]
+        if not self.spec["cli"]:
+            return cmd
+        cmd += ["--backend", "http" if self.http else "selenium"]
+        if self.spec["shards"] and self.browsers > 1:
+            cmd += ["--shards", str(self.browsers)]
+        if self.workers:
+            cmd += ["--workers", str(self.workers)]
+        if self.uses_http and self.per_host:
+            cmd += ["--per-host", str(self.per_host)]
+        if no_s3:
+            cmd.append("--no-s3")
+        return cmd
+
+
+def plan(jobs: List[Job], max_browsers: int, max_connections: int, per_host: int):
+    """Hand out spare browsers as shards, and split the connection budget across HTTP districts."""
+    spare = max_browsers - sum(j.browsers for j in jobs)
+    shardable = [j for j in jobs if j.browsers and j.spec["shards"]]
+    while spare > 0 and shardable:
+        grew = False
+        for j in shardable:
+            if spare > 0 and j.browsers < MAX_SHARDS_PER_DISTRICT:
+                j.browsers += 1
+                spare -= 1
+                grew = True
+        if not grew:
+            break
+
+    http_jobs = [j for j in jobs if j.uses_http]
+    share = max(1, max_connections // max(1, len(http_jobs)))
+    for j in http_jobs:
+        j.workers = share
+        j.per_host = max(1, min(per_host, share))
+
+
+def write_budgets(jobs: List[Job], max_bps: float):
+    """Split the bandwidth evenly across the running HTTP districts (0 = unlimited)."""
+    running = [j for j in jobs if j.state == "running" and j.uses_http]
+    rate = max_bps / len(running) if (max_bps and running) else 0
+    for j in running:
+        tmp = j.budget_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"max_bps": rate, "updated": ts()}))
+        os.replace(tmp, j.budget_file)
+
+
+def pump_output(job: Job, echo: bool):
+    with open(job.log_file, "a", encoding="utf-8") as f:
+        f.write(f"\n===== {ts()} {' '.join(job.proc.args)} =====\n")
+        for line in job.proc.stdout:
+            f.write(line)
+            f.flush()
+            line = line.rstrip()
+            if line:
+                job.lines += 1
+                job.last = line
+                if echo:
+                    print(f"[{job.name}] {line}", flush=True)
+
+
+def start(job: Job, no_s3: bool, echo: bool):
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    if job.uses_http:
+        env[BUDGET_FILE_ENV] = str(job.budget_file)
+    job.proc = subprocess.Popen(job.command(no_s3), cwd=str(job.work_dir), env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace", bufsize=1)
+    job.state = "running"
+    job.started = time.time()
+    threading.Thread(target=pump_output, args=(job, echo), daemon=True).start()
+    log(f"🚀 {job.name}: started ({job.browsers} browser(s), {job.workers or '-'} connection(s))")
+
+
+def print_status(jobs: List[Job], max_browsers: int, max_mbps: float):
+    now = time.time()
+    in_use = sum(j.browsers for j in jobs if j.state == "running")
+    counts = {s: sum(1 for j in jobs if j.state == s) for s in ("running", "queued", "done", "failed")}
+    bw = f"{max_mbps:g} MB/s" if max_mbps else "unlimited"
+    print(f"\n📊 [{ts()}] {counts['running']} running, {counts['queued']} queued, "
+          f"{counts['done']} done, {counts['failed']} failed | browsers {in_use}/{max_browsers} | bandwidth {bw}",
+          flush=True)
+    icons = {"queued": "⏳", "running": "▶️ ", "done": "✅", "failed": "❌"}
+    for j in jobs:
+        elapsed = (j.ended or now) - j.started if j.started else 0
+        print(f"   {icons[j.state]} {j.name:<12} {j.state:<8} {fmt_secs(elapsed):>7}  "
+              f"{j.lines:>6} lines  {j.last[:90]}", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run all district scrapers concurrently under global budgets.")
+    ap.add_argument("--districts", nargs="+", choices=sorted(DISTRICTS), default=list(DISTRICTS))
+    ap.add_argument("--max-browsers", type=int, default=6, help="Chrome instances across all districts.")
+    ap.add_argument("--max-connections", type=int, default=16, help="HTTP connections across all districts.")
+    ap.add_argument("--per-host", type=int, default=4, help="Max in-flight requests to any one Fed host.")
+    ap.add_argument("--max-mbps", type=float, default=0, help="Total download bandwidth in MB/s (0 = unlimited).")
+    ap.add_argument("--backend", choices=["selenium", "http"], default="selenium",
+                    help="Listing backend for Cleveland and Richmond. Dallas and Minneapolis have no HTTP "
+                         "backend and always use Selenium.")
+    ap.add_argument("--no-s3", action="store_true", help="Pass --no-s3 to districts that accept it.")
+    ap.add_argument("--status-interval", type=float, default=15.0, help="Seconds between progress views.")
+    ap.add_argument("--echo", action="store_true", help="Also stream every district's output, prefixed.")
+    ap.add_argument("--work-dir", default=".",
+                    help="Where the districts run and keep their manifests, state, caches and logs (default: cwd).")
+    args = ap.parse_args()
+
+    work_dir = Path(args.work_dir).resolve()
+    (work_dir / LOG_DIR_NAME).mkdir(parents=True, exist_ok=True)
+    (work_dir / BUDGET_DIR_NAME).mkdir(exist_ok=True)
+    max_bps = args.max_mbps * 1024 * 1024
+
+    jobs = [Job(name, DISTRICTS[name], args.backend == "http", work_dir) for name in args.districts]
+    plan(jobs, args.max_browsers, args.max_connections, args.per_host)
+    if args.backend == "http":
+        browser_only = [j.name for j in jobs if not j.spec["http_backend"]]
+        if browser_only:
+            log(f"ℹ️ No HTTP backend for {', '.join(browser_only)}; running them in Chrome.")
+    log(f"🧭 Orchestrating {len(jobs)} district(s): " +
+        ", ".join(f"{j.name} ({j.browsers} browser(s))" for j in jobs))
+
+    last_status = 0.0
+    try:
+        while any(j.state in ("queued", "running") for j in jobs):
+            changed = False
+            # reap finished districts, freeing their browsers and bandwidth share
+            for j in jobs:
+                if j.state == "running" and j.proc.poll() is not None:
+                    j.returncode = j.proc.returncode
+                    j.ended = time.time()
+                    j.state = "done" if j.returncode == 0 else "failed"
+                    changed = True
+                    log(f"{'🏁' if j.state == 'done' else '❌'} {j.name}: {j.state} "
+                        f"in {fmt_secs(j.ended - j.started)} (exit {j.returncode})")
+
+            # admit queued districts while the browser budget allows
+            in_use = sum(j.browsers for j in jobs if j.state == "running")
+            for j in jobs:
+                if j.state != "queued":
+                    continue
+                if in_use + j.browsers <= args.max_browsers or (j.browsers and in_use == 0):
+                    start(j, args.no_s3, args.echo)
+                    in_use += j.browsers
+                    changed = True
+
+            if changed:
+                write_budgets(jobs, max_bps)
+            if time.time() - last_status >= args.status_interval:
+                print_status(jobs, args.max_browsers, args.max_mbps)
+                last_status = time.time()
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        log("🛑 Interrupted; stopping districts…")
+        for j in jobs:
+            if j.state == "running":
+                j.proc.terminate()
+        for j in jobs:
+            if j.state == "running":
+                try:
+                    j.proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    j.proc.kill()
+                j.state = "failed"
+                j.ended = time.time()
+
+    print_status(jobs, args.max_browsers, args.max_mbps)
+    sys.exit(1 if any(j.state == "failed" for j in jobs) else 0)
+
+
+if __name__ == "__main__":
+    main()
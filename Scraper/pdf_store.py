@@ -0,0 +1,233 @@
+# pdf_store.py
+"""
+Content-addressed PDF store shared by the district scrapers and the CapIQ pipeline.
+
+Every PDF is stored once in S3 under its SHA-256:
+    s3://<bucket>/PDFStore/<sha[:2]>/<sha>.pdf
+and a CSV index maps each source URL (or ZIP member name) to that hash:
+    url,sha256,size,source,filename
+The index is appended to locally (PDF_INDEX_CSV) and shared in S3 as one object per source,
+PDFStore/index/<source>.csv. A store starts from the local file plus every index object in S3, and
+push_index() merges with what is in S3 before uploading, so runs of different scrapers (or from
+different directories) never drop each other's rows.
+
+PdfStreamCheck validates a PDF while it streams in (header magic, expected length, %%EOF trailer),
+so a truncated or non-PDF body is rejected before it is stored or sent to OCR.
+"""
+import io
+import csv
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+STORE_PREFIX = "PDFStore/"
+PDF_INDEX_CSV = "pdf_index.csv"
+INDEX_HEADER = ["url", "sha256", "size", "source", "filename"]
+INDEX_DIR = "index/"   # <prefix>index/<source>.csv
+
+PDF_MAGIC = b"%PDF-"
+PDF_EOF = b"%%EOF"
+HEADER_WINDOW = 1024   # readers accept the header anywhere in the first 1 KB
+TRAILER_WINDOW = 2048  # %%EOF may be followed by a little padding
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PdfIntegrityError(RuntimeError):
+    """`resumable` is True when the body is merely short, so fetching the rest may fix it."""
+    def __init__(self, msg: str, resumable: bool = False):
+        super().__init__(msg)
+        self.resumable = resumable
+
+
+class PdfStreamCheck:
+    """Feed it every chunk in order; update() fails fast on a bad header or overrun, finish() checks the end."""
+    def __init__(self, expected_size: Optional[int] = None):
+        self.expected = expected_size
+        self.size = 0
+        self._head = b""
+        self._tail = b""
+        self._magic = False
+
+    def update(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.expected is not None and self.size > self.expected:
+            raise PdfIntegrityError(f"body overruns Content-Length ({self.size} > {self.expected} bytes)")
+        if not self._magic:
+            self._head = (self._head + chunk[:HEADER_WINDOW])[:HEADER_WINDOW]
+            self._magic = PDF_MAGIC in self._head
+            if not self._magic and len(self._head) >= HEADER_WINDOW:
+                raise PdfIntegrityError(f"not a PDF (starts with {self._head[:16]!r})")
+        self._tail = (self._tail + chunk[-TRAILER_WINDOW:])[-TRAILER_WINDOW:]
+
+    def finish(self):
+        if not self._magic:
+            raise PdfIntegrityError(f"not a PDF (starts with {self._head[:16]!r})")
+        if self.expected is not None and self.size < self.expected:
+            raise PdfIntegrityError(f"truncated: {self.size} of {self.expected} bytes", resumable=True)
+        if PDF_EOF not in self._tail:
+            # with a known length the body is complete but damaged; without one it may just be short
+            raise PdfIntegrityError("missing %%EOF trailer", resumable=self.expected is None)
+
+
+def check_pdf_file(path: str, expected_size: Optional[int] = None, chunk_size: int = 1024 * 1024):
+    """Run PdfStreamCheck over a file already on disk; raises PdfIntegrityError."""
+    check = PdfStreamCheck(expected_size)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            check.update(chunk)
+    check.finish()
+
+
+class ContentStore:
+    def __init__(self, bucket: str, client, prefix: str = STORE_PREFIX, index_path: str = PDF_INDEX_CSV):
+        self.bucket = bucket
+        self.client = client
+        self.prefix = prefix.rstrip("/") + "/"
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._rows: Dict[str, List[str]] = {}   # url -> index row
+        self._mine: Set[str] = set()             # urls recorded by this process: they win a merge
+        self._hashes: Set[str] = set()
+        self._load_index()
+
+    # ---------- index ----------
+    def _load_index(self):
+        p = Path(self.index_path)
+        if not p.exists() or p.stat().st_size == 0:
+            with open(p, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(INDEX_HEADER)
+        else:
+            with open(p, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self._rows[row["url"]] = [row.get(h) or "" for h in INDEX_HEADER]
+        try:
+            # rows pushed by other scrapers and other directories
+            self._rows.update(self._remote_rows())
+        except Exception as e:
+            print(f"⚠️ Could not read the PDFStore index from S3: {e}", flush=True)
+        self._hashes.update(row[1] for row in self._rows.values())
+
+    def index_key(self, source: str) -> str:
+        return f"{self.prefix}{INDEX_DIR}{source}.csv"
+
+    def _remote_rows(self, source: Optional[str] = None) -> Dict[str, List[str]]:
+        """url -> row from the index objects in S3 (one source's, or all). A missing object is empty."""
+        if source is not None:
+            keys = [self.index_key(source)]
+        else:
+            paginator = self.client.get_paginator("list_objects_v2")
+            keys = [obj["Key"] for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{INDEX_DIR}")
+                    for obj in page.get("Contents", []) if obj["Key"].endswith(".csv")]
+        rows: Dict[str, List[str]] = {}
+        for key in keys:
+            try:
+                body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            except self.client.exceptions.NoSuchKey:
+                continue
+            for row in csv.DictReader(io.StringIO(body.decode("utf-8"))):
+                rows[row["url"]] = [row.get(h) or "" for h in INDEX_HEADER]
+        return rows
+
+    def sha_for(self, url: str) -> Optional[str]:
+        row = self._rows.get(url)
+        return row[1] if row else None
+
+    def record(self, url: str, sha: str, size: int, source: str, filename: str = ""):
+        """Map url -> sha in the index (appends only when the mapping is new or changed)."""
+        with self._lock:
+            self._hashes.add(sha)
+            self._mine.add(url)
+            row = [url, sha, str(size), source, filename]
+            if self._rows.get(url) == row:
+                return
+            self._rows[url] = row
+            with open(self.index_path, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(row)
+
+    def push_index(self):
+        """
+        Upload PDFStore/index/<source>.csv for every source this store knows rows of, each merged
+        with its current S3 copy: rows recorded by this process replace the S3 row for their url,
+        other local rows only fill in urls S3 does not have.
+        """
+        with self._lock:
+            local = dict(self._rows)
+            mine = set(self._mine)
+        for source in sorted({row[3] for row in local.values()}):
+            merged = self._remote_rows(source)
+            for url, row in local.items():
+                if row[3] == source and (url in mine or url not in merged):
+                    merged[url] = row
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(INDEX_HEADER)
+            w.writerows(merged.values())
+            self.client.put_object(Bucket=self.bucket, Key=self.index_key(source),
+                                   Body=buf.getvalue().encode("utf-8"), ContentType="text/csv")
+            with self._lock:
+                for url, row in merged.items():
+                    self._rows.setdefault(url, row)
+
+    # ---------- objects ----------
+    def key_for(self, sha: str) -> str:
+        return f"{self.prefix}{sha[:2]}/{sha}.pdf"
+
+    def staging_key(self, name: str) -> str:
+        return f"{self.prefix}_incoming/{name}"
+
+    def has(self, sha: str) -> bool:
+        """Known locally, or already present in S3 (e.g. written by another district's run)."""
+        if sha in self._hashes:
+            return True
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key_for(sha))
+        except Exception:
+            return False
+        with self._lock:
+            self._hashes.add(sha)
+        return True
+
+    def put_file(self, local_path: str, sha: Optional[str] = None) -> bool:
+        """Upload a local PDF under its hash. Returns False if the content was already stored."""
+        sha = sha or sha256_file(local_path)
+        if self.has(sha):
+            return False
+        self.client.upload_file(local_path, self.bucket, self.key_for(sha),
+                                ExtraArgs={"ContentType": "application/pdf"})
+        with self._lock:
+            self._hashes.add(sha)
+        return True
+
+    def put_bytes(self, data: bytes, sha: Optional[str] = None) -> bool:
+        sha = sha or hashlib.sha256(data).hexdigest()
+        if self.has(sha):
+            return False
+        self.client.put_object(Bucket=self.bucket, Key=self.key_for(sha), Body=data,
+                               ContentType="application/pdf")
+        with self._lock:
+            self._hashes.add(sha)
+        return True
+
+    def adopt(self, staging_key: str, sha: str) -> bool:
+        """
+        Move an object uploaded to a staging key (hash unknown until the stream ended) to its
+        content address. Returns False if that content was already stored.
+        """
+        try:
+            if self.has(sha):
+                return False
+            self.client.copy_object(Bucket=self.bucket, Key=self.key_for(sha),
+                                    CopySource={"Bucket": self.bucket, "Key": staging_key})
+            with self._lock:
+                self._hashes.add(sha)
+            return True
+        finally:
+            self.client.delete_object(Bucket=self.bucket, Key=staging_key)
@@ -1,9 +1,8 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import time
-import glob
 import boto3
 import os
 from selenium.webdriver.common.action_chains import ActionChains
@@ -11,412 +10,557 @@ from selenium.webdriver.common.keys import Keys
 import csv
 from dotenv import load_dotenv
 load_dotenv()
-import json
+from urllib.parse import unquote
+from capiq_pagination import CURSOR_FILE, goto_page, pages_after_cursor, paginator_state, save_cursor
+from download_watch import DownloadWatcher
+from zip_postprocess import ZipPostProcessor
+from pdf_store import ContentStore
+import io
+import argparse
+import threading
+from shard import run_sharded, split_range
+from browser import chrome_driver
+from capiq_session import CookieSource, SessionManager
+from waits import (adaptive_waits, clickable, document_ready, has_focus, in_viewport, invisible,
+                   signature_changed, value_is)
+
+CAPIQ_SEARCH_URL = "https://www.capitaliq.spglobal.com/apisv3/spg-webplatform-core/search/searchResults?vertical=institutional_filingsrpt-gss"
+CAPIQ_HOST = "capitaliq.spglobal.com"
+
+# What apply_filters() sets up; kept in the session snapshot so a recycled browser gets the same results
+SEARCH_FILTERS = {
+    "date_from": "01/01/1995",
+    "date_to": "07/31/2025",
+    "doc_types": ["Y-6", "Y-6/A"],
+    "sort": "Filing Date",
+}
 
 # If you want to add a range do list(range(1, 20)) — scrapes pages 1–20
 #pages_to_scrape = [1]
 pages_to_scrape = list(range(1287, 2287))  # pages 1 through 5766
-file = open("failed_pages.csv", "w", newline="")
-csv_writer = csv.writer(file)
-csv_writer.writerow(["page", "error"])
-
-
-def wait_for_zip_or_error(download_dir, timeout=120):
-    print("⏳ Waiting for ZIP to appear and stabilize...")
-    start_time = time.time()
-    previous_zips = set(glob.glob(os.path.join(download_dir, "*.zip")))
-
-    while time.time() - start_time < timeout:
-        current_zips = set(glob.glob(os.path.join(download_dir, "*.zip")))
-        new_zips = current_zips - previous_zips
-        crdownloads = glob.glob(os.path.join(download_dir, "*.crdownload"))
-
-        if new_zips and not crdownloads:
-            newest = max(new_zips, key=os.path.getctime)
-            time.sleep(2)
-            if time.time() - os.path.getmtime(newest) > 2:
-                return "success"
-
-        try:
-            error_element = driver.find_element(By.XPATH,
-                                                '//p[contains(text(), "Error occurred while preparing documents")]')
-            if error_element.is_displayed():
-                return "error"
-        except:
-            pass
 
-        try:
-            pending_element = driver.find_element(By.XPATH, '//p[contains(text(), "are being compressed as zip")]')
-            if pending_element.is_displayed():
-                print("ℹ️ Still compressing ZIP...")
-        except:
-            pass
+DOWNLOAD_DIR = os.path.join(os.getcwd(), "capitaliq_downloads")
+FAILED_PAGES_CSV = "failed_pages.csv"
+
+# Finished ZIPs are unpacked and their section*.pdf members uploaded to UpdateDocuments/pdfs/
+# in the background while the browser moves on (see zip_postprocess.py).
+S3_BUCKET = "fed-data-storage"
+ZIP_QUEUE_SIZE = 4        # browser may run at most this many ZIPs ahead of the uploads
+UPLOAD_WORKERS = 8
+# Members are also stored once under PDFStore/<sha256> and indexed, deduped against the other
+# districts (scraper_cleveland.py --content-store); the UpdateDocuments/pdfs/ copy stays for OCR
+CONTENT_STORE = True
+BLOCK_ANALYTICS = False   # True refuses tag-manager/analytics requests (see browser.py)
+
+# Session upkeep (see capiq_session.py): fresh Chrome every N pages or past the memory cap, and
+# cookies re-read from COOKIES_FILE (a browser cookie export such as ../cookies.json) or, if empty,
+# from COOKIES in .env whenever the session expires or the file changes
+RECYCLE_EVERY_PAGES = 150
+MAX_CHROME_RSS_MB = 3000
+COOKIES_FILE = ""
+
+LOADING_XPATH = '//div[@data-testid="loading-indicator"]'
+TOASTS_XPATH = '//div[contains(@class, "Toastify")]'
+FILING_DATE_BTN_XPATH = '//button[contains(@class, "css-1swziob") and @title="Select Filing Date"]'
+
+# Every step waits for its own readiness condition instead of a fixed sleep; the observed latencies
+# tune the timeouts across runs (see waits.py)
+waits = adaptive_waits("capiq")
+
+# The browser of this process (one per fleet worker) and its download dir, set by open_session();
+# `driver` and `wait` are replaced whenever the session manager recycles Chrome
+driver = None
+wait = None
+session_download_dir = None
+session = None
+
+
+def dom_download_error():
+    """DOM side of the download wait: True once CapIQ reports the ZIP could not be prepared."""
+    for el in driver.find_elements(By.XPATH, '//p[contains(text(), "Error occurred while preparing documents")]'):
+        if el.is_displayed():
+            return True
+    for el in driver.find_elements(By.XPATH, '//p[contains(text(), "are being compressed as zip")]'):
+        if el.is_displayed():
+            print("ℹ️ Still compressing ZIP...")
+    return False
 
-        time.sleep(1)
 
-    return "timeout"
+def wait_for_zip_or_error(watcher, timeout=120):
+    """Returns ("success", zip_path) | ("error", None) | ("timeout", None). Call watcher.arm() before clicking Download."""
+    print("⏳ Waiting for ZIP download to complete...")
+    return watcher.wait(timeout=timeout, error_check=dom_download_error, error_interval=1.0)
 
 
 def wait_for_loading_to_finish(timeout=30):
     try:
-        WebDriverWait(driver, timeout).until(
-            EC.invisibility_of_element_located((By.XPATH, '//div[@data-testid="loading-indicator"]'))
-        )
+        waits.until(driver, "capiq.loading_gone", invisible((By.XPATH, LOADING_XPATH)), ceiling=timeout)
     except:
         print("⚠️ Loading overlay did not disappear in time.")
 
 
 def wait_for_toasts_to_disappear(timeout=10):
     try:
-        WebDriverWait(driver, timeout).until(
-            EC.invisibility_of_element_located((By.XPATH, '//div[contains(@class, "Toastify")]'))
-        )
+        waits.until(driver, "capiq.toasts_gone", invisible((By.XPATH, TOASTS_XPATH)), ceiling=timeout)
     except:
         print("⚠️ Toast messages did not disappear in time.")
 
 
-def retry_scroll_and_click(driver, element, max_attempts=3):
-    for attempt in range(max_attempts):
-        try:
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-            ActionChains(driver).move_to_element(element).click().perform()
-            return True
-        except Exception as e:
-            print(f"🔁 Retry {attempt + 1} for scroll & click: {e}")
-            time.sleep(2)
-    return False
+def make_paginator_settle():
+    """goto_page() settle: wait for the paginator to move after a click, then for the results to load."""
+    last = {"state": paginator_state(driver)}
+
+    def settle():
+        waits.until(driver, "capiq.paginator_moved",
+                    signature_changed(paginator_state, last["state"]), ceiling=3, soft=True)
+        wait_for_loading_to_finish()
+        last["state"] = paginator_state(driver)
+    return settle
 
 
 # === SETUP CHROME ===
-download_dir = os.path.join(os.getcwd(), "capitaliq_downloads")
-os.makedirs(download_dir, exist_ok=True)
-
-options = webdriver.ChromeOptions()
-prefs = {
-    "download.default_directory": download_dir,
-    "download.prompt_for_download": False,
-    "download.directory_upgrade": True,
-    "safebrowsing.enabled": True
-}
-options.add_experimental_option("prefs", prefs)
-driver = webdriver.Chrome(options=options)
-
-# === LOAD COOKIES FROM .env ===
-cookies = os.getenv("COOKIES")
-try:
-    cookies = json.loads(cookies)
-except json.JSONDecodeError as e:
-    print(f"❌ Failed to parse cookies: {e}")
-    cookies = []
-
-# --- Add cookies for spglobal.com ---
-driver.get("https://www.spglobal.com")
-time.sleep(2)
-for cookie in cookies:
-    if "spglobal.com" in cookie["domain"] and "capitaliq" not in cookie["domain"]:
-        try:
-            driver.add_cookie({
-                "name": cookie["name"],
-                "value": cookie["value"],
-                "domain": cookie["domain"],
-                "path": cookie.get("path", "/"),
-                "secure": cookie.get("secure", False),
-                "httpOnly": cookie.get("httpOnly", False),
-            })
-        except Exception as e:
-            print(f"⚠️ Cookie failed (spglobal): {cookie['name']} — {e}")
+def make_capiq_driver(download_dir):
+    # warm profile (one slot per fleet worker), no images/fonts/media, eager page loads; see browser.py
+    return chrome_driver("capiq", download_dir=download_dir, headless=False, block_analytics=BLOCK_ANALYTICS)
 
-# --- Add cookies for capitaliq.spglobal.com ---
-driver.get("https://www.capitaliq.spglobal.com")
-time.sleep(2)
-for cookie in cookies:
-    if "capitaliq.spglobal.com" in cookie["domain"]:
-        try:
-            driver.add_cookie({
-                "name": cookie["name"],
-                "value": cookie["value"],
-                "domain": cookie["domain"],
-                "path": cookie.get("path", "/"),
-                "secure": cookie.get("secure", False),
-                "httpOnly": cookie.get("httpOnly", False),
-            })
-        except Exception as e:
-            print(f"⚠️ Cookie failed (capitaliq): {cookie['name']} — {e}")
-
-# === NOW GO TO THE TARGET PAGE ===
-driver.get("https://www.capitaliq.spglobal.com/apisv3/spg-webplatform-core/search/searchResults?vertical=institutional_filingsrpt-gss")
-wait = WebDriverWait(driver, 10)
-time.sleep(5)
-
-
-try:
-    filing_date_btn = wait.until(EC.element_to_be_clickable(
-        (By.XPATH, '//button[contains(@class, "css-1swziob") and @title="Select Filing Date"]')
-    ))
-    filing_date_btn.click()
-    print("✅ Clicked 'Select Filing Date'.")
-except Exception as e:
-    print(f"❌ Step 1 failed (click 'Select Filing Date'): {e}")
-
-# Step 2 (Final): Click the div with title "Custom" and class "css-684y9u"
-try:
-    custom_div = wait.until(EC.element_to_be_clickable(
-        (By.XPATH, '//div[@title="Custom" and contains(@class, "css-684y9u")]')
-    ))
-    custom_div.click()
-    print("✅ Clicked Custom date range option.")
-except Exception as e:
-    print(f"❌ Step 2 failed (click div with title='Custom'): {e}")
-
-try:
-    from_input = wait.until(EC.presence_of_element_located(
-        (By.NAME, "date-range-selector-from-value")
-    ))
-    ActionChains(driver).move_to_element(from_input).click().perform()
-    time.sleep(0.3)
-    from_input.clear()
-    for _ in range(10):
-        from_input.send_keys(Keys.BACKSPACE)
-    from_input.send_keys("01/01/1995", Keys.ENTER)
-    print("✅ Step 4: Set 'From' date.")
-except Exception as e:
-    print(f"❌ Step 4 failed: {e}")
-
-time.sleep(3)
-
-# Step 5: 'To' date input (type="input", name="date-range-selector-to-value")
-try:
-    to_input = wait.until(EC.presence_of_element_located(
-        (By.NAME, "date-range-selector-to-value")
-    ))
-    ActionChains(driver).move_to_element(to_input).click().perform()
-    time.sleep(0.3)
-    to_input.clear()
-    for _ in range(10):
-        from_input.send_keys(Keys.BACKSPACE)
-    to_input.send_keys("07/31/2025", Keys.ENTER)
-    print("✅ Step 5: Set 'To' date.")
-except Exception as e:
-    print(f"❌ Step 5 failed: {e}")
-
-time.sleep(3)
-
-# Step 6: Click the "Done" button
-try:
-    done_button = wait.until(EC.element_to_be_clickable(
-        (By.XPATH, '//button[contains(@class, "css-d27mz") and .//span[text()="Done"]]')
-    ))
-    done_button.click()
-    print("✅ Clicked 'Done' to confirm date range.")
-except Exception as e:
-    print(f"❌ Step 6 failed (click 'Done' button): {e}")
-
-# Step 4: Click "Select Document Type"
-try:
-    select_doc_type = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//span[text()="Select Document Type"]'))
-    )
-    select_doc_type.click()
-    print("✅ Clicked 'Select Document Type'.")
-except Exception as e:
-    print("❌ Failed to click 'Select Document Type':", e)
-
-# Step 5: Click the caret button next to "Institutional Filings"
-try:
-    institutional_caret_btn = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[@id="InstitutionalFilings"]//button'))
-    )
-    institutional_caret_btn.click()
-    print("✅ Clicked the caret arrow for Institutional Filings.")
-except Exception as e:
-    print("❌ Failed to click the caret arrow:", e)
-
-# Step 6: Click the small arrow next to "Bank Regulatory Filings"
-try:
-    bank_regulatory_button = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[@id="BankRegulatoryFilings"]//button'))
-    )
-    bank_regulatory_button.click()
-    print("✅ Clicked the caret for Bank Regulatory Filings.")
-except Exception as e:
-    print("❌ Failed to click Bank Regulatory Filings caret:", e)
-
-# Step 7: Click the small arrow next to "Regulatory Filing: Depository"
-try:
-    reg_depository_btn = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[contains(@id, "RegulatoryFiling:Depository")]//button'))
-    )
-    reg_depository_btn.click()
-    print("✅ Clicked the caret for Regulatory Filing: Depository.")
-except Exception as e:
-    print("❌ Failed to click Regulatory Filing: Depository caret:", e)
-
-# Step 8: Click the checkbox for Y-6
-try:
-    y6_checkbox = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[@id="Y-6"]//label[@data-option-label="true"]'))
-    )
-    y6_checkbox.click()
-    print("✅ Y-6 checkbox selected.")
-except Exception as e:
-    print("❌ Failed to select Y-6 checkbox:", e)
-
-# Step 8: Click the checkbox for Y-6
-try:
-    y6_checkbox = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[@id="Y-6/A"]//label[@data-option-label="true"]'))
-    )
-    y6_checkbox.click()
-    print("✅ Y-6 checkbox selected.")
-except Exception as e:
-    print("❌ Failed to select Y-6 checkbox:", e)
-
-# Step 9: Click "Sort by" dropdown and select "Filing Date"
-try:
-    # Click the "Sort by" dropdown (Relevance)
-    sort_dropdown = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//button[@title="Relevance"]'))
-    )
-    sort_dropdown.click()
-    print("✅ Opened sort dropdown.")
-
-    # Wait for the dropdown menu to appear and click "Filing Date"
-    filing_date_option = wait.until(
-        EC.element_to_be_clickable((By.XPATH, '//div[text()="Filing Date"]'))
-    )
-    filing_date_option.click()
-    print("✅ Selected 'Filing Date' from sort options.")
-
-except Exception as e:
-    print("❌ Failed to sort by Filing Date:", e)
-
-
-
-# Track pages where download fails
-failed_pages = []
 
-def record_failed_page(page, error_msg):
-    if page not in [row[0] for row in failed_pages]:
-        failed_pages.append((page, error_msg))
-        csv_writer.writerow([page, error_msg])
-        file.flush()
+def inject_cookies(driver, cookies):
+    # --- Add cookies for spglobal.com ---
+    driver.get("https://www.spglobal.com")
+    waits.until(driver, "capiq.cookie_domain_ready", document_ready(), ceiling=10)
+    for cookie in cookies:
+        if "spglobal.com" in cookie["domain"] and "capitaliq" not in cookie["domain"]:
+            try:
+                driver.add_cookie({
+                    "name": cookie["name"],
+                    "value": cookie["value"],
+                    "domain": cookie["domain"],
+                    "path": cookie.get("path", "/"),
+                    "secure": cookie.get("secure", False),
+                    "httpOnly": cookie.get("httpOnly", False),
+                })
+            except Exception as e:
+                print(f"⚠️ Cookie failed (spglobal): {cookie['name']} — {e}")
+
+    # --- Add cookies for capitaliq.spglobal.com ---
+    driver.get("https://www.capitaliq.spglobal.com")
+    waits.until(driver, "capiq.cookie_domain_ready", document_ready(), ceiling=10)
+    for cookie in cookies:
+        if "capitaliq.spglobal.com" in cookie["domain"]:
+            try:
+                driver.add_cookie({
+                    "name": cookie["name"],
+                    "value": cookie["value"],
+                    "domain": cookie["domain"],
+                    "path": cookie.get("path", "/"),
+                    "secure": cookie.get("secure", False),
+                    "httpOnly": cookie.get("httpOnly", False),
+                })
+            except Exception as e:
+                print(f"⚠️ Cookie failed (capitaliq): {cookie['name']} — {e}")
+
+
+def apply_filters(filters=SEARCH_FILTERS):
+    """Filing-date range, document types (Y-6, Y-6/A) and sort order (Filing Date) from `filters`."""
+    try:
+        filing_date_btn = wait.until(EC.element_to_be_clickable((By.XPATH, FILING_DATE_BTN_XPATH)))
+        filing_date_btn.click()
+        print("✅ Clicked 'Select Filing Date'.")
+    except Exception as e:
+        print(f"❌ Step 1 failed (click 'Select Filing Date'): {e}")
+
+    # Step 2 (Final): Click the div with title "Custom" and class "css-684y9u"
+    try:
+        custom_div = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, '//div[@title="Custom" and contains(@class, "css-684y9u")]')
+        ))
+        custom_div.click()
+        print("✅ Clicked Custom date range option.")
+    except Exception as e:
+        print(f"❌ Step 2 failed (click div with title='Custom'): {e}")
+
+    try:
+        from_input = wait.until(EC.presence_of_element_located(
+            (By.NAME, "date-range-selector-from-value")
+        ))
+        ActionChains(driver).move_to_element(from_input).click().perform()
+        waits.until(driver, "capiq.date_input_focused", has_focus(from_input), ceiling=1, soft=True)
+        from_input.clear()
+        for _ in range(10):
+            from_input.send_keys(Keys.BACKSPACE)
+        from_input.send_keys(filters["date_from"], Keys.ENTER)
+        print("✅ Step 4: Set 'From' date.")
+    except Exception as e:
+        print(f"❌ Step 4 failed: {e}")
+
+    waits.until(driver, "capiq.date_applied", value_is((By.NAME, "date-range-selector-from-value"), filters["date_from"]),
+                ceiling=3, soft=True)
+
+    # Step 5: 'To' date input (type="input", name="date-range-selector-to-value")
+    try:
+        to_input = wait.until(EC.presence_of_element_located(
+            (By.NAME, "date-range-selector-to-value")
+        ))
+        ActionChains(driver).move_to_element(to_input).click().perform()
+        waits.until(driver, "capiq.date_input_focused", has_focus(to_input), ceiling=1, soft=True)
+        to_input.clear()
+        for _ in range(10):
+            from_input.send_keys(Keys.BACKSPACE)
+        to_input.send_keys(filters["date_to"], Keys.ENTER)
+        print("✅ Step 5: Set 'To' date.")
+    except Exception as e:
+        print(f"❌ Step 5 failed: {e}")
 
+    waits.until(driver, "capiq.date_applied", value_is((By.NAME, "date-range-selector-to-value"), filters["date_to"]),
+                ceiling=3, soft=True)
+
+    # Step 6: Click the "Done" button
+    try:
+        done_button = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, '//button[contains(@class, "css-d27mz") and .//span[text()="Done"]]')
+        ))
+        done_button.click()
+        print("✅ Clicked 'Done' to confirm date range.")
+    except Exception as e:
+        print(f"❌ Step 6 failed (click 'Done' button): {e}")
 
-for page in  pages_to_scrape:
-    print(f"\n📄 Processing Page {page}")
+    # Step 4: Click "Select Document Type"
     try:
-        print("ATTEMPTING TO CLICK ALERTS")
+        select_doc_type = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//span[text()="Select Document Type"]'))
+        )
+        select_doc_type.click()
+        print("✅ Clicked 'Select Document Type'.")
+    except Exception as e:
+        print("❌ Failed to click 'Select Document Type':", e)
+
+    # Step 5: Click the caret button next to "Institutional Filings"
+    try:
+        institutional_caret_btn = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//div[@id="InstitutionalFilings"]//button'))
+        )
+        institutional_caret_btn.click()
+        print("✅ Clicked the caret arrow for Institutional Filings.")
+    except Exception as e:
+        print("❌ Failed to click the caret arrow:", e)
+
+    # Step 6: Click the small arrow next to "Bank Regulatory Filings"
+    try:
+        bank_regulatory_button = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//div[@id="BankRegulatoryFilings"]//button'))
+        )
+        bank_regulatory_button.click()
+        print("✅ Clicked the caret for Bank Regulatory Filings.")
+    except Exception as e:
+        print("❌ Failed to click Bank Regulatory Filings caret:", e)
+
+    # Step 7: Click the small arrow next to "Regulatory Filing: Depository"
+    try:
+        reg_depository_btn = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//div[contains(@id, "RegulatoryFiling:Depository")]//button'))
+        )
+        reg_depository_btn.click()
+        print("✅ Clicked the caret for Regulatory Filing: Depository.")
+    except Exception as e:
+        print("❌ Failed to click Regulatory Filing: Depository caret:", e)
+
+    # Step 8: Click the checkbox for each document type (Y-6, Y-6/A)
+    for doc_type in filters["doc_types"]:
         try:
-            alert_elements = WebDriverWait(driver, 3).until(
-                lambda d: d.find_elements(By.XPATH, '//p[@role="alert"]')
+            doc_checkbox = wait.until(
+                EC.element_to_be_clickable((By.XPATH, f'//div[@id="{doc_type}"]//label[@data-option-label="true"]'))
             )
-            for alert in alert_elements:
-                # Find the next sibling button (adjust as needed for your DOM)
-                print(alert)
-                parent = alert.find_element(By.XPATH, '../..')
-                # print a list of the children of the parent element
-                print("Parent children:", [child.tag_name for child in parent.find_elements(By.XPATH, './*')])
-                sibling_btn = parent.find_element(By.XPATH, './/button')
-                sibling_btn.click()
-                print("✅ Clicked alert sibling button.")
+            doc_checkbox.click()
+            print(f"✅ {doc_type} checkbox selected.")
         except Exception as e:
-            print(f"⚠️ No alert or sibling button found: {e}")
+            print(f"❌ Failed to select {doc_type} checkbox:", e)
+
+    # Step 9: Click "Sort by" dropdown and select "Filing Date"
+    try:
+        # Click the "Sort by" dropdown (Relevance)
+        sort_dropdown = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//button[@title="Relevance"]'))
+        )
+        sort_dropdown.click()
+        print("✅ Opened sort dropdown.")
+
+        # Wait for the dropdown menu to appear and click "Filing Date"
+        filing_date_option = wait.until(
+            EC.element_to_be_clickable((By.XPATH, f'//div[text()="{filters["sort"]}"]'))
+        )
+        filing_date_option.click()
+        print(f"✅ Selected '{filters['sort']}' from sort options.")
+
+    except Exception as e:
+        print(f"❌ Failed to sort by {filters['sort']}:", e)
+
+
+def url_keeps_filters(url, filters):
+    """Whether the results URL carries the filter state (every document type appears in it)."""
+    return url != CAPIQ_SEARCH_URL and all(t in unquote(url) for t in filters["doc_types"])
+
+
+def filters_applied(drv, filters):
+    """The results page shows our sort order (the sort button is titled with the active sort)."""
+    return any(b.is_displayed() for b in drv.find_elements(By.XPATH, f'//button[@title="{filters["sort"]}"]'))
+
+
+def start_driver():
+    """SessionManager hook: a fresh Chrome for this process; `driver`/`wait` follow it."""
+    global driver, wait
+    driver = make_capiq_driver(session_download_dir)
+    wait = WebDriverWait(driver, 10)
+    return driver
+
+
+def restore_search(drv, snapshot):
+    """
+    SessionManager hook: bring a new (or re-authenticated) browser to the filtered, sorted results.
+    Reloading the snapshot's results URL is enough when CapIQ keeps the filters in it (the URL is
+    only kept in the snapshot then); otherwise the filter setup is replayed from the snapshot.
+    """
+    filters = snapshot.get("filters") or SEARCH_FILTERS
+    if snapshot.get("url"):
+        drv.get(snapshot["url"])
+        waits.until(drv, "capiq.search_ready", clickable((By.XPATH, FILING_DATE_BTN_XPATH)), ceiling=20, soft=True)
+        wait_for_loading_to_finish()
+        if filters_applied(drv, filters):
+            print("♻️ Search restored from the session snapshot.")
+            return {**snapshot, "url": drv.current_url}
+
+    # === NOW GO TO THE TARGET PAGE ===
+    drv.get(CAPIQ_SEARCH_URL)
+    # the search app is usable once its filter bar is; then the results overlay must clear
+    waits.until(drv, "capiq.search_ready", clickable((By.XPATH, FILING_DATE_BTN_XPATH)), ceiling=20, soft=True)
+    wait_for_loading_to_finish()
+    apply_filters(filters)
+    wait_for_loading_to_finish()
+    url = drv.current_url
+    return {**snapshot, "filters": filters, "url": url if url_keeps_filters(url, filters) else None}
+
+
+def open_session(download_dir):
+    """Start an authenticated browser from the shared cookie source and set up the search. Returns the SessionManager."""
+    global session, session_download_dir
+    session_download_dir = download_dir
+    session = SessionManager(start_driver, inject_cookies, restore_search,
+                             CookieSource(COOKIES_FILE or None), host=CAPIQ_HOST,
+                             recycle_every=RECYCLE_EVERY_PAGES, max_rss_mb=MAX_CHROME_RSS_MB)
+    session.open()
+    return session
+
+
+# === FAILED PAGES (shared by every fleet worker) ===
+failed_pages = []
+failed_lock = threading.Lock()  # the ZIP post-processor reports failures from its own thread
+
+
+def init_failed_log():
+    if not os.path.exists(FAILED_PAGES_CSV):  # append: a resumed run keeps earlier failures
+        append_failed_row("page", "error")
+
+
+def append_failed_row(page, error_msg):
+    # One small O_APPEND write per row, so rows from several worker processes never interleave
+    buf = io.StringIO()
+    csv.writer(buf).writerow([page, error_msg])
+    with failed_lock, open(FAILED_PAGES_CSV, "a", newline="") as f:
+        f.write(buf.getvalue())
+
+
+def scrape_pages(pages, download_dir, cursor_path=CURSOR_FILE):
+    """Download every page in `pages` with this process's browser (open_session() first)."""
+    zip_watcher = DownloadWatcher(download_dir, suffix=".zip")
+
+    def record_failed_page(page, error_msg):
+        if page not in [row[0] for row in failed_pages]:
+            failed_pages.append((page, error_msg))
+            append_failed_row(page, error_msg)
+        # the failure is logged, so a restart need not replay this page
+        save_cursor(page, path=cursor_path)
+
+    def record_postprocess_failure(page, error_msg):
+        # the ZIP stays in download_dir and is re-queued on the next run; don't move the cursor
+        append_failed_row(page, error_msg)
 
+    s3_client = boto3.client("s3")
+    store = ContentStore(S3_BUCKET, s3_client) if CONTENT_STORE else None
+    postprocessor = ZipPostProcessor(S3_BUCKET, s3_client, store=store, queue_size=ZIP_QUEUE_SIZE,
+                                     upload_workers=UPLOAD_WORKERS, on_error=record_postprocess_failure)
+    postprocessor.submit_existing(download_dir)
 
-        # ========== STEP 9.5: Navigate to target page ==========
+    for page in pages:
+        print(f"\n📄 Processing Page {page}")
         try:
-            time.sleep(1)
+            # health check, cookie refresh, recycling; a new browser is brought back to the search
+            session.before_page(page)
+        except Exception as e:
+            print(f"🛑 CapIQ session lost, stopping before page {page}: {e}")
+            break
+        try:
+            print("ATTEMPTING TO CLICK ALERTS")
+            try:
+                # usually there is none: this gives up after ~p95 of the times one did show up
+                alert_elements = waits.until(driver, "capiq.alert", lambda d: d.find_elements(By.XPATH, '//p[@role="alert"]'),
+                                             ceiling=3, soft=True)
+                if not alert_elements:
+                    raise LookupError("no alert shown")
+                for alert in alert_elements:
+                    # Find the next sibling button (adjust as needed for your DOM)
+                    print(alert)
+                    parent = alert.find_element(By.XPATH, '../..')
+                    # print a list of the children of the parent element
+                    print("Parent children:", [child.tag_name for child in parent.find_elements(By.XPATH, './*')])
+                    sibling_btn = parent.find_element(By.XPATH, './/button')
+                    sibling_btn.click()
+                    print("✅ Clicked alert sibling button.")
+            except Exception as e:
+                print(f"⚠️ No alert or sibling button found: {e}")
+
+
+            # ========== STEP 9.5: Navigate to target page ==========
+            try:
+                wait_for_toasts_to_disappear()
+                wait.until(EC.element_to_be_clickable(
+                    (By.XPATH, f'//button[contains(@class, "css-18ydibh css-1gfzd5y") and .//span[text()="Next"]]'))
+                )
+
+                # Jump via the paginator's page box / furthest visible page instead of Next-per-page
+                if goto_page(driver, page, settle=make_paginator_settle()):
+                    # goto_page only clicked. Hard wait: selecting whatever page is showing would
+                    # upload the wrong filings and move the cursor past a page never fetched
+                    if paginator_state(driver)[0]:  # only if the paginator marks the current page
+                        try:
+                            waits.until(driver, "capiq.page_label", lambda d: paginator_state(d)[0] == page,
+                                        ceiling=10)
+                        except TimeoutException:
+                            shown = paginator_state(driver)[0]
+                            print(f"⚠️ Paginator shows page {shown}, not {page}. Skipping.")
+                            record_failed_page(page, f"Navigation landed on page {shown}")
+                            continue
+                    print(f"➡️ Navigated to page {page}")
+                else:
+                    print(f"⚠️ Could not navigate to page {page}. Skipping.")
+                    record_failed_page(page, "Could not navigate to page")
+                    continue
+
+            except Exception as e:
+                print(f"❌ Failed to navigate to page {page}: {e}")
+                record_failed_page(page, e)
+                continue
+                continue
+
+            wait_for_loading_to_finish()
             wait_for_toasts_to_disappear()
-            next_btn = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, f'//button[contains(@class, "css-18ydibh css-1gfzd5y") and .//span[text()="Next"]]'))
-            )
 
-            while True:
+            # ========== Step 10: Select all ==========
+            for _ in range(3):
                 try:
-                    page_btn = driver.find_element(
-                        By.XPATH,
-                        f'//button[contains(@class, "css-l1fgal") and contains(@class, "css-1gfzd5y") and .//span[text()="{page}"]]'
-                    )
-                    if page_btn.is_displayed():
-                        break
+                    select_all_checkbox = wait.until(EC.element_to_be_clickable(
+                        (By.XPATH, '//div[@class="css-5j5vrg"]//label[@data-option-label="true"]')))
+                    select_all_checkbox.click()
+                    print("✅ Selected all PDFs on page.")
+                    break
                 except:
-                    page_btn = None
+                    print("🔁 Retrying select-all checkbox...")
+                    time.sleep(2)
 
-                print(f"➡️ Page {page} button not found, clicking 'Next' instead.")
-                next_btn.click()
-                time.sleep(1)
-
-            if retry_scroll_and_click(driver, page_btn):
-                print(f"➡️ Navigated to page {page}")
-            else:
-                print(f"⚠️ Could not navigate to page {page} after retries. Skipping.")
-                record_failed_page(page, e)
-                continue
+            # ========== Step 11–13: Download + upload to S3 ==========
+            wait_for_toasts_to_disappear()
+            three_dot_menu = wait.until(EC.element_to_be_clickable((By.XPATH, '//button[@title="Multi-Select Actions"]')))
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", three_dot_menu)
+            waits.until(driver, "capiq.menu_in_view", in_viewport(three_dot_menu), ceiling=1, soft=True)
+            three_dot_menu.click()
+            print("✅ Opened 3-dot menu.")
+
+            download_btn = wait.until(EC.element_to_be_clickable(
+                (By.XPATH, '//span[text()="Download Checked Files"]')))
+            zip_watcher.arm()
+            download_btn.click()
+            print("⬇️ Clicked 'Download Checked Files'.")
+
+            result, newest_zip = wait_for_zip_or_error(zip_watcher)
+
+            if result == "success":
+                if newest_zip and os.path.exists(newest_zip):
+                    postprocessor.submit(newest_zip, page)
+                    print(f"✅ ZIP download complete. Queued for upload ({postprocessor.pending()} waiting).")
+                else:
+                    print("❌ No ZIP found after download.")
+                    record_failed_page(page, "No ZIP file found after download.")
+
+            elif result == "error":
+                print(f"⚠️ Document preparation error on page {page}.")
+                record_failed_page(page, "Document preparation error")
+
+            else:  # timeout
+                print(f"❌ Timeout on page {page}.")
+                record_failed_page(page, "Timeout waiting for ZIP download")
+
+            save_cursor(page, path=cursor_path)
 
         except Exception as e:
-            print(f"❌ Failed to navigate to page {page}: {e}")
-            record_failed_page(page, e)
+            print(f"❌ Unhandled error on page {page}: {e}")
+            record_failed_page(page, "Unhandled error: " + str(e))
             continue
 
-        wait_for_loading_to_finish()
-        wait_for_toasts_to_disappear()
+    # Let queued ZIPs finish uploading before returning
+    postprocessor.close()
+    if store is not None:
+        try:
+            store.push_index()
+        except Exception as e:
+            print(f"⚠️ PDFStore index upload failed: {e}")
+    print(f"⏱️ Wait latencies:\n{waits.summary()}")
+    return len(pages)
 
-        # ========== Step 10: Select all ==========
-        for _ in range(3):
-            try:
-                select_all_checkbox = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, '//div[@class="css-5j5vrg"]//label[@data-option-label="true"]')))
-                select_all_checkbox.click()
-                print("✅ Selected all PDFs on page.")
-                break
-            except:
-                print("🔁 Retrying select-all checkbox...")
-                time.sleep(2)
-
-        # ========== Step 11–13: Download + upload to S3 ==========
-        wait_for_toasts_to_disappear()
-        three_dot_menu = wait.until(EC.element_to_be_clickable((By.XPATH, '//button[@title="Multi-Select Actions"]')))
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", three_dot_menu)
-        time.sleep(1)
-        three_dot_menu.click()
-        print("✅ Opened 3-dot menu.")
-
-        download_btn = wait.until(EC.element_to_be_clickable(
-            (By.XPATH, '//span[text()="Download Checked Files"]')))
-        download_btn.click()
-        print("⬇️ Clicked 'Download Checked Files'.")
-
-        result = wait_for_zip_or_error(download_dir)
-
-        if result == "success":
-            print("✅ ZIP download complete. Uploading to S3...")
-
-            zip_files = glob.glob(os.path.join(download_dir, "*.zip"))
-            if zip_files:
-                newest_zip = max(zip_files, key=os.path.getctime)
-                s3_key = f"UpdateDocuments/{os.path.basename(newest_zip)}"
-                try:
-                    boto3.client('s3').upload_file(newest_zip, "fed-data-storage", s3_key)
-                    print(f"✅ Uploaded {newest_zip} to S3.")
-                    os.remove(newest_zip)
-                except Exception as e:
-                    print(f"❌ S3 upload failed: {e}")
-                    record_failed_page(page, "S3 upload failed: " + str(e))
-            else:
-                print("❌ No ZIP found after download.")
-                record_failed_page(page, "No ZIP file found after download.")
-
-        elif result == "error":
-            print(f"⚠️ Document preparation error on page {page}.")
-            record_failed_page(page, "Document preparation error")
-
-        else:  # timeout
-            print(f"❌ Timeout on page {page}.")
-            record_failed_page(page, "Timeout waiting for ZIP download")
-
-        time.sleep(2)
 
-    except Exception as e:
-        print(f"❌ Unhandled error on page {page}: {e}")
-        record_failed_page(page, "Unhandled error: " + str(e))
-        continue
+# === FLEET MODE ===
+def stripe_cursor_path(stripe):
+    return f"capiq_cursor_{stripe[0]}-{stripe[-1]}.json"
+
+
+def fleet_session(download_root):
+    """
+    Pool initializer for a fleet worker: its own download dir, browser, cookies and filters.
+    The SessionManager stands in for the worker's driver, so shard.py quits whichever Chrome is current.
+    """
+    download_dir = os.path.join(download_root, f"worker_{os.getpid()}")
+    return open_session(download_dir)
+
+
+def fleet_task(stripe):
+    print(f"🚀 Worker {os.getpid()} taking pages {stripe[0]}–{stripe[-1]}")
+    cursor_path = stripe_cursor_path(stripe)
+    remaining = pages_after_cursor(stripe, path=cursor_path)
+    return scrape_pages(remaining, session_download_dir, cursor_path=cursor_path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Download CapIQ Y-6 filings page by page")
+    ap.add_argument("--fleet", type=int, default=1,
+                    help="Number of browsers; each takes a disjoint stripe of pages_to_scrape")
+    args = ap.parse_args()
+
+    init_failed_log()
+    if args.fleet <= 1:
+        # Skip pages finished by a previous run (capiq_cursor.json); delete the cursor file to start over
+        pages = pages_after_cursor(pages_to_scrape)
+        open_session(DOWNLOAD_DIR)
+        try:
+            scrape_pages(pages, DOWNLOAD_DIR)
+        finally:
+            session.quit()
+        return
+
+    # Each stripe keeps its own cursor (capiq_cursor_<first>-<last>.json); keep --fleet fixed to resume
+    stripes = [s for s in split_range(pages_to_scrape, args.fleet) if s]
+    print(f"🚢 Fleet of {len(stripes)} browsers over {len(pages_to_scrape)} pages.")
+    run_sharded(fleet_task, stripes, workers=len(stripes), make_driver=fleet_session,
+                driver_kwargs={"download_root": DOWNLOAD_DIR},
+                on_result=lambda stripe, n: print(f"🏁 Pages {stripe[0]}–{stripe[-1]} done ({n} page(s))."),
+                on_error=lambda stripe, e: print(f"❌ Worker for pages {stripe[0]}–{stripe[-1]} died: {e}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,24 @@
 import os
 import sys
 import time
-import glob
-import csv
+import re
 import argparse
+import hashlib
+import json
+import shutil
 import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Set, List, Optional, Tuple
+from typing import Dict, Set, List, Optional, Tuple
 from urllib.parse import urlparse, unquote
 
 import requests
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException
 
 # Optional S3 upload
 try:
@@ -26,8 +29,20 @@ except Exception:
     boto3 = None  # type: ignore
     BOTO3 = False
 
+from http_cache import HttpCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+from pdf_store import ContentStore, PdfIntegrityError, PdfStreamCheck, check_pdf_file, sha256_file
+from http_listing import HostLimiter, HttpLister, cleveland_records
+from manifest import ManifestWriter
+from dom_extract import extract_anchors
+from shard import run_sharded, worker_driver
+from browser import chrome_driver
+from budget import throttle
+from watermark import ScrapeState
+from waits import adaptive_waits, attribute_is, document_ready, has_children, in_viewport
+
 
 BASE_URL = "https://www.clevelandfed.org/banking-and-payments/fry6-reports"
+waits = adaptive_waits("cleveland")  # condition waits instead of fixed sleeps (see waits.py)
 
 # ----------- real-time logging -----------
 try:
@@ -41,37 +56,25 @@ def ts() -> str:
 def log(msg: str):
     print(f"[{ts()}] {msg}", flush=True)
 
-def fsync_file(f):
-    f.flush()
-    try:
-        os.fsync(f.fileno())
-    except Exception:
-        pass
 # -----------------------------------------
 
 
-def make_driver(download_dir: str, headless: bool = True) -> webdriver.Chrome:
+def make_driver(download_dir: str, headless: bool = True, block_analytics: bool = False) -> webdriver.Chrome:
     """
     We still set a download dir, but downloads happen via HTTP (requests).
+    Warm profile, no images/fonts/media, eager page loads (see browser.py).
     """
-    Path(download_dir).mkdir(parents=True, exist_ok=True)
-    opts = webdriver.ChromeOptions()
-    prefs = {
-        "download.default_directory": download_dir,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True,
-        # force Chrome to download PDFs if anything gets clicked by accident
-        "plugins.always_open_pdf_externally": True,
-        "download.open_pdf_in_system_reader": False,
-    }
-    opts.add_experimental_option("prefs", prefs)
-    if headless:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--window-size=1400,1200")
-    return webdriver.Chrome(service=Service(), options=opts)
+    return chrome_driver(
+        "cleveland",
+        download_dir=download_dir,
+        headless=headless,
+        block_analytics=block_analytics,
+        extra_prefs={
+            # force Chrome to download PDFs if anything gets clicked by accident
+            "plugins.always_open_pdf_externally": True,
+            "download.open_pdf_in_system_reader": False,
+        },
+    )
 
 
 def expand_year_and_get_panel(driver: webdriver.Chrome, year: int):
@@ -86,38 +89,47 @@ def expand_year_and_get_panel(driver: webdriver.Chrome, year: int):
         f'//*[self::button or self::a][contains(normalize-space(.), "FR Y-6 Reports {year}")]'
     )))
     driver.execute_script("arguments[0].scrollIntoView({block:'center'});", header)
-    time.sleep(0.2)
+    waits.until(driver, "cleveland.header_in_view", in_viewport(header), ceiling=2, soft=True)
 
     expanded = header.get_attribute("aria-expanded")
     if expanded not in ("true", True):
         ActionChains(driver).move_to_element(header).click().perform()
-        time.sleep(0.4)
+        waits.until(driver, "cleveland.expanded", attribute_is(header, "aria-expanded", "true"), ceiling=2, soft=True)
 
     panel_id = header.get_attribute("aria-controls")
     if panel_id:
         panel = driver.find_element(By.ID, panel_id)
     else:
         panel = header.find_element(By.XPATH, "following::*[self::div or self::section][1]")
+    # the panel's links render after the expand animation. Hard wait: listing a half-rendered panel
+    # would save a partial year and mark it done; a timeout fails the year instead
+    waits.until(driver, "cleveland.panel_rendered", has_children(panel, "a[href]"), ceiling=10)
     return panel
 
 
-def list_pdf_anchors(panel) -> List[Tuple[str, str]]:
+def list_pdf_anchors(driver: webdriver.Chrome, panel) -> List[Tuple[str, str]]:
     """
     Inside the opened panel, return a list of (text, href) for anchors that are actual PDFs:
-    only hrefs ending with .pdf (case-insensitive).
+    only hrefs ending with .pdf (case-insensitive). One execute_script for the whole panel.
     """
-    anchors = panel.find_elements(By.XPATH, './/a[@href]')
     out: List[Tuple[str, str]] = []
-    for a in anchors:
-        try:
-            href = (a.get_attribute("href") or "").strip()
-            if href.lower().endswith(".pdf"):
-                out.append((a.text.strip(), href))
-        except Exception:
-            continue
+    for text, href in extract_anchors(driver, panel):
+        href = href.strip()
+        if href.lower().endswith(".pdf"):
+            out.append((text.strip(), href))
     return out
 
 
+def list_year_task(year: int) -> List[Tuple[str, str]]:
+    """run_sharded task: list one year's PDF anchors in this worker's browser."""
+    driver = worker_driver()
+    if not driver.current_url.startswith(BASE_URL):
+        driver.get(BASE_URL)
+        waits.until(driver, "cleveland.page_ready", document_ready(), ceiling=10)
+    panel = expand_year_and_get_panel(driver, year)
+    return list_pdf_anchors(driver, panel)
+
+
 def safe_filename_from_url(url: str) -> str:
     path = unquote(urlparse(url).path)
     name = os.path.basename(path) or "download.pdf"
@@ -127,70 +139,369 @@ def safe_filename_from_url(url: str) -> str:
     return "".join(c for c in name if c not in r'<>:"/\|?*')
 
 
-def http_download_pdf(url: str, dest_dir: str, referer: str, timeout: int = 60, retries: int = 3) -> str:
-    """
-    Download a PDF via HTTP to dest_dir. Returns local file path on success; raises on failure.
-    Validates content-type (best-effort) and size (>1KB).
-    """
-    headers = {
+def link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def replace_with(src: str, dst: str):
+    """Put src at dst (hard link or copy), replacing a stale copy left by an earlier run."""
+    tmp = f"{dst}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    link_or_copy(src, tmp)
+    os.replace(tmp, dst)
+
+
+def partial_path(dest_dir: str, url: str) -> str:
+    """Where the bytes of an unfinished download of `url` are kept, across attempts and runs."""
+    return os.path.join(dest_dir, f".{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.part")
+
+
+def read_part_meta(part_path: str) -> Dict:
+    try:
+        with open(f"{part_path}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def write_part_meta(part_path: str, **meta):
+    with open(f"{part_path}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def discard_partial(part_path: str):
+    for p in (part_path, f"{part_path}.json"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def pdf_request_headers(referer: str) -> Dict[str, str]:
+    return {
         "User-Agent": "Mozilla/5.0 (compatible; PDF-Scraper/1.0)",
         "Referer": referer,
         "Accept": "application/pdf,application/octet-stream;q=0.9,*/*;q=0.8",
+        # byte offsets must mean the same thing on every attempt, so no transfer compression
+        "Accept-Encoding": "identity",
     }
+
+
+def response_validator(r: requests.Response) -> Optional[str]:
+    """Strong ETag or Last-Modified, usable as If-Range so a resumed range comes from the same file."""
+    etag = r.headers.get("ETag") or ""
+    if etag and not etag.startswith("W/"):
+        return etag
+    return r.headers.get("Last-Modified")
+
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+def ranged_get(url: str, headers: Dict[str, str], offset: int, validator: Optional[str],
+               timeout: int) -> Tuple[requests.Response, int, Optional[int]]:
+    """
+    Streaming GET of `url` from byte `offset` on. Returns (response, start, total): `start` is the
+    offset the body begins at (0 when the server sent the whole file, e.g. because it changed
+    since `validator`) and `total` is the full size when the server states it.
+    """
+    hdrs = dict(headers)
+    if offset:
+        hdrs["Range"] = f"bytes={offset}-"
+        if validator:
+            hdrs["If-Range"] = validator
+    r = requests.get(url, headers=hdrs, stream=True, timeout=timeout)
+    if offset and r.status_code == 416:
+        # we already hold at least the whole file, so what we hold is not that file: start over
+        r.close()
+        return ranged_get(url, headers, 0, None, timeout)
+    r.raise_for_status()
+    encoded = (r.headers.get("Content-Encoding") or "identity").lower() != "identity"
+    if r.status_code == 206:
+        m = _CONTENT_RANGE.match(r.headers.get("Content-Range") or "")
+        if not m or int(m.group(1)) != offset:
+            r.close()
+            raise RuntimeError(f"unexpected Content-Range: {r.headers.get('Content-Range')!r}")
+        return r, offset, (None if m.group(3) == "*" or encoded else int(m.group(3)))
+    length = r.headers.get("Content-Length") or ""
+    return r, 0, (int(length) if length.isdigit() and not encoded else None)
+
+
+def http_download_pdf(url: str, dest_dir: str, referer: str, timeout: int = 60, retries: int = 3,
+                      cache: Optional[HttpCache] = None) -> Tuple[str, str]:
+    """
+    Download a PDF via HTTP to dest_dir. Returns (local file path, sha256) on success; raises on failure.
+    The body streams into a .part file; a failed attempt (or run) resumes it with a Range request
+    from the bytes already received, and If-Range makes the server send the whole file instead if
+    it has changed. While streaming, the %PDF header and Content-Length are checked, and the %%EOF
+    trailer at the end, so a truncated or non-PDF body never reaches S3 or OCR.
+    With a cache, an entry it already holds is revalidated (ETag / Last-Modified), checked and
+    linked into dest_dir. Everything else (a cache miss, a .part left by an earlier attempt or run,
+    a retry) goes through the resumable path, and the finished file is then adopted by the cache.
+    """
+    headers = pdf_request_headers(referer)
+    out_path = os.path.join(dest_dir, safe_filename_from_url(url))
+    part_path = partial_path(dest_dir, url)
     last_err = None
     for attempt in range(1, retries + 1):
         try:
-            with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
-                r.raise_for_status()
+            resuming = os.path.exists(part_path)
+            if cache is not None and attempt == 1 and not resuming and cache.meta(url):
+                body, meta, _ = cache.fetch(url, headers=headers, timeout=timeout)
+                ctype = (meta.get("content_type") or "").lower()
+                if ("pdf" not in ctype) and (not url.lower().endswith(".pdf")):
+                    raise RuntimeError(f"unexpected content-type: {ctype or 'N/A'}")
+                if meta.get("size", 0) < 1024:
+                    raise RuntimeError(f"too small: {meta.get('size', 0)} bytes")
+                try:
+                    check_pdf_file(str(body))
+                except PdfIntegrityError:
+                    cache.invalidate(url)  # a damaged body must not be served again within the TTL
+                    raise
+                replace_with(str(body), out_path)
+                return out_path, meta.get("sha256") or sha256_file(out_path)
+
+            have = os.path.getsize(part_path) if resuming else 0
+            part_meta = read_part_meta(part_path) if have else {}
+            validator = part_meta.get("validator")
+            r, start, total = ranged_get(url, headers, have, validator, timeout)
+            with r:
                 ctype = (r.headers.get("Content-Type") or "").lower()
-
                 if ("pdf" not in ctype) and (not url.lower().endswith(".pdf")):
                     raise RuntimeError(f"unexpected content-type: {ctype or 'N/A'}")
 
-                fname = safe_filename_from_url(url)
-                out_path = os.path.join(dest_dir, fname)
-
-                # avoid overwrite by suffixing (1), (2), ...
-                if os.path.exists(out_path):
-                    stem, ext = os.path.splitext(fname)
-                    for n in itertools.count(1):
-                        alt = os.path.join(dest_dir, f"{stem} ({n}){ext}")
-                        if not os.path.exists(alt):
-                            out_path = alt
-                            break
-
-                size = 0
-                with open(out_path, "wb") as f:
+                check = PdfStreamCheck(total)
+                digest = hashlib.sha256()
+                if start:
+                    # re-read what is already on disk: the hash and the checks cover the whole file
+                    with open(part_path, "rb") as f:
+                        for block in iter(lambda: f.read(1024 * 1024), b""):
+                            check.update(block)
+                            digest.update(block)
+                    log(f"⏯️  Resuming {os.path.basename(out_path)} at {start} of {total or '?'} bytes")
+                elif have:
+                    log(f"↩️  {os.path.basename(out_path)} changed or range refused; downloading from the start")
+                etag = r.headers.get("ETag") or (part_meta.get("etag") if start else None)
+                last_modified = r.headers.get("Last-Modified") or (part_meta.get("last_modified") if start else None)
+                write_part_meta(part_path, url=url, validator=response_validator(r) or validator, total=total,
+                                etag=etag, last_modified=last_modified)
+
+                with open(part_path, "ab" if start else "wb") as f:
                     for chunk in r.iter_content(chunk_size=1024 * 64):
                         if chunk:
+                            throttle().consume(len(chunk))
+                            check.update(chunk)
                             f.write(chunk)
-                            size += len(chunk)
+                            digest.update(chunk)
+                check.finish()
+
+            if check.size < 1024:
+                discard_partial(part_path)
+                raise RuntimeError(f"too small: {check.size} bytes")
+            os.replace(part_path, out_path)
+            discard_partial(part_path)
+            sha = digest.hexdigest()
+            if cache is not None:
+                try:
+                    cache.adopt(url, out_path, etag=etag, last_modified=last_modified,
+                                content_type=ctype, sha256=sha)
+                except Exception as e:
+                    log(f"⚠️ Could not cache {os.path.basename(out_path)}: {e}")
+            return out_path, sha
+        except PdfIntegrityError as e:
+            last_err = e
+            if not e.resumable:
+                discard_partial(part_path)
+        except Exception as e:
+            last_err = e  # the .part file stays, so the next attempt resumes it
+        time.sleep(min(2 ** attempt, 10))
+    raise RuntimeError(f"download failed after {retries} retries: {last_err}")
 
-                if size < 1024:
-                    os.remove(out_path)
-                    raise RuntimeError(f"too small: {size} bytes")
 
-                return out_path
-        except Exception as e:
+S3_PART_SIZE = 8 * 1024 * 1024   # multipart part size (S3 minimum is 5MB except the last part)
+
+
+def stream_pdf_to_s3(url: str, bucket: str, key: str, referer: str, client, timeout: int = 60,
+                     retries: int = 3, part_size: int = S3_PART_SIZE,
+                     store: Optional[ContentStore] = None) -> Tuple[int, str]:
+    """
+    Pipe a PDF from HTTP straight into S3 without touching local disk. Returns (bytes, sha256).
+    Same validation as http_download_pdf (content-type, %PDF header, Content-Length, %%EOF
+    trailer, >1KB); nothing is written to S3 until the body has passed. Bodies smaller than one
+    part go up with a single put_object; larger ones use a multipart upload. A dropped connection
+    resumes with a Range request from the bytes already received, keeping the parts already
+    uploaded; the upload is aborted only when the download has to start over or gives up.
+    With a store, `key` is only a staging key: the body ends up under its content address and
+    is not written again if that content is already stored.
+    """
+    headers = pdf_request_headers(referer)
+    last_err = None
+    upload_id = None
+    parts: List[Dict] = []
+    buf = bytearray()
+    size = 0
+    digest = hashlib.sha256()
+    check: Optional[PdfStreamCheck] = None
+    validator = None
+
+    def abort():
+        nonlocal upload_id
+        if upload_id is not None:
+            try:
+                client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            except Exception:
+                pass
+            upload_id = None
+
+    for attempt in range(1, retries + 1):
+        try:
+            r, start, total = ranged_get(url, headers, size, validator, timeout)
+            with r:
+                ctype = (r.headers.get("Content-Type") or "").lower()
+
+                if ("pdf" not in ctype) and (not url.lower().endswith(".pdf")):
+                    raise RuntimeError(f"unexpected content-type: {ctype or 'N/A'}")
+
+                if start != size or check is None:
+                    if size:
+                        log(f"↩️  {url} changed or range refused; streaming from the start")
+                    abort()
+                    parts, size, digest, check = [], 0, hashlib.sha256(), PdfStreamCheck(total)
+                    buf.clear()
+                else:
+                    log(f"⏯️  Resuming {url} at {size} of {total or '?'} bytes")
+                validator = response_validator(r) or validator
+
+                for chunk in r.iter_content(chunk_size=1024 * 64):
+                    if not chunk:
+                        continue
+                    throttle().consume(len(chunk))
+                    check.update(chunk)
+                    buf += chunk
+                    digest.update(chunk)
+                    size += len(chunk)
+                    if len(buf) >= part_size:
+                        if upload_id is None:
+                            upload_id = client.create_multipart_upload(
+                                Bucket=bucket, Key=key, ContentType="application/pdf"
+                            )["UploadId"]
+                        n = len(parts) + 1
+                        resp = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                  PartNumber=n, Body=bytes(buf))
+                        parts.append({"ETag": resp["ETag"], "PartNumber": n})
+                        buf.clear()
+                check.finish()
+
+            if size < 1024:
+                raise PdfIntegrityError(f"too small: {size} bytes")
+
+            sha = digest.hexdigest()
+            if upload_id is None and store is not None:
+                if store.put_bytes(bytes(buf), sha=sha):
+                    log(f"📤 Stored s3://{bucket}/{store.key_for(sha)} ({size} bytes)")
+                else:
+                    log(f"🧬 Content already stored: {sha[:12]}… ({url})")
+                return size, sha
+            if upload_id is None:
+                client.put_object(Bucket=bucket, Key=key, Body=bytes(buf), ContentType="application/pdf")
+            else:
+                if buf:
+                    n = len(parts) + 1
+                    resp = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                              PartNumber=n, Body=bytes(buf))
+                    parts.append({"ETag": resp["ETag"], "PartNumber": n})
+                    buf.clear()
+                client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                 MultipartUpload={"Parts": parts})
+                upload_id = None
+                if store is not None:
+                    store.adopt(key, sha)
+                    log(f"📤 Stored s3://{bucket}/{store.key_for(sha)} ({size} bytes)")
+                    return size, sha
+            log(f"📤 Streamed to s3://{bucket}/{key} ({size} bytes)")
+            return size, sha
+        except PdfIntegrityError as e:
             last_err = e
-            time.sleep(min(2 ** attempt, 10))
-    raise RuntimeError(f"download failed after {retries} retries: {last_err}")
+            if not e.resumable:
+                # next attempt starts from zero: no range offset, no validator, no half-checked stream
+                abort()
+                check, size, validator = None, 0, None
+        except Exception as e:
+            last_err = e  # keep what was received (and uploaded); the next attempt resumes
+        time.sleep(min(2 ** attempt, 10))
+    abort()
+    raise RuntimeError(f"stream upload failed after {retries} retries: {last_err}")
+
+
+def s3_key_for(local_path: str, prefix: str) -> str:
+    return f"{prefix.rstrip('/')}/{os.path.basename(local_path)}"
 
 
-def upload_to_s3(local_path: str, bucket: str, prefix: str):
+def upload_to_s3(local_path: str, bucket: str, prefix: str, client=None):
     if not BOTO3:
         log("⚠️ boto3 not installed; skipping S3 upload.")
         return
-    key = f"{prefix.rstrip('/')}/{os.path.basename(local_path)}"
-    boto3.client("s3").upload_file(local_path, bucket, key)
+    key = s3_key_for(local_path, prefix)
+    (client or boto3.client("s3")).upload_file(local_path, bucket, key)
     log(f"📤 Uploaded to s3://{bucket}/{key}")
 
 
-def ensure_csv_with_header(path: str, headers: List[str]):
-    p = Path(path)
-    if not p.exists() or p.stat().st_size == 0:
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            csv.writer(f).writerow(headers)
+def fetch_and_upload(href: str, args, limiter: HostLimiter, s3_client=None,
+                     cache: Optional[HttpCache] = None, store: Optional[ContentStore] = None) -> str:
+    """
+    Worker task: download one PDF (under its host's slot), upload it, and drop the local copy.
+    Returns the downloaded filename. CSV bookkeeping stays on the main thread.
+    A cached PDF that is unchanged since it was last uploaded to the same key is not re-uploaded.
+    In --stream-to-s3 mode the PDF is piped into S3 and never staged locally.
+    With a content store, the PDF is stored under its SHA-256 and the url -> hash mapping is indexed.
+    """
+    if args.stream_to_s3:
+        fname = safe_filename_from_url(href)
+        key = store.staging_key(fname) if store is not None else s3_key_for(fname, args.s3_prefix)
+        with limiter.slot(href):
+            size, sha = stream_pdf_to_s3(href, args.s3_bucket, key, referer=BASE_URL,
+                                         client=s3_client, store=store)
+        if store is not None:
+            store.record(href, sha, size, source="cleveland", filename=fname)
+        return fname
+
+    with limiter.slot(href):
+        local_path, sha = http_download_pdf(href, args.download_dir, referer=BASE_URL, cache=cache)
+    fname = os.path.basename(local_path)
+
+    if store is not None:
+        try:
+            if store.put_file(local_path, sha=sha):
+                log(f"📤 Stored s3://{args.s3_bucket}/{store.key_for(sha)}")
+            else:
+                log(f"🧬 Content already stored: {sha[:12]}… ({fname})")
+            store.record(href, sha, os.path.getsize(local_path), source="cleveland", filename=fname)
+        finally:
+            try:
+                os.remove(local_path)
+            except Exception:
+                pass
+    elif not args.no_s3:
+        try:
+            key = f"s3://{args.s3_bucket}/{s3_key_for(local_path, args.s3_prefix)}"
+            meta = cache.meta(href) if cache is not None else None
+            if meta and meta.get("uploaded_to") == key:
+                log(f"♻️  Unchanged since last upload: {fname}")
+            else:
+                upload_to_s3(local_path, args.s3_bucket, args.s3_prefix, client=s3_client)
+                if cache is not None:
+                    cache.annotate(href, uploaded_to=key)
+        finally:
+            # remove local copy to save disk
+            try:
+                os.remove(local_path)
+            except Exception:
+                pass
+    return fname
 
 
 def main():
@@ -206,33 +517,86 @@ def main():
     ap.add_argument("--limit-per-year", type=int, default=0, help="Only download first N PDFs per year (0=all).")
     ap.add_argument("--headless", action="store_true", help="Run Chrome headless (default: headless).")
     ap.add_argument("--debug", action="store_true", help="Print a few sample links per year.")
+    ap.add_argument("--block-analytics", action="store_true", help="Refuse analytics/tag-manager requests in Chrome.")
+    ap.add_argument("--backend", choices=["selenium", "http"], default="selenium",
+                    help="Listing backend: headless Chrome, or plain HTTP + HTML parser.")
+    ap.add_argument("--workers", type=int, default=8, help="Concurrent PDF downloads per year.")
+    ap.add_argument("--shards", type=int, default=1,
+                    help="Browser processes listing years in parallel (selenium backend).")
+    ap.add_argument("--per-host", type=int, default=4, help="Max in-flight requests per host.")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Conditional-GET cache directory.")
+    ap.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, help="Seconds to trust a cached PDF without revalidating.")
+    ap.add_argument("--cache-max-gb", type=float, default=20.0, help="Evict least-recently-used PDFs beyond this size.")
+    ap.add_argument("--no-cache", action="store_true", help="Always download PDFs in full.")
+    ap.add_argument("--stream-to-s3", action="store_true",
+                    help="Pipe PDFs straight into S3 (multipart) without writing them to --download-dir.")
+    ap.add_argument("--content-store", action="store_true",
+                    help="Store PDFs once under PDFStore/<sha256> (deduped across districts) instead of --s3-prefix.")
+    ap.add_argument("--full", action="store_true", help="Download every listed PDF, not only ones missing from the manifest.")
+    ap.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run.")
     args = ap.parse_args()
-
-    # CSVs (real-time appends)
-    ensure_csv_with_header("scraped_cleveland_data.csv", ["year", "filename", "href"])
-    ensure_csv_with_header("cleveland_failed_scraping.csv", ["year", "item_text", "href", "reason"])
-    dl_csv = open("scraped_cleveland_data.csv", "a", newline="", encoding="utf-8")
-    fail_csv = open("cleveland_failed_scraping.csv", "a", newline="", encoding="utf-8")
-    dl_writer = csv.writer(dl_csv)
-    fail_writer = csv.writer(fail_csv)
-
-    driver = make_driver(args.download_dir, headless=True)  # headless by default
-    wait = WebDriverWait(driver, 20)
+    if args.stream_to_s3 and (args.no_s3 or not BOTO3):
+        ap.error("--stream-to-s3 needs S3 (boto3 installed and no --no-s3)")
+    if args.content_store and (args.no_s3 or not BOTO3):
+        ap.error("--content-store needs S3 (boto3 installed and no --no-s3)")
+
+    # CSVs, group-committed through append-only manifests (one fsync per batch, not per row)
+    downloads = ManifestWriter(
+        "cleveland_manifest.ndjson",
+        csv_path="scraped_cleveland_data.csv",
+        csv_header=["year", "filename", "href"],
+        csv_fields=["year", "id", "url"],
+    )
+    failures = ManifestWriter(
+        "cleveland_failures.ndjson",
+        csv_path="cleveland_failed_scraping.csv",
+        csv_header=["year", "item_text", "href", "reason"],
+        csv_fields=["year", "text", "url", "reason"],
+    )
+    # Watermark + checkpoint (cleveland_state.json): PDFs already in the download manifest are not
+    # fetched again, and years an interrupted run already finished are skipped
+    state = ScrapeState("cleveland", manifest_path="cleveland_manifest.ndjson")
+    resumed_years = [] if args.restart else state.done_items("years_done")
+    log(f"📌 Cleveland {state.summary()}")
+
+    sharded = args.backend == "selenium" and args.shards > 1
+    # headless by default; shard processes own their browsers
+    driver = make_driver(args.download_dir, headless=True, block_analytics=args.block_analytics) if (args.backend == "selenium" and not sharded) else None
+
+    limiter = HostLimiter(args.per_host)
+    # one client shared across worker threads (clients are thread-safe, boto3.client() is not)
+    s3_client = boto3.client("s3") if (BOTO3 and not args.no_s3) else None
+    pool = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    store = ContentStore(args.s3_bucket, s3_client) if args.content_store else None
+    # streaming never stages bodies on disk, so it bypasses the on-disk cache
+    cache = None if (args.no_cache or args.stream_to_s3) else HttpCache(
+        args.cache_dir, ttl=args.cache_ttl, max_bytes=int(args.cache_max_gb * 1024 ** 3)
+    )
 
     try:
-        log(f"🌐 Opening {BASE_URL}")
-        driver.get(BASE_URL)
-        time.sleep(2)
+        # listing page unchanged since a previous run -> years recorded then can be skipped
+        done_years: Set[int] = set()
+        if cache is not None:
+            try:
+                _, meta, fresh = cache.fetch(BASE_URL, headers={"User-Agent": "Mozilla/5.0 (compatible; PDF-Scraper/1.0)"})
+                if not fresh:
+                    done_years = set(meta.get("scraped_years", []))
+            except Exception as e:
+                log(f"⚠️ Listing cache check failed: {e}")
 
         # iterate years (desc by default)
         years = range(args.from_year, args.to_year - 1, -1) if args.from_year >= args.to_year else range(args.from_year, args.to_year + 1)
-
+        todo = []
         for year in years:
-            log(f"\n🗓️  Year {year}: expanding…")
-            panel = expand_year_and_get_panel(driver, year)
-            time.sleep(0.4)  # allow content to render
-
-            pdfs = list_pdf_anchors(panel)
+            if year in resumed_years:
+                log(f"⏩ Year {year}: finished before the interruption; skipping.")
+                continue
+            if year in done_years:
+                log(f"♻️  Year {year}: listing unchanged since last full run; skipping.")
+                continue
+            todo.append(year)
+
+        def process_year(year: int, pdfs: List[Tuple[str, str]]):
             log(f"   • Found {len(pdfs)} PDF links in {year} (href ends with .pdf)")
 
             if args.debug and pdfs:
@@ -240,57 +604,121 @@ def main():
                     log(f"     ↪ sample: {t or '(no text)'} | {h}")
 
             processed = 0
+            failed = 0
+            known = 0
             seen_names: Set[str] = set()
 
+            # dedupe by target filename before submitting, so duplicates never hit the network
+            jobs: List[Tuple[str, str]] = []
             for text, href in pdfs:
-                if args.limit_per_year and processed >= args.limit_per_year:
+                if not args.full and not state.is_new(href):
+                    known += 1
+                    continue
+                fname = safe_filename_from_url(href)
+                if fname in seen_names:
+                    log(f"↩️  Duplicate skipped: {fname}")
+                    continue
+                seen_names.add(fname)
+                jobs.append((text, href))
+
+            # --limit-per-year counts saved PDFs: submit only as many as are still missing, and
+            # top up from the remaining links after failures
+            remaining = iter(jobs)
+            while True:
+                want = args.limit_per_year - processed if args.limit_per_year else len(jobs)
+                wave = list(itertools.islice(remaining, max(0, want)))
+                if not wave:
                     break
-
+                futures = {
+                    pool.submit(fetch_and_upload, href, args, limiter, s3_client, cache, store): (text, href)
+                    for text, href in wave
+                }
+                for fut in as_completed(futures):
+                    text, href = futures[fut]
+                    try:
+                        fname = fut.result()
+                        log(f"✅ Downloaded: {fname}")
+                        downloads.append({"year": year, "id": fname, "url": href})
+                        state.see(href, fname, str(year))
+                        processed += 1
+                    except Exception as e:
+                        failures.append({"year": year, "text": text, "url": href, "reason": f"http_download_error:{e}"})
+                        log(f"❌ HTTP download error: {href} — {e}")
+                        failed += 1
+
+            log(f"✅ Year {year}: downloaded {processed} file(s)" + (f", {known} already downloaded." if known else "."))
+            downloads.commit()
+            failures.commit()
+            if failed:
+                # not done: a resumed run lists this year again and retries what failed
+                log(f"⚠️ Year {year}: {failed} download(s) failed; not marked done.")
+            else:
+                state.mark_done("years_done", year)
+            if store is not None:
                 try:
-                    local_path = http_download_pdf(href, args.download_dir, referer=BASE_URL)
-                    fname = os.path.basename(local_path)
-
-                    if fname in seen_names:
-                        log(f"↩️  Duplicate skipped: {fname}")
-                        try:
-                            os.remove(local_path)
-                        except Exception:
-                            pass
-                        continue
-                    seen_names.add(fname)
-
-                    log(f"✅ Downloaded: {fname}")
-                    dl_writer.writerow([year, fname, href]); fsync_file(dl_csv)
-
-                    if not args.no_s3:
-                        try:
-                            upload_to_s3(local_path, args.s3_bucket, args.s3_prefix)
-                        finally:
-                            # remove local copy to save disk
-                            try:
-                                os.remove(local_path)
-                            except Exception:
-                                pass
+                    store.push_index()
+                except Exception as e:
+                    log(f"⚠️ Index upload failed: {e}")
 
-                    processed += 1
-                    time.sleep(0.05)
+            # only a clean, unlimited year can be skipped next time
+            if cache is not None and not failed and not args.limit_per_year:
+                done_years.add(year)
+                cache.annotate(BASE_URL, scraped_years=sorted(done_years))
 
-                except Exception as e:
-                    fail_writer.writerow([year, text, href, f"http_download_error:{e}"]); fsync_file(fail_csv)
-                    log(f"❌ HTTP download error: {href} — {e}")
-                    time.sleep(0.05)
+        listing_failed: List[int] = []  # years whose panel never rendered: not done, retried next run
 
-            log(f"✅ Year {year}: downloaded {processed} file(s).")
+        def listing_error(year: int, e: BaseException):
+            listing_failed.append(year)
+            log(f"❌ Year {year} listing failed: {e.__class__.__name__}: {e}")
 
-        log("\n🏁 Finished all years.")
+        log(f"🌐 Opening {BASE_URL}")
+        if sharded:
+            # listing runs in the shard browsers; each year's downloads start as soon as it is listed
+            log(f"🧩 Listing {len(todo)} year(s) across {args.shards} browser processes…")
+            run_sharded(list_year_task, todo, args.shards, make_driver,
+                        {"download_dir": args.download_dir, "headless": True, "block_analytics": args.block_analytics},
+                        on_result=process_year,
+                        on_error=listing_error)
+        elif driver is not None:
+            driver.get(BASE_URL)
+            waits.until(driver, "cleveland.page_ready", document_ready(), ceiling=10)
+            for year in todo:
+                log(f"\n🗓️  Year {year}: expanding…")
+                try:
+                    panel = expand_year_and_get_panel(driver, year)
+                    pdfs = list_pdf_anchors(driver, panel)
+                except TimeoutException as e:
+                    listing_error(year, e)
+                    continue
+                process_year(year, pdfs)
+        else:
+            # http backend: every year's panel is in the same server-rendered page
+            by_year: Dict[int, List[Tuple[str, str]]] = {}
+            lister = HttpLister(workers=args.workers, cache=cache, limiter=limiter)
+            for rec in cleveland_records(lister.fetch_parsed(BASE_URL), BASE_URL):
+                if rec.year.isdigit():
+                    by_year.setdefault(int(rec.year), []).append((rec.doc_id, rec.url))
+            for year in todo:
+                log(f"\n🗓️  Year {year}")
+                process_year(year, by_year.get(year, []))
+
+        if listing_failed:
+            # keep the checkpoint: the next run skips the finished years and retries these
+            log(f"\n⚠️ Not listed (wait timed out): {sorted(listing_failed)}; checkpoint kept, watermark not committed.")
+        else:
+            state.commit_watermark()  # a clean finish clears the checkpoint
+            log(f"\n🏁 Finished all years ({state.new_count} new PDF(s), {state.revised_count} revised).")
+        log(f"⏱️ Wait latencies:\n{waits.summary()}")
 
     finally:
+        pool.shutdown(wait=True, cancel_futures=True)
         try:
-            driver.quit()
+            if driver is not None:
+                driver.quit()
         except Exception:
             pass
-        dl_csv.close()
-        fail_csv.close()
+        downloads.close()
+        failures.close()
 
 
 if __name__ == "__main__":
@@ -1,29 +1,29 @@
-import os
-import json
-import time
-import pandas as pd
-import boto3
-from selenium import webdriver
+# Selenium only: the results table pages with a <button class="page-link next">, which plain HTTP
+# cannot follow, so this district has no HTTP backend (orchestrate.py --backend http still runs it
+# in Chrome).
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from manifest import ManifestWriter
+from dom_extract import extract_table_rows
+from browser import chrome_driver
+from watermark import ScrapeState
+from waits import adaptive_waits, signature_changed, table_signature
+
 # AWS setup
 bucket_name = "fed-data-storage"
 s3_folder = "Dallas_Documents/"
 json_file = "Dallas_JSON.json"
 s3_key = s3_folder + json_file
 
-def upload_to_s3(file_path, bucket_name, s3_key):
-    s3 = boto3.client("s3")
-    s3.upload_file(file_path, bucket_name, s3_key)
-    print(f"📤 Uploaded to S3: s3://{bucket_name}/{s3_key}")
+# Setup Chrome driver (warm profile, no images/fonts/media, eager page loads; see browser.py)
+driver = chrome_driver("dallas", headless=True)
 
-# Setup Chrome driver
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')
-driver = webdriver.Chrome(service=Service(), options=options)
+# Pages advance as soon as the results table re-renders; latencies tune the timeouts (see waits.py)
+DISTRICT = "dallas"
+ROW_CSS = "table tbody tr"
+waits = adaptive_waits(DISTRICT)
 
 # Target URL
 start_url = "https://www.dallasfed.org/banking/nic/fry-6"
@@ -32,66 +32,98 @@ driver.get(start_url)
 # Output files
 csv_file = "scraped_dallas_data.csv"
 
-# Create output files if they don't exist
-if not os.path.exists(csv_file):
-    with open(csv_file, "w") as f:
-        f.write("DocumentID,Year\n")
-
-if not os.path.exists(json_file):
-    with open(json_file, "w") as f:
-        json.dump([], f)
+# Append-only manifest: rows are group-committed to dallas_manifest.ndjson + the CSV,
+# and Dallas_JSON.json is rebuilt from it as a periodic snapshot (and pushed to S3)
+manifest = ManifestWriter(
+    "dallas_manifest.ndjson",
+    json_path=json_file,
+    csv_path=csv_file,
+    csv_header=["DocumentID", "Year"],
+    csv_fields=["id", "year"],
+    s3_bucket=bucket_name,
+    s3_key=s3_key,
+)
+
+# Incremental refresh: only URLs not already in the manifest (new filings and FULL_REVISED
+# re-publications) are recorded. The listing is newest-first, so the walk stops after this many
+# consecutive pages with nothing new (0 = walk every page). dallas_state.json keeps the watermark
+# and a (page, row) checkpoint that lets a crashed run pick up where it stopped.
+STOP_AFTER_KNOWN_PAGES = 2
+
+state = ScrapeState("dallas", manifest_path="dallas_manifest.ndjson")
+print(f"📌 Dallas {state.summary()}")
+resume = state.checkpoint or {}
+resume_page, resume_row = resume.get("page", 0), resume.get("row", 0)
+if resume_page:
+    print(f"⏩ Resuming interrupted run after page {resume_page}, row {resume_row}")
 
 page = 1
+known_streak = 0
+completed = False
 
 while True:
-    print(f"Scraping page {page}...")
-
     WebDriverWait(driver, 10).until(
-        EC.presence_of_all_elements_located((By.CSS_SELECTOR, "table tbody tr"))
+        EC.presence_of_all_elements_located((By.CSS_SELECTOR, ROW_CSS))
     )
 
-    rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
-    new_csv_rows = []
-    new_json_links = []
-
-    for row in rows:
-        try:
-            doc_link = row.find_element(By.CSS_SELECTOR, "td:nth-child(1) a")
-            doc_id = doc_link.text.strip()
-            doc_url = doc_link.get_attribute("href")
-            year = row.find_element(By.CSS_SELECTOR, "td:nth-child(3)").text.strip()
-
-            new_csv_rows.append(f"{doc_id},{year}\n")
-            new_json_links.append(doc_url)
-        except Exception as e:
-            print("Error on row:", e)
-            continue
-
-    with open(csv_file, "a") as f:
-        f.writelines(new_csv_rows)
-
-    with open(json_file, "r+") as f:
-        existing_links = json.load(f)
-        f.seek(0)
-        updated_links = existing_links + new_json_links
-        json.dump(updated_links, f, indent=2)
-        f.truncate()
-
-    upload_to_s3(json_file, bucket_name, s3_key)
+    if page < resume_page:
+        print(f"Skipping page {page} (finished before the interruption)...")
+    else:
+        print(f"Scraping page {page}...")
+
+        # One execute_script per page: every row's cell texts + hrefs
+        rows = extract_table_rows(driver, ROW_CSS)
+        new_rows = 0
+
+        for r_idx, row in enumerate(rows, start=1):
+            if page == resume_page and r_idx <= resume_row:
+                continue
+            try:
+                if len(row) < 3 or not row[0].hrefs:
+                    raise ValueError(f"unexpected row layout: {[c.text for c in row]}")
+                doc_id = row[0].text
+                doc_url = row[0].hrefs[0]
+                year = row[2].text
+
+                if state.see(doc_url, doc_id, year):
+                    manifest.append({"id": doc_id, "year": year, "url": doc_url, "page": page})
+                    new_rows += 1
+            except Exception as e:
+                print("Error on row:", e)
+                continue
+
+        manifest.commit()
+        state.save_checkpoint(page=page, row=len(rows))
+        known_streak = known_streak + 1 if not new_rows else 0
+        if new_rows:
+            print(f"   🆕 {new_rows} new/revised filing(s) on page {page}")
+        if STOP_AFTER_KNOWN_PAGES and page > resume_page and known_streak >= STOP_AFTER_KNOWN_PAGES:
+            print(f"🛑 Nothing new for {known_streak} page(s); older pages were scraped before.")
+            completed = True
+            break
 
     # Try to click the "Next" button
     try:
         next_btn = driver.find_element(By.CSS_SELECTOR, 'button.page-link.next')
         if "disabled" in next_btn.get_attribute("class"):
             print("Reached last page.")
+            completed = True
             break
 
+        before = table_signature(driver, ROW_CSS)
         driver.execute_script("arguments[0].click();", next_btn)
         page += 1
-        time.sleep(1.5)
+        # wait for the table to re-render instead of a fixed 1.5 s
+        waits.until(driver, f"{DISTRICT}.rows_changed", signature_changed(
+            lambda d: table_signature(d, ROW_CSS), before), ceiling=10)
     except Exception as e:
         print(f"Failed to click next: {e}")
         break
 
 driver.quit()
+print(f"⏱️ Wait latencies:\n{waits.summary()}")
+manifest.close()  # final commit + snapshot + S3 upload
+if completed:
+    state.commit_watermark()  # a clean finish clears the checkpoint
+print(f"📌 {state.new_count} new filing(s), {state.revised_count} revised; Dallas {state.summary()}")
 print("✅ Finished scraping and uploading JSON.")
@@ -1,13 +1,15 @@
-import os
-import json
-import pandas as pd
-import boto3
-from selenium import webdriver
+# Selenium only: the results table pages with a script-driven Next control, which plain HTTP
+# cannot follow, so this district has no HTTP backend (orchestrate.py --backend http still runs it
+# in Chrome).
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+
+from manifest import ManifestWriter
+from dom_extract import extract_table_rows
+from browser import chrome_driver
+from watermark import ScrapeState
+from waits import adaptive_waits, signature_changed, table_signature
 
 # AWS S3 setup
 bucket_name = "fed-data-storage"
@@ -15,16 +17,13 @@ s3_folder = "Minneapolis_Documents/"
 json_file = "Minneapolis_JSON.json"
 s3_key = s3_folder + json_file
 
-# Helper: Upload to S3
-def upload_to_s3(file_path, bucket_name, s3_key):
-    s3 = boto3.client("s3")
-    s3.upload_file(file_path, bucket_name, s3_key)
-    print(f"📤 Uploaded to S3: s3://{bucket_name}/{s3_key}")
+# Set up Selenium (warm profile, no images/fonts/media, eager page loads; see browser.py)
+driver = chrome_driver("minneapolis", headless=True)  # headless=False to see browser
 
-# Set up Selenium
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')  # comment this out to see browser
-driver = webdriver.Chrome(service=Service(), options=options)
+# Pages advance as soon as the results table re-renders; latencies tune the timeouts (see waits.py)
+DISTRICT = "minneapolis"
+ROW_CSS = "table tbody tr"
+waits = adaptive_waits(DISTRICT)
 
 # Start URL
 start_url = "https://www.minneapolisfed.org/banking/statistical-and-structure-reports/structure-reports/search-reports"
@@ -33,70 +32,97 @@ driver.get(start_url)
 # Output file names
 csv_file = "scraped_minneapolis_data.csv"
 
-# Create empty files if not exist
-if not os.path.exists(csv_file):
-    with open(csv_file, "w") as f:
-        f.write("RSSD,Year\n")
-
-if not os.path.exists(json_file):
-    with open(json_file, "w") as f:
-        json.dump([], f)
+# Append-only manifest: rows are group-committed to minneapolis_manifest.ndjson + the CSV,
+# and Minneapolis_JSON.json is rebuilt from it as a periodic snapshot (and pushed to S3)
+manifest = ManifestWriter(
+    "minneapolis_manifest.ndjson",
+    json_path=json_file,
+    csv_path=csv_file,
+    csv_header=["RSSD", "Year"],
+    csv_fields=["id", "year"],
+    s3_bucket=bucket_name,
+    s3_key=s3_key,
+)
+
+# Incremental refresh: only URLs not already in the manifest are recorded, and the newest-first
+# walk stops after this many consecutive pages with nothing new (0 = walk every page).
+# minneapolis_state.json keeps the watermark and a (page, row) checkpoint for crash resume.
+STOP_AFTER_KNOWN_PAGES = 2
+
+state = ScrapeState("minneapolis", manifest_path="minneapolis_manifest.ndjson")
+print(f"📌 Minneapolis {state.summary()}")
+resume = state.checkpoint or {}
+resume_page, resume_row = resume.get("page", 0), resume.get("row", 0)
+if resume_page:
+    print(f"⏩ Resuming interrupted run after page {resume_page}, row {resume_row}")
 
 page = 1
 max_pages = 503
+known_streak = 0
+completed = False
 
 while page <= max_pages:
-    print(f"Scraping page {page}...")
-
     WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr"))
+        EC.presence_of_element_located((By.CSS_SELECTOR, ROW_CSS))
     )
 
-    rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
-
-    new_json_links = []
-    new_csv_rows = []
-
-    for row in rows:
-        try:
-            link = row.find_element(By.CSS_SELECTOR, "td:nth-child(1) a")
-            rssd = link.text.strip()
-            href = link.get_attribute("href")
-            year = row.find_element(By.CSS_SELECTOR, "td:nth-child(3)").text.strip()
-
-            new_csv_rows.append(f"{rssd},{year}\n")
-            new_json_links.append(href)
-
-        except Exception as e:
-            print("Error on row:", e)
-            continue
-
-    # Append to CSV
-    with open(csv_file, "a") as f:
-        f.writelines(new_csv_rows)
-
-    # Append to JSON
-    with open(json_file, "r+") as f:
-        existing_links = json.load(f)
-        f.seek(0)
-        updated_links = existing_links + new_json_links
-        json.dump(updated_links, f, indent=2)
-        f.truncate()
-
-    # Upload updated JSON to S3
-    upload_to_s3(json_file, bucket_name, s3_key)
+    if page < resume_page:
+        print(f"Skipping page {page} (finished before the interruption)...")
+    else:
+        print(f"Scraping page {page}...")
+
+        # One execute_script per page: every row's cell texts + hrefs
+        rows = extract_table_rows(driver, ROW_CSS)
+        new_rows = 0
+
+        for r_idx, row in enumerate(rows, start=1):
+            if page == resume_page and r_idx <= resume_row:
+                continue
+            try:
+                if len(row) < 3 or not row[0].hrefs:
+                    raise ValueError(f"unexpected row layout: {[c.text for c in row]}")
+                rssd = row[0].text
+                href = row[0].hrefs[0]
+                year = row[2].text
+
+                if state.see(href, rssd, year):
+                    manifest.append({"id": rssd, "year": year, "url": href, "page": page})
+                    new_rows += 1
+
+            except Exception as e:
+                print("Error on row:", e)
+                continue
+
+        manifest.commit()
+        state.save_checkpoint(page=page, row=len(rows))
+        known_streak = known_streak + 1 if not new_rows else 0
+        if new_rows:
+            print(f"   🆕 {new_rows} new/revised filing(s) on page {page}")
+        if STOP_AFTER_KNOWN_PAGES and page > resume_page and known_streak >= STOP_AFTER_KNOWN_PAGES:
+            print(f"🛑 Nothing new for {known_streak} page(s); older pages were scraped before.")
+            completed = True
+            break
 
     # Go to next page
     try:
         next_button = driver.find_element(By.LINK_TEXT, "Next")
         if "disabled" in next_button.get_attribute("class"):
+            completed = True
             break
+        before = table_signature(driver, ROW_CSS)
         next_button.click()
         page += 1
-        time.sleep(1.5)
+        # wait for the table to re-render instead of a fixed 1.5 s
+        waits.until(driver, f"{DISTRICT}.rows_changed", signature_changed(
+            lambda d: table_signature(d, ROW_CSS), before), ceiling=10)
     except Exception as e:
         print("Pagination error:", e)
         break
 
 driver.quit()
+print(f"⏱️ Wait latencies:\n{waits.summary()}")
+manifest.close()  # final commit + snapshot + S3 upload
+if completed or page > max_pages:
+    state.commit_watermark()  # a clean finish clears the checkpoint
+print(f"📌 {state.new_count} new filing(s), {state.revised_count} revised; Minneapolis {state.summary()}")
 print("✅ Scraping complete and JSON uploaded to S3.")
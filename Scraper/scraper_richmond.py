@@ -1,26 +1,30 @@
-import os
 import sys
-import json
-import csv
 import time
-from pathlib import Path
 from urllib.parse import urljoin
 import argparse
+from typing import Optional
 
-import boto3
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from http_cache import HttpCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+from http_listing import HostLimiter, HttpLister, richmond_records
+from manifest import ManifestWriter
+from dom_extract import extract_table_rows
+from shard import run_sharded, worker_driver
+from browser import chrome_driver
+from watermark import NewOnlyWriter, ScrapeState
+
 # ---------- Defaults ----------
 BASE_URL = "https://www.richmondfed.org/banking/research_data/fry6_reports"
 OUT_JSON = "Richmond_JSON.json"
 OUT_CSV = "scraped_richmond_data.csv"
+OUT_MANIFEST = "richmond_manifest.ndjson"
 S3_BUCKET = "fed-data-storage"
 S3_FOLDER = "Richmond_Documents/"
 S3_KEY = S3_FOLDER + OUT_JSON
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; PDF-Scraper/1.0)"}
 # ------------------------------
 
 # line-buffer stdout so logs appear immediately
@@ -35,38 +39,62 @@ def ts() -> str:
 def log(msg: str):
     print(f"[{ts()}] {msg}", flush=True)
 
-def flush_file(f):
-    f.flush()
+def open_manifest(s3_bucket: Optional[str] = None, s3_key: Optional[str] = None) -> ManifestWriter:
+    """Group-committed NDJSON log + CSV; OUT_JSON is a compacted snapshot of it."""
+    return ManifestWriter(
+        OUT_MANIFEST,
+        json_path=OUT_JSON,
+        csv_path=OUT_CSV,
+        csv_header=["RSSD", "Year"],
+        csv_fields=["id", "year"],
+        s3_bucket=s3_bucket,
+        s3_key=s3_key,
+        snapshot_interval=0,  # snapshots are taken once per year in main()
+    )
+
+def get_driver(headless: bool = True, block_analytics: bool = False):
+    # warm profile, no images/fonts/media, eager page loads (see browser.py)
+    return chrome_driver("richmond", headless=headless, block_analytics=block_analytics,
+                         window_size="1400,1000")
+
+def year_url(year: int) -> str:
+    return f"{BASE_URL}?year={year}"
+
+def year_unchanged(cache: HttpCache, year: int) -> bool:
+    """
+    True if the year's listing page is unchanged (cached within TTL or 304) since a run
+    that scraped it completely. Any error means "changed" so the year is scraped.
+    """
     try:
-        os.fsync(f.fileno())
-    except Exception:
-        pass
-
-def ensure_outputs():
-    if not Path(OUT_JSON).exists():
-        with open(OUT_JSON, "w") as jf:
-            json.dump([], jf)
-    if not Path(OUT_CSV).exists():
-        with open(OUT_CSV, "w", newline="") as cf:
-            cf.write("RSSD,Year\n")
-
-def upload_to_s3(file_path: str, bucket_name: str, s3_key: str):
-    s3 = boto3.client("s3")
-    s3.upload_file(file_path, bucket_name, s3_key)
-    log(f"📤 Uploaded to S3: s3://{bucket_name}/{s3_key}")
-
-def get_driver(headless: bool = True):
-    options = webdriver.ChromeOptions()
-    if headless:
-        options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--window-size=1400,1000")
-    return webdriver.Chrome(service=Service(), options=options)
-
-def scrape_year(driver, year: int):
+        _, meta, fresh = cache.fetch(year_url(year), headers=HTTP_HEADERS, timeout=30)
+    except Exception as e:
+        log(f"   • Cache check failed for {year}: {e}")
+        return False
+    return (not fresh) and bool(meta.get("scraped"))
+
+def append_outputs(manifest, rssd: str, row_year, pdf_url: str, year: int):
+    """
+    Record one filing (shared by both backends); the manifest batches the disk writes.
+    Shard workers pass a plain list instead and return it to the parent, the single writer.
+    """
+    manifest.append({"id": rssd, "year": str(row_year), "url": pdf_url, "tab_year": year})
+    log(f"🟢 {rssd},{row_year} → {pdf_url}")
+
+def scrape_year_http(lister: HttpLister, year: int, manifest: ManifestWriter):
+    """Same outputs as scrape_year, from a plain HTTP fetch of the year page (no browser)."""
+    url = year_url(year)
+    records = richmond_records(lister.fetch_parsed(url), url, year)
+    log(f"   • Found {len(records)} PDF rows for {year}")
+    pdf_links, csv_rows = [], []
+    for rec in records:
+        csv_rows.append((rec.doc_id, rec.year))
+        append_outputs(manifest, rec.doc_id, rec.year, rec.url, year)
+        pdf_links.append(rec.url)
+    return pdf_links, csv_rows
+
+def scrape_year(driver, year: int, manifest):
     # Load specific year directly via query param
-    url = f"{BASE_URL}?year={year}"
+    url = year_url(year)
     driver.get(url)
 
     # Wait for table rows to exist
@@ -74,7 +102,8 @@ def scrape_year(driver, year: int):
         EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr"))
     )
 
-    rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
+    # One execute_script for the whole table instead of several WebDriver calls per row
+    rows = extract_table_rows(driver, "table tbody tr")
     log(f"   • Found {len(rows)} rows for {year}")
 
     pdf_links = []
@@ -83,8 +112,8 @@ def scrape_year(driver, year: int):
     for r_idx, row in enumerate(rows, start=1):
         try:
             # Columns: 1) RSSD ID, 2) Holding Company Name, 3) Report Date
-            rssd = row.find_element(By.CSS_SELECTOR, "td:nth-child(1)").text.strip()
-            report_date = row.find_element(By.CSS_SELECTOR, "td:nth-child(3)").text.strip()
+            rssd = row[0].text if len(row) > 0 else ""
+            report_date = row[2].text if len(row) > 2 else ""
 
             # Extract year from Report Date (e.g., 06/30/2024 -> 2024). Fallback to the year tab.
             row_year = year
@@ -96,22 +125,16 @@ def scrape_year(driver, year: int):
 
             # Try to find a direct PDF link inside the row
             pdf_url = None
-            anchors = row.find_elements(By.CSS_SELECTOR, "a[href]")
-            for a in anchors:
-                href = a.get_attribute("href") or ""
+            for href in (h for cell in row for h in cell.hrefs):
                 if href.lower().endswith(".pdf"):
                     pdf_url = href
                     break
 
             # Fallback: sometimes the Holding Company name cell contains the link
-            if not pdf_url:
-                try:
-                    a2 = row.find_element(By.CSS_SELECTOR, "td:nth-child(2) a[href]")
-                    href2 = a2.get_attribute("href") or ""
-                    if href2.lower().endswith(".pdf"):
-                        pdf_url = href2
-                except Exception:
-                    pass
+            if not pdf_url and len(row) > 1 and row[1].hrefs:
+                href2 = row[1].hrefs[0]
+                if href2.lower().endswith(".pdf"):
+                    pdf_url = href2
 
             # As a last resort, skip if no PDF link found
             if not pdf_url:
@@ -122,24 +145,8 @@ def scrape_year(driver, year: int):
             if pdf_url.startswith("/"):
                 pdf_url = urljoin("https://www.richmondfed.org", pdf_url)
 
-            # Append CSV row (real-time write + echo)
             csv_rows.append((rssd, str(row_year)))
-
-            with open(OUT_CSV, "a", newline="") as cf:
-                writer = csv.writer(cf)
-                for rssd_val, y_val in [csv_rows[-1]]:  # write the just-added one
-                    writer.writerow([rssd_val, y_val])
-                flush_file(cf)
-            log(f"🟢 {OUT_CSV} += {rssd},{row_year}")
-
-            # Append JSON URL (real-time write)
-            with open(OUT_JSON, "r+", encoding="utf-8") as jf:
-                existing = json.load(jf)
-                jf.seek(0)
-                existing.append(pdf_url)
-                json.dump(existing, jf, indent=2)
-                jf.truncate()
-            log(f"🔗 URL captured ({year}) → {pdf_url}")
+            append_outputs(manifest, rssd, row_year, pdf_url, year)
 
             pdf_links.append(pdf_url)
 
@@ -148,18 +155,48 @@ def scrape_year(driver, year: int):
 
     return pdf_links, csv_rows
 
+def scrape_year_task(year: int):
+    """run_sharded task: scrape one year in this worker's browser and return its records."""
+    records = []
+    scrape_year(worker_driver(), year, records)
+    return records
+
 def main():
     parser = argparse.ArgumentParser(description="Scrape Richmond FR Y-6 PDF URLs + (RSSD,Year) with real-time CSV/JSON output.")
     parser.add_argument("--from-year", type=int, default=2024, help="Start year (inclusive).")
     parser.add_argument("--to-year", type=int, default=2019, help="End year (inclusive).")
     parser.add_argument("--headless", action="store_true", help="Run Chrome headless.")
+    parser.add_argument("--block-analytics", action="store_true", help="Refuse analytics/tag-manager requests in Chrome.")
     parser.add_argument("--no-s3", action="store_true", help="Disable S3 upload of the JSON file after each year.")
     parser.add_argument("--s3-bucket", default=S3_BUCKET, help="S3 bucket name.")
     parser.add_argument("--s3-key", default=S3_KEY, help="S3 key for the JSON file.")
+    parser.add_argument("--backend", choices=["selenium", "http"], default="selenium",
+                        help="Listing backend: headless Chrome, or plain HTTP + HTML parser.")
+    parser.add_argument("--workers", type=int, default=4, help="HTTP pool size (http backend).")
+    parser.add_argument("--per-host", type=int, default=4, help="Max in-flight requests per host (http backend).")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Browser processes scraping years in parallel (selenium backend).")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Conditional-GET cache directory.")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, help="Seconds to trust a cached listing page.")
+    parser.add_argument("--no-cache", action="store_true", help="Rescrape every year even if its page is unchanged.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run.")
     args = parser.parse_args()
 
-    ensure_outputs()
-    driver = get_driver(headless=args.headless or True)  # default to headless
+    manifest = open_manifest(None if args.no_s3 else args.s3_bucket, args.s3_key)
+    # Watermark + checkpoint (richmond_state.json): only URLs not yet in the manifest are recorded,
+    # and years an interrupted run already finished are skipped
+    state = ScrapeState("richmond", manifest_path=OUT_MANIFEST)
+    new_only = NewOnlyWriter(manifest, state)
+    resumed_years = [] if args.restart else state.done_items("years_done")
+    log(f"📌 Richmond {state.summary()}")
+    cache = None if args.no_cache else HttpCache(args.cache_dir, ttl=args.cache_ttl)
+    sharded = args.backend == "selenium" and args.shards > 1
+    if args.backend == "http":
+        driver, lister = None, HttpLister(workers=args.workers, cache=cache, limiter=HostLimiter(args.per_host))
+    elif sharded:
+        driver, lister = None, None  # each shard process owns its browser
+    else:
+        driver, lister = get_driver(headless=args.headless or True, block_analytics=args.block_analytics), None  # default to headless
 
     # Iterate years from from_year down to to_year
     start_year = args.from_year
@@ -169,25 +206,70 @@ def main():
     else:
         year_range = range(start_year, end_year - 1, -1)
 
+    def year_done(year: int, count: int, new_before: int):
+        log(f"✅ Year {year}: {count} PDF links captured, {state.new_count - new_before} new/revised rows written.")
+        # Commit + compacted JSON snapshot (uploaded to S3 unless --no-s3) after each year
+        manifest.snapshot()
+        state.mark_done("years_done", year)
+        if cache is not None:
+            cache.annotate(year_url(year), scraped=True)
+
     try:
         all_count = 0
+        todo = []
         for year in year_range:
-            log(f"🗓️  Year {year}: loading…")
-            links, rows = scrape_year(driver, year)
-            all_count += len(links)
-            log(f"✅ Year {year}: {len(links)} PDF links captured, {len(rows)} CSV rows written.")
-
-            # Upload updated JSON to S3 after each year if enabled
-            if not args.no_s3:
-                try:
-                    upload_to_s3(OUT_JSON, args.s3_bucket, args.s3_key)
-                except Exception as e:
-                    log(f"⚠️  S3 upload failed for year {year}: {e}")
-
-        log(f"🏁 Done. Total PDF URLs: {all_count}. See {OUT_JSON} and {OUT_CSV}.")
+            if year in resumed_years:
+                log(f"⏩ Year {year}: finished before the interruption; skipping.")
+                continue
+            if cache is not None and year_unchanged(cache, year):
+                log(f"♻️  Year {year}: listing unchanged since last full scrape; skipping.")
+                continue
+            todo.append(year)
+
+        failed_years = []  # years a shard failed on: not done, retried by the next run
+
+        def shard_failed(year: int, e: BaseException):
+            failed_years.append(year)
+            log(f"❌ Year {year} shard failed: {e}")
+
+        if sharded:
+            log(f"🧩 Scraping {len(todo)} year(s) across {args.shards} browser processes…")
+
+            def merge(year, records):
+                nonlocal all_count
+                new_before = state.new_count
+                for rec in records:
+                    new_only.append(rec)
+                all_count += len(records)
+                year_done(year, len(records), new_before)
+
+            run_sharded(scrape_year_task, todo, args.shards, get_driver,
+                        {"headless": True, "block_analytics": args.block_analytics},
+                        on_result=merge,
+                        on_error=shard_failed)
+        else:
+            for year in todo:
+                log(f"🗓️  Year {year}: loading…")
+                new_before = state.new_count
+                if lister:
+                    links, rows = scrape_year_http(lister, year, new_only)
+                else:
+                    links, rows = scrape_year(driver, year, new_only)
+                all_count += len(links)
+                year_done(year, len(rows), new_before)
+
+        if failed_years:
+            # keep the checkpoint: the next run skips the finished years and retries these
+            log(f"⚠️ Not scraped (shard failed): {sorted(failed_years)}; checkpoint kept, watermark not committed.")
+        else:
+            state.commit_watermark()  # a clean finish clears the checkpoint
+        log(f"🏁 Done. Total PDF URLs: {all_count} ({state.new_count} new, {state.revised_count} revised). "
+            f"See {OUT_JSON} and {OUT_CSV}.")
 
     finally:
-        driver.quit()
+        manifest.close(snapshot=False)
+        if driver is not None:
+            driver.quit()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,87 @@
+# shard.py
+"""
+Sharded scraping across a pool of browser processes.
+
+Each worker process starts its own Chrome once (pool initializer) and keeps it for every task it
+takes; tasks are handed out one at a time, so a slow year or page range never holds up the rest.
+Workers only *collect* records and return them; the parent is the single writer to the output
+manifest/CSV, so shards can never interleave partial lines.
+
+    def scrape_task(year):
+        driver = worker_driver()
+        ...
+        return records
+
+    run_sharded(scrape_task, years, workers=4, make_driver=get_driver, on_result=handle)
+"""
+import multiprocessing
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_driver = None
+
+
+def _init_worker(make_driver: Callable, driver_kwargs: Dict):
+    global _driver
+    _driver = make_driver(**driver_kwargs)
+    # atexit does not run in pool children; multiprocessing finalizers do
+    Finalize(None, _quit_driver, exitpriority=10)
+
+
+def _quit_driver():
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        except Exception:
+            pass
+        _driver = None
+
+
+def worker_driver():
+    """The calling worker process's browser (only valid inside a task run by run_sharded)."""
+    if _driver is None:
+        raise RuntimeError("worker_driver() called outside a run_sharded worker")
+    return _driver
+
+
+def split_range(items: List[Any], shards: int) -> List[List[Any]]:
+    """Contiguous, near-equal stripes (e.g. page ranges for sites with direct page URLs)."""
+    shards = max(1, min(shards, len(items) or 1))
+    size, extra = divmod(len(items), shards)
+    out, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        out.append(items[start:end])
+        start = end
+    return out
+
+
+def run_sharded(task: Callable[[Any], Any], items: Iterable[Any], workers: int,
+                make_driver: Callable, driver_kwargs: Optional[Dict] = None,
+                on_result: Optional[Callable[[Any, Any], None]] = None,
+                on_error: Optional[Callable[[Any, BaseException], None]] = None) -> List[Tuple[Any, Any]]:
+    """
+    Run task(item) for every item across `workers` browser processes. on_result / on_error are
+    called in the parent as each item finishes (completion order). `task` and `make_driver` must be
+    module-level functions so they can be pickled. Returns [(item, result)] for successful items.
+    """
+    done: List[Tuple[Any, Any]] = []
+    ctx = multiprocessing.get_context("spawn")  # Chrome/selenium state must not be forked
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=ctx,
+                             initializer=_init_worker, initargs=(make_driver, driver_kwargs or {})) as pool:
+        futures = {pool.submit(task, item): item for item in items}
+        for fut in as_completed(futures):
+            item = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(item, e)
+                continue
+            done.append((item, result))
+            if on_result is not None:
+                on_result(item, result)
+    return done
@@ -0,0 +1,230 @@
+# waits.py
+"""
+Readiness waits that replace fixed time.sleep() pauses in the Selenium scrapers.
+
+Each wait names a condition ("dallas.rows_changed", "capiq.loading_gone", ...) and polls it every
+POLL seconds instead of sleeping a fixed amount, so a page that is ready after 150 ms moves on
+after 150 ms. How long each condition took is recorded, and once a label has MIN_SAMPLES hits its
+timeout is tuned to PERCENTILE of the recent latencies times MARGIN. Every consecutive miss (a wait
+that timed out) doubles that until the condition is met again. The timeout never goes below FLOOR
+or above the ceiling the caller passes (the old fixed delay or WebDriverWait timeout).
+
+    waits = adaptive_waits("dallas")
+    before = table_signature(driver, "table tbody tr")
+    next_btn.click()
+    waits.until(driver, "dallas.rows_changed", signature_changed(
+        lambda d: table_signature(d, "table tbody tr"), before), ceiling=10)
+
+A hard wait that overruns its tuned timeout keeps polling up to the ceiling and records how long it
+really took, so a condition that got slower gets a longer timeout again; only at the ceiling does
+it raise selenium's TimeoutException, as WebDriverWait would. A soft wait gives up at the tuned
+timeout and returns None; use it where the condition may never become observable (an optional
+alert, a paginator without a current-page marker), so that waiting for it costs ~p95, not the ceiling.
+Do not use a soft wait for something the scrape's result depends on: a miss there is a partial page.
+
+Latencies are kept in .wait_stats/<name>.json under the working directory (like .chrome_profiles/),
+so the tuning carries over between runs.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                        TimeoutException)
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+STATS_DIR = Path.cwd() / ".wait_stats"  # next to .chrome_profiles/, not in the source tree
+POLL = 0.1
+PERCENTILE = 0.95
+MARGIN = 2.0
+FLOOR = 0.5
+MIN_SAMPLES = 5
+WINDOW = 200
+SAVE_EVERY = 25
+
+_IGNORED = (NoSuchElementException, StaleElementReferenceException)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AdaptiveWaits:
+    def __init__(self, name: str, path: Optional[str] = None, q: float = PERCENTILE,
+                 margin: float = MARGIN, floor: float = FLOOR, window: int = WINDOW):
+        self.name = name
+        self.path = Path(path) if path else STATS_DIR / f"{name}.json"
+        self.q = q
+        self.margin = margin
+        self.floor = floor
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._misses: Dict[str, int] = {}
+        self._streak: Dict[str, int] = {}  # consecutive misses since the label last succeeded
+        self._unsaved = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for label, entry in (data.get("labels") or {}).items():
+            self._samples[label] = deque(entry.get("samples", []), maxlen=self.window)
+            self._misses[label] = int(entry.get("misses", 0))
+
+    def save(self):
+        with self._lock:
+            data = {"updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "labels": {label: {"samples": [round(s, 3) for s in samples],
+                                       "misses": self._misses.get(label, 0)}
+                               for label, samples in self._samples.items()}}
+            self._unsaved = 0
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save wait stats to {self.path}: {e}")
+
+    def record(self, label: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(label, deque(maxlen=self.window)).append(seconds)
+            self._unsaved += 1
+            flush = self._unsaved >= SAVE_EVERY
+        if flush:
+            self.save()
+
+    def timeout(self, label: str, ceiling: float) -> float:
+        """
+        Tuned timeout for `label`: PERCENTILE x MARGIN of recent latencies, doubled for each
+        consecutive miss, within [FLOOR, ceiling].
+        """
+        with self._lock:
+            samples = list(self._samples.get(label, ()))
+            streak = self._streak.get(label, 0)
+        if len(samples) < MIN_SAMPLES:
+            return ceiling
+        return min(ceiling, max(self.floor, percentile(samples, self.q) * self.margin) * 2 ** streak)
+
+    def until(self, driver, label: str, condition: Callable, ceiling: float = 10.0, soft: bool = False):
+        """
+        Poll `condition(driver)` until truthy and return its value. A soft wait gives up at the tuned
+        timeout and returns None; a hard wait that overruns it keeps polling up to `ceiling`
+        before raising TimeoutException.
+        """
+        timeout = self.timeout(label, ceiling)
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=POLL,
+                                   ignored_exceptions=_IGNORED).until(condition)
+        except TimeoutException:
+            self._miss(label)
+            if soft:
+                return None
+            if timeout >= ceiling:
+                self.record(label, ceiling)
+                raise
+            try:
+                result = WebDriverWait(driver, max(0.0, ceiling - (time.monotonic() - start)),
+                                       poll_frequency=POLL, ignored_exceptions=_IGNORED).until(condition)
+            except TimeoutException:
+                self.record(label, ceiling)
+                raise
+        with self._lock:
+            self._streak.pop(label, None)
+        self.record(label, time.monotonic() - start)
+        return result
+
+    def _miss(self, label: str):
+        with self._lock:
+            self._misses[label] = self._misses.get(label, 0) + 1
+            self._streak[label] = min(self._streak.get(label, 0) + 1, 10)
+
+    def summary(self) -> str:
+        with self._lock:
+            labels = sorted(self._samples)
+            rows = [(label, list(self._samples[label]), self._misses.get(label, 0)) for label in labels]
+        if not rows:
+            return "   (no waits recorded)"
+        return "\n".join(f"   {label:<32} n={len(s):<4} p50={percentile(s, 0.5):.2f}s "
+                         f"p95={percentile(s, 0.95):.2f}s misses={t}" for label, s, t in rows)
+
+
+_waits: Dict[str, AdaptiveWaits] = {}
+_init_lock = threading.Lock()
+
+
+def adaptive_waits(name: str) -> AdaptiveWaits:
+    """This process's waits for `name`, loaded from .wait_stats/ on first use and saved at exit."""
+    with _init_lock:
+        if name not in _waits:
+            _waits[name] = AdaptiveWaits(name)
+            # runs at interpreter exit and in run_sharded pool children, where atexit does not
+            Finalize(None, _waits[name].save, exitpriority=5)
+        return _waits[name]
+
+
+# ---------- conditions (callables taking the driver, like expected_conditions) ----------
+def document_ready():
+    return lambda d: d.execute_script("return document.readyState") in ("interactive", "complete")
+
+
+def invisible(locator):
+    return EC.invisibility_of_element_located(locator)
+
+
+def clickable(locator):
+    return EC.element_to_be_clickable(locator)
+
+
+def attribute_is(element, name: str, value: str):
+    return lambda d: element.get_attribute(name) == value
+
+
+def value_is(locator, value: str):
+    """The input at `locator` (re-found each poll, so a re-render is fine) holds `value`."""
+    return lambda d: d.find_element(*locator).get_attribute("value") == value
+
+
+def has_focus(element):
+    return lambda d: d.switch_to.active_element == element
+
+
+def in_viewport(element):
+    return lambda d: d.execute_script(
+        "const r = arguments[0].getBoundingClientRect();"
+        "return r.height > 0 && r.top >= 0 && r.bottom <= window.innerHeight;", element)
+
+
+def has_children(element, css: str = "*"):
+    return lambda d: element.is_displayed() and bool(element.find_elements("css selector", css))
+
+
+def signature_changed(probe: Callable, before):
+    """`probe(driver)` returns something different from `before` (e.g. table_signature)."""
+    return lambda d: (lambda now: now if now != before else False)(probe(d))
+
+
+_TABLE_SIGNATURE_JS = """
+const rows = document.querySelectorAll(arguments[0]);
+const text = r => r ? (r.innerText || '').trim().slice(0, 200) : '';
+return [rows.length, text(rows[0]), text(rows[rows.length - 1])];
+"""
+
+
+def table_signature(driver, row_css: str):
+    """(row count, first row text, last row text) in one round trip; changes when a table re-renders."""
+    return tuple(driver.execute_script(_TABLE_SIGNATURE_JS, row_css) or ())
@@ -0,0 +1,136 @@
+# watermark.py
+"""
+Per-district incremental state: a watermark of what has been scraped and a mid-run checkpoint.
+
+<district>_state.json holds
+    "watermark":  latest report date seen (YYYYMMDD; year-only reports as YYYY0000), the newest
+                  document IDs, and when the last complete run finished
+    "checkpoint": where the current run is (e.g. {"page": 37, "row": 12} or {"years_done": [...]})
+                  or null when the last run finished cleanly
+
+Known URLs come from the district's manifest (every URL ever recorded), so a refresh only keeps
+rows whose URL is new. Revised filings are published under a new URL (Dallas
+..._FULL_REVISED_PUBLIC_...), so they count as new even though the ID/year was seen before.
+A checkpoint left by a crashed run tells the scraper to fast-forward past the finished work
+instead of starting over, and to ignore the "everything here is known" stop rule until it is
+past that point.
+"""
+import os
+import re
+import json
+import time
+from typing import Dict, List, Optional
+
+from manifest import derive_url_array
+
+KEEP_IDS = 50
+_DATE8 = re.compile(r"(?<!\d)((?:19|20)\d{6})(?!\d)")
+_YEAR4 = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+def report_key(url: str, fallback_year: Optional[str] = None) -> str:
+    """Sortable report date from a filing URL: YYYYMMDD, or YYYY0000 when only the year is known."""
+    m = _DATE8.search(url or "")
+    if m:
+        return m.group(1)
+    m = _YEAR4.search(str(fallback_year or "")) or _YEAR4.search(url or "")
+    return f"{m.group(1)}0000" if m else ""
+
+
+def is_revision(url: str) -> bool:
+    return "REVISED" in (url or "").upper()
+
+
+class ScrapeState:
+    def __init__(self, district: str, manifest_path: Optional[str] = None, path: Optional[str] = None):
+        self.district = district
+        self.path = path or f"{district}_state.json"
+        self.data: Dict = {"watermark": {}, "checkpoint": None}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except Exception:
+                pass
+        self.known = set(derive_url_array(manifest_path)) if manifest_path else set()
+        self.new_count = 0
+        self.revised_count = 0
+        self._latest = self.watermark.get("latest_report", "")
+        self._ids: List[str] = []
+
+    # ---------- watermark ----------
+    @property
+    def watermark(self) -> Dict:
+        return self.data.get("watermark") or {}
+
+    def is_new(self, url: str) -> bool:
+        return url not in self.known
+
+    def see(self, url: str, doc_id: str = "", year: Optional[str] = None) -> bool:
+        """Register a listed filing. Returns True if it is new (or a new revision) and should be kept."""
+        key = report_key(url, year)
+        if key > self._latest:
+            self._latest = key
+        if doc_id and len(self._ids) < KEEP_IDS and doc_id not in self._ids:
+            self._ids.append(doc_id)
+        if url in self.known:
+            return False
+        self.known.add(url)
+        self.new_count += 1
+        if is_revision(url):
+            self.revised_count += 1
+        return True
+
+    def commit_watermark(self):
+        """Record a completed run and clear its checkpoint."""
+        self.data["watermark"] = {
+            "latest_report": self._latest,
+            "latest_ids": self._ids or self.watermark.get("latest_ids", []),
+            "known_urls": len(self.known),
+            "last_new": self.new_count,
+            "last_revised": self.revised_count,
+            "completed": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.data["checkpoint"] = None
+        self.save()
+
+    # ---------- checkpoint ----------
+    @property
+    def checkpoint(self) -> Optional[Dict]:
+        return self.data.get("checkpoint")
+
+    def save_checkpoint(self, **position):
+        self.data["checkpoint"] = {**position, "updated": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.save()
+
+    def done_items(self, field: str) -> List:
+        """Items (e.g. years) a crashed run already finished, from checkpoint[field]."""
+        return list((self.checkpoint or {}).get(field, []))
+
+    def mark_done(self, field: str, item):
+        done = self.done_items(field)
+        if item not in done:
+            done.append(item)
+        self.save_checkpoint(**{field: done})
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        wm = self.watermark
+        return (f"watermark {wm.get('latest_report') or '—'} "
+                f"({len(self.known)} known URLs, last complete run {wm.get('completed') or 'never'})")
+
+
+class NewOnlyWriter:
+    """Stands in for a ManifestWriter (or list): forwards only records whose URL is new to `state`."""
+    def __init__(self, target, state: ScrapeState):
+        self.target = target
+        self.state = state
+
+    def append(self, record: Dict):
+        if self.state.see(record.get("url", ""), record.get("id", ""), record.get("year")):
+            self.target.append(record)
@@ -0,0 +1,137 @@
+# zip_postprocess.py
+"""
+Background post-processing for CapIQ ZIP downloads.
+
+The browser loop hands each finished ZIP to `ZipPostProcessor.submit()` and moves on to the next
+page. A worker thread, fed by a bounded queue, opens each ZIP and extracts the `section*.pdf`
+members, hashes them, and uploads them as individual objects (in parallel) to
+    s3://<bucket>/UpdateDocuments/pdfs/<pdf_name>.pdf      (Metadata: sha256)
+so the OCR stage reads PDFs directly and never has to touch the ZIPs.
+
+When the queue is full, submit() blocks. That backpressure keeps the browser from getting more
+than `queue_size` ZIPs ahead of the uploads. A ZIP is deleted locally only after all of its
+members are uploaded. ZIPs left over from an interrupted run are re-queued by submit_existing().
+"""
+import os
+import csv
+import glob
+import queue
+import hashlib
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+PDF_PREFIX = "UpdateDocuments/pdfs/"
+MEMBERS_CSV = "capiq_members.csv"
+MEMBERS_HEADER = ["zip_file", "pdf_name", "sha256", "size", "s3_key"]
+
+
+def is_section_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf") and filename.split("/")[-1].lower().startswith("section")
+
+
+def member_pdf_name(filename: str) -> str:
+    """Same naming as Mistral/read_CapIQ_pdfs.py uses for ZIP members (json/<pdf_name>.json)."""
+    return filename.split("\\")[-1].replace(".pdf", "")
+
+
+class ZipPostProcessor:
+    def __init__(self, bucket: str, client, prefix: str = PDF_PREFIX, store=None,
+                 upload_workers: int = 8, queue_size: int = 4, delete_zips: bool = True,
+                 on_error: Optional[Callable[[object, str], None]] = None,
+                 members_csv: str = MEMBERS_CSV):
+        self.bucket = bucket
+        self.client = client
+        self.prefix = prefix.rstrip("/") + "/"
+        self.store = store            # optional pdf_store.ContentStore
+        self.delete_zips = delete_zips
+        self.on_error = on_error      # called as on_error(page, message) from the worker thread
+        self.members_csv = members_csv
+        self.done = 0
+        self.failed = 0
+
+        self._queue: "queue.Queue[Optional[Tuple[str, object]]]" = queue.Queue(maxsize=queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=upload_workers)
+        self._csv_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="zip-postprocess", daemon=True)
+        self._worker.start()
+
+    # ---------- producer side ----------
+    def submit(self, zip_path: str, page=None):
+        """Queue a finished ZIP. Blocks while `queue_size` ZIPs are already waiting."""
+        self._queue.put((zip_path, page))
+
+    def submit_existing(self, download_dir: str) -> int:
+        """Re-queue ZIPs a previous run downloaded but did not finish uploading."""
+        leftovers = sorted(glob.glob(os.path.join(download_dir, "*.zip")), key=os.path.getmtime)
+        for z in leftovers:
+            self.submit(z)
+        if leftovers:
+            print(f"♻️ Re-queued {len(leftovers)} ZIP(s) left from a previous run.")
+        return len(leftovers)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self):
+        """Drain the queue, wait for in-flight uploads, stop the worker."""
+        self._queue.put(None)
+        self._worker.join()
+        self._pool.shutdown(wait=True)
+        print(f"📦 ZIP post-processing finished: {self.done} ZIP(s) uploaded, {self.failed} failed.")
+
+    # ---------- worker side ----------
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            zip_path, page = item
+            try:
+                n = self._process(zip_path)
+                self.done += 1
+                print(f"📤 {os.path.basename(zip_path)}: {n} PDF(s) uploaded (page {page}).", flush=True)
+                if self.delete_zips:
+                    os.remove(zip_path)
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Post-processing failed for {zip_path}: {e}", flush=True)
+                if self.on_error is not None:
+                    self.on_error(page, f"ZIP post-processing failed: {e}")
+
+    def _process(self, zip_path: str) -> int:
+        zip_name = os.path.basename(zip_path)
+        futures = []
+        with zipfile.ZipFile(zip_path) as z:
+            for info in z.infolist():
+                if not is_section_pdf(info.filename):
+                    continue
+                data = z.read(info)
+                futures.append(self._pool.submit(self._upload_member, zip_name,
+                                                 member_pdf_name(info.filename), data))
+        # let every transfer settle before surfacing the first upload error
+        wait(futures)
+        results: List[Tuple[str, str, str, int, str]] = [f.result() for f in futures]
+        self._record(results)
+        return len(results)
+
+    def _upload_member(self, zip_name: str, pdf_name: str, data: bytes) -> Tuple[str, str, str, int, str]:
+        sha = hashlib.sha256(data).hexdigest()
+        key = f"{self.prefix}{pdf_name}.pdf"
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data,
+                               ContentType="application/pdf", Metadata={"sha256": sha})
+        if self.store is not None:
+            self.store.put_bytes(data, sha)
+            self.store.record(f"capiq:{pdf_name}", sha, len(data), "capiq", zip_name)
+        return zip_name, pdf_name, sha, len(data), key
+
+    def _record(self, rows: List[Tuple[str, str, str, int, str]]):
+        with self._csv_lock:
+            new = not Path(self.members_csv).exists()
+            with open(self.members_csv, "a", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                if new:
+                    w.writerow(MEMBERS_HEADER)
+                w.writerows(rows)